@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 import os
 
+from .database import parse_database_url
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,11 +50,13 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'passes.routing.ReplicaPinMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'allauth.account.middleware.AccountMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'passes.roles.RolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -70,6 +74,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'passes.roles.roles',
             ],
         },
     },
@@ -89,6 +94,46 @@ DATABASES = {
     }
 }
 
+# e.g. postgres://earlypass:secret@db:5432/earlypass (see earlypass/database.py
+# for pool and connection options). Unset: the local SQLite file above.
+if os.getenv('DATABASE_URL'):
+    DATABASES['default'] = parse_database_url(os.environ['DATABASE_URL'], base_dir=BASE_DIR)
+
+# Optional read replica for GET requests to views marked @read_only
+# (passes/routing.py). Users are kept on the primary for
+# READ_REPLICA_STICKY_SECONDS after a request of theirs wrote anything.
+READ_REPLICA_ALIAS = 'replica'
+READ_REPLICA_STICKY_SECONDS = int(os.getenv('READ_REPLICA_STICKY_SECONDS', '10'))
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES[READ_REPLICA_ALIAS] = parse_database_url(os.environ['DATABASE_REPLICA_URL'], base_dir=BASE_DIR)
+    DATABASES[READ_REPLICA_ALIAS]['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['passes.routing.ReplicaRouter']
+
+# SQLITE_PROFILE=production tunes SQLite for several workers sharing the file:
+# WAL (readers don't block the writer), a busy timeout instead of instant
+# "database is locked", write transactions that take the lock up front
+# (BEGIN IMMEDIATE) and persistent connections. Pragmas are applied to each
+# new connection by passes.db.apply_sqlite_pragmas.
+SQLITE_PROFILE = os.getenv('SQLITE_PROFILE', 'development')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '20000'))
+SQLITE_PRAGMAS = {}
+if SQLITE_PROFILE == 'production' and DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+    })
+    DATABASES['default'].setdefault('OPTIONS', {}).update({
+        'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+        'transaction_mode': 'IMMEDIATE',
+    })
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+        'temp_store': 'MEMORY',
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -151,6 +196,13 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    # Submission uploads: deduplicated by content hash (see passes/storage.py)
+    "submissions": {"BACKEND": "passes.storage.ContentAddressedStorage"},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -158,3 +210,78 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # How many days ahead to set the default deadline for new classes created via approvals
 DEFAULT_CLASS_DEADLINE_DAYS = 30
+
+# Rows per INSERT when auto-enrolling a year's students into a class
+ENROLLMENT_BATCH_SIZE = int(os.getenv('ENROLLMENT_BATCH_SIZE', '500'))
+
+# Run Profile auto-enrollment after the surrounding transaction commits
+AUTO_ENROLL_ON_COMMIT = os.getenv('AUTO_ENROLL_ON_COMMIT', 'False').lower() == 'true'
+
+# Rows per page (and per "load more" batch) on the submissions list
+SUBMISSION_PAGE_SIZE = int(os.getenv('SUBMISSION_PAGE_SIZE', '50'))
+# Most submissions one bulk approve/reject request may change
+SUBMISSION_BULK_REVIEW_MAX = int(os.getenv('SUBMISSION_BULK_REVIEW_MAX', '500'))
+
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# cache (e.g. django.core.cache.backends.redis.RedisCache, redis://...) or
+# FileBasedCache with several workers so invalidation reaches all of them
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'earlypass'),
+    }
+}
+
+# class_list year options and per-user class listings (seconds; 0 = off).
+# Off by default: needs a cache shared by the web workers, run_worker and
+# sweep_deadlines, since writes in any of them invalidate it.
+LISTING_CACHE_ALIAS = os.getenv('LISTING_CACHE_ALIAS', 'default')
+LISTING_CACHE_TIMEOUT = int(os.getenv('LISTING_CACHE_TIMEOUT', '0'))
+
+# Cache users' group names across requests (seconds; 0 = per-request only).
+# Needs a cache shared by all workers, since group changes invalidate it.
+ROLES_CACHE_ALIAS = os.getenv('ROLES_CACHE_ALIAS', 'default')
+ROLES_CACHE_TIMEOUT = int(os.getenv('ROLES_CACHE_TIMEOUT', '0'))
+
+# Largest submission upload in MB unless a class sets its own max_upload_mb
+SUBMISSION_MAX_UPLOAD_MB = int(os.getenv('SUBMISSION_MAX_UPLOAD_MB', '200'))
+# Unfinished chunked uploads older than this (hours) are removed by gc_blobs
+CHUNKED_UPLOAD_EXPIRY_HOURS = int(os.getenv('CHUNKED_UPLOAD_EXPIRY_HOURS', '24'))
+# Superseded versions of these file types are stored as deltas against the
+# next version (passes/versions.py); every KEYFRAME-th version stays whole
+SUBMISSION_DELTA_EXTS = os.getenv('SUBMISSION_DELTA_EXTS', 'py,md,txt,ipynb').split(',')
+SUBMISSION_VERSION_KEYFRAME = int(os.getenv('SUBMISSION_VERSION_KEYFRAME', '10'))
+SUBMISSION_DELTA_MAX_BYTES = int(os.getenv('SUBMISSION_DELTA_MAX_BYTES', str(2 * 1024 * 1024)))
+
+# Hand submission downloads to the front-end server after the access check:
+# "nginx" (X-Accel-Redirect to SENDFILE_URL_PREFIX, an internal location
+# aliased to MEDIA_ROOT), "apache" (X-Sendfile) or "" to stream from Django
+SENDFILE_BACKEND = os.getenv('SENDFILE_BACKEND', '')
+SENDFILE_URL_PREFIX = os.getenv('SENDFILE_URL_PREFIX', '/protected-media/')
+
+# Rows fetched per database round trip by the streaming CSV/JSONL exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Background jobs (passes/jobs.py), run by `manage.py run_worker`.
+# JOBS_EAGER runs them inline in the request instead (tests, or no worker).
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False').lower() == 'true'
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+# Seconds a claimed job stays hidden from other workers before it is retried
+JOB_VISIBILITY_TIMEOUT = int(os.getenv('JOB_VISIBILITY_TIMEOUT', '300'))
+# Retry after JOB_RETRY_BACKOFF * 2^(attempt-1) seconds, at most JOB_RETRY_BACKOFF_MAX
+JOB_RETRY_BACKOFF = int(os.getenv('JOB_RETRY_BACKOFF', '10'))
+JOB_RETRY_BACKOFF_MAX = int(os.getenv('JOB_RETRY_BACKOFF_MAX', '3600'))
+
+# Admin email outbox (passes/outbox.py): sent this many seconds after the
+# first unsent message, one digest per kind once a batch has
+# OUTBOX_DIGEST_THRESHOLD messages of it
+OUTBOX_DIGEST_WINDOW = int(os.getenv('OUTBOX_DIGEST_WINDOW', '60'))
+OUTBOX_DIGEST_THRESHOLD = int(os.getenv('OUTBOX_DIGEST_THRESHOLD', '3'))
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '200'))
+# A message that failed this many sends is no longer retried (see the admin)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+
+# sweep_deadlines (passes/deadlines.py): seconds between sweeps with --loop,
+# and how far ahead the "closing soon" list looks (hours)
+DEADLINE_SWEEP_INTERVAL = int(os.getenv('DEADLINE_SWEEP_INTERVAL', '60'))
+DEADLINE_SOON_HOURS = int(os.getenv('DEADLINE_SOON_HOURS', '48'))
@@ -1,7 +1,12 @@
 from django.contrib import admin
 from django.contrib import messages
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from .models import Class, Enrollment, Submission, TeacherApplication, Profile, ProposedClass
+from . import approvals, outbox
+from .jobs import enqueue
+from .models import (
+    Class, Enrollment, Job, OutboxEmail, Submission, SubmissionVersion, TeacherApplication, Profile, ProposedClass,
+)
 
 
 @admin.register(Class)
@@ -18,12 +23,21 @@ class EnrollmentAdmin(admin.ModelAdmin):
     search_fields = ("student__username", "class_ref__name")
 
 
+class SubmissionVersionInline(admin.TabularInline):
+    model = SubmissionVersion
+    fields = ("number", "original_name", "size", "blob_name", "created_at")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
 @admin.register(Submission)
 class SubmissionAdmin(admin.ModelAdmin):
     list_display = ("student", "class_ref", "status", "submitted_at")
     list_filter = ("status", "class_ref__year")
     search_fields = ("student__username", "class_ref__name", "feedback")
     readonly_fields = ("submitted_at", "updated_at")
+    inlines = [SubmissionVersionInline]
 
 
 @admin.register(TeacherApplication)
@@ -33,24 +47,27 @@ class TeacherApplicationAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "user__email")
     readonly_fields = ("created_at", "decided_at", "course_names", "years")
 
-    actions = ["approve_applications", "reject_applications"]
+    actions = ["approve_applications", "preview_approve_applications", "reject_applications"]
 
     def approve_applications(self, request, queryset):
-        count_apps = 0
-        for app in queryset.filter(status="P"):
-            app.approve()
-            count_apps += 1
-        # For already approved ones, ensure activation too via signal
-        for app in queryset.filter(status="A"):
-            app.save(update_fields=["status"])  # trigger post_save to enforce activation
+        # Set-based approval (passes/approvals.py), run by the worker
+        ids = list(queryset.filter(status__in=["P", "A"]).values_list("pk", flat=True))
+        if ids:
+            enqueue("approve_teacher_applications", application_ids=ids)
         self.message_user(
-            request, 
-            _(f"Approved {count_apps} applications. Teachers can now log in and propose classes."), 
+            request,
+            _(f"Queued {len(ids)} applications for approval. Teachers can log in and propose classes once processed."),
             level=messages.SUCCESS
         )
 
     approve_applications.short_description = _("Approve selected teacher applications")
 
+    def preview_approve_applications(self, request, queryset):
+        result = approvals.approve_teacher_applications(queryset, dry_run=True)
+        self.message_user(request, result.summary("applications"), level=messages.INFO)
+
+    preview_approve_applications.short_description = _("Preview approval of selected applications (dry run)")
+
     def reject_applications(self, request, queryset):
         updated = queryset.filter(status="P").update(status="R")
         self.message_user(request, _(f"Rejected {updated} applications."), level=messages.WARNING)
@@ -71,16 +88,58 @@ class ProposedClassAdmin(admin.ModelAdmin):
     list_filter = ("status", "year")
     search_fields = ("name", "teacher__username", "description")
     readonly_fields = ("created_at", "decided_at")
-    actions = ["approve_proposals", "reject_proposals"]
+    actions = ["approve_proposals", "preview_approve_proposals", "reject_proposals"]
 
     def approve_proposals(self, request, queryset):
-        count = 0
-        # Approve both pending and already-approved to ensure classes exist
-        for pc in queryset.filter(status__in=["P", "A"]):
-            pc.approve()
-            count += 1
-        self.message_user(request, _(f"Processed {count} proposed classes (created/ensured classes and enrollments)."), level=messages.SUCCESS)
+        # Set-based class creation and enrollment (passes/approvals.py), run by the worker;
+        # already-approved ones are included to ensure their classes exist
+        ids = list(queryset.filter(status__in=["P", "A"]).values_list("pk", flat=True))
+        if ids:
+            enqueue("approve_proposals", proposal_ids=ids)
+        self.message_user(
+            request,
+            _(f"Queued {len(ids)} proposed classes for approval; their classes and enrollments are created in the background."),
+            level=messages.SUCCESS,
+        )
+
+    def preview_approve_proposals(self, request, queryset):
+        result = approvals.approve_proposals(queryset, dry_run=True)
+        self.message_user(request, result.summary("proposed classes"), level=messages.INFO)
+
+    preview_approve_proposals.short_description = _("Preview approval of selected proposals (dry run)")
 
     def reject_proposals(self, request, queryset):
         updated = queryset.filter(status="P").update(status="R")
         self.message_user(request, _(f"Rejected {updated} proposed classes."), level=messages.WARNING)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("task", "status", "attempts", "max_attempts", "run_at", "locked_by", "finished_at")
+    list_filter = ("status", "task")
+    readonly_fields = ("created_at", "finished_at", "locked_until", "locked_by", "last_error")
+    actions = ["retry_jobs"]
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status="F").update(
+            status="Q", attempts=0, run_at=timezone.now(), locked_until=None, locked_by=""
+        )
+        self.message_user(request, _(f"Re-queued {updated} failed jobs."), level=messages.SUCCESS)
+
+    retry_jobs.short_description = _("Retry selected failed jobs")
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "kind", "created_at", "sent_at", "attempts")
+    list_filter = ("kind", ("sent_at", admin.EmptyFieldListFilter))
+    readonly_fields = ("created_at", "sent_at", "attempts", "last_error")
+    actions = ["retry_emails"]
+
+    def retry_emails(self, request, queryset):
+        # Also revives messages that used up OUTBOX_MAX_ATTEMPTS
+        updated = queryset.filter(sent_at__isnull=True).update(attempts=0, last_error="")
+        outbox.schedule_send()
+        self.message_user(request, _(f"Re-queued {updated} unsent emails."), level=messages.SUCCESS)
+
+    retry_emails.short_description = _("Retry selected unsent emails")
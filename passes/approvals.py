@@ -0,0 +1,139 @@
+"""
+Set-based approval of teacher applications and proposed classes.
+
+The admin actions (through the job queue) approve any number of rows with a
+fixed number of queries: one status UPDATE, one bulk insert into the teacher
+group's through table, one is_active UPDATE, and bulk class creation and
+enrollment. These writes skip the model signals, so the work those would do
+(role cache, ClassStats rows, search documents, listing stamps) is done here.
+
+With ``dry_run=True`` nothing is written; the result reports what would change.
+"""
+from dataclasses import dataclass
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.utils import timezone
+
+from .enrollment import EnrollmentResult, enroll_year_students_in_classes, year_enrollment_plan
+from .listing_cache import GLOBAL_SCOPE, bump
+from .models import Class, ProposedClass, TeacherApplication
+from .roles import invalidate_roles
+from .search import index_classes
+from .stats import refresh_class_stats
+
+User = get_user_model()
+
+
+@dataclass(frozen=True)
+class ApprovalResult:
+    """What an approval changed (or, for a dry run, would change)."""
+    approved: int = 0
+    added_to_group: int = 0
+    activated: int = 0
+    classes_created: int = 0
+    classes_updated: int = 0
+    enrolled: EnrollmentResult = EnrollmentResult()
+    dry_run: bool = False
+
+    def summary(self, noun: str) -> str:
+        verb = "Would approve" if self.dry_run else "Approved"
+        parts = [f"{verb} {self.approved} {noun}"]
+        if self.added_to_group or self.activated:
+            parts.append(f"{self.added_to_group} added to the teacher group, {self.activated} activated")
+        if self.classes_created or self.classes_updated or self.enrolled.created:
+            parts.append(
+                f"{self.classes_created} classes created, {self.classes_updated} updated, "
+                f"{self.enrolled.created} new enrollments ({self.enrolled.existing} already enrolled)"
+            )
+        return "; ".join(parts) + "."
+
+
+def approve_teacher_applications(queryset, dry_run: bool = False) -> ApprovalResult:
+    """
+    Approve the pending applications in ``queryset`` and make sure every
+    pending or approved applicant is an active member of the teacher group.
+    """
+    rows = list(queryset.filter(status__in=["P", "A"]).values_list("pk", "status", "user_id"))
+    user_ids = {user_id for _pk, _status, user_id in rows}
+    pending = [pk for pk, status, _user_id in rows if status == "P"]
+    group = Group.objects.filter(name="teacher").first()
+    members = set(group.user_set.filter(pk__in=user_ids).values_list("pk", flat=True)) if group else set()
+    missing = sorted(user_ids - members)
+    inactive = list(User.objects.filter(pk__in=user_ids, is_active=False).values_list("pk", flat=True))
+    result = ApprovalResult(
+        approved=len(pending), added_to_group=len(missing), activated=len(inactive), dry_run=dry_run,
+    )
+    if dry_run or not rows:
+        return result
+
+    with transaction.atomic():
+        TeacherApplication.objects.filter(pk__in=pending, status="P").update(status="A", decided_at=timezone.now())
+        group = group or Group.objects.get_or_create(name="teacher")[0]
+        Membership = User.groups.through
+        Membership.objects.bulk_create(
+            [Membership(user_id=user_id, group_id=group.pk) for user_id in missing], ignore_conflicts=True,
+        )
+        User.objects.filter(pk__in=inactive).update(is_active=True)
+    # bulk_create sends no m2m_changed
+    invalidate_roles(missing)
+    return result
+
+
+def approve_proposals(queryset, dry_run: bool = False, batch_size: int | None = None) -> ApprovalResult:
+    """
+    Approve the pending proposals in ``queryset`` and make sure every pending
+    or approved proposal has its Class (deadline and description taken from
+    the proposal) with all students of its year enrolled.
+    """
+    proposals = list(queryset.filter(status__in=["P", "A"]).select_related("teacher").order_by("pk"))
+    pending = [pc.pk for pc in proposals if pc.status == "P"]
+    existing = {
+        (cls.name, cls.year, cls.teacher_id): cls
+        for cls in Class.objects.filter(
+            teacher_id__in={pc.teacher_id for pc in proposals},
+            name__in={pc.name for pc in proposals},
+        ).select_related("teacher")
+    }
+    now = timezone.now()
+    classes, created, updated = {}, [], {}
+    for pc in proposals:
+        key = (pc.name, pc.year, pc.teacher_id)
+        cls = classes.get(key) or existing.get(key)
+        if cls is None:
+            cls = Class(
+                name=pc.name, year=pc.year, teacher=pc.teacher, deadline=pc.deadline,
+                description=pc.description, is_open=pc.deadline > now,
+            )
+            created.append(cls)
+        elif (cls.deadline, cls.description) != (pc.deadline, pc.description):
+            # As Class.save(): a later deadline reopens, closing is left to the sweeper
+            cls.deadline, cls.description = pc.deadline, pc.description
+            cls.is_open = cls.is_open or pc.deadline > now
+            if cls.pk is not None:
+                updated[cls.pk] = cls
+        classes[key] = cls
+
+    if dry_run:
+        missing, present = year_enrollment_plan(classes.values())
+        return ApprovalResult(
+            approved=len(pending), classes_created=len(created), classes_updated=len(updated),
+            enrolled=EnrollmentResult(created=len(missing), existing=present), dry_run=True,
+        )
+    if not proposals:
+        return ApprovalResult()
+
+    with transaction.atomic():
+        ProposedClass.objects.filter(pk__in=pending, status="P").update(status="A", decided_at=timezone.now())
+        Class.objects.bulk_create(created, batch_size=batch_size)
+        Class.objects.bulk_update(list(updated.values()), ["deadline", "description", "is_open"], batch_size=batch_size)
+        enrolled = enroll_year_students_in_classes(classes.values(), batch_size)
+        # What Class post_save would have done for the created and updated rows
+        refresh_class_stats([cls.pk for cls in created])
+        index_classes([*created, *updated.values()])
+    if created or updated:
+        bump(GLOBAL_SCOPE)
+    return ApprovalResult(
+        approved=len(pending), classes_created=len(created), classes_updated=len(updated), enrolled=enrolled,
+    )
@@ -0,0 +1,158 @@
+"""
+Reference counting and garbage collection for content-addressed blobs.
+
+Submission post_save/post_delete signals call retain_blob()/release_blob(),
+as do superseded SubmissionVersions that keep a full copy. collect_garbage()
+treats those two tables as the source of truth, so counts that drifted (bulk
+updates, crashes) are corrected by a GC run.
+"""
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import ChunkedUpload, StoredBlob, Submission, SubmissionVersion
+from .storage import BLOB_PREFIX, parse_blob_name, submission_storage
+
+
+def retain_blob(name: str) -> None:
+    digest = parse_blob_name(name)
+    if digest is None:
+        return
+    # INSERT ... ON CONFLICT DO NOTHING, then an atomic increment: no
+    # IntegrityError/savepoint round trip when two uploads race on a new blob
+    StoredBlob.objects.bulk_create(
+        [StoredBlob(name=name, sha256=digest, size=_size(name), ref_count=0)], ignore_conflicts=True
+    )
+    StoredBlob.objects.filter(name=name).update(ref_count=F("ref_count") + 1)
+
+
+def release_blob(name: str) -> None:
+    if parse_blob_name(name) is None:
+        return
+    StoredBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F("ref_count") - 1)
+
+
+def _size(name: str) -> int:
+    try:
+        return submission_storage().size(name)
+    except OSError:
+        return 0
+
+
+@dataclass
+class GarbageReport:
+    blobs: list = field(default_factory=list)
+    orphan_files: list = field(default_factory=list)
+    legacy_files: list = field(default_factory=list)
+    expired_uploads: int = 0
+    bytes_freed: int = 0
+
+
+def recount_references() -> int:
+    """Reset every StoredBlob.ref_count from submissions and versions. Returns rows changed."""
+    counts = Counter(dict(
+        Submission.objects.filter(file__startswith=f"{BLOB_PREFIX}/")
+        .order_by().values("file").annotate(n=Count("pk")).values_list("file", "n")
+    ))
+    counts.update(dict(
+        SubmissionVersion.objects.filter(blob_name__startswith=f"{BLOB_PREFIX}/")
+        .order_by().values("blob_name").annotate(n=Count("pk")).values_list("blob_name", "n")
+    ))
+    changed = 0
+    for blob in StoredBlob.objects.only("pk", "name", "ref_count").iterator():
+        expected = counts.get(blob.name, 0)
+        if blob.ref_count != expected:
+            StoredBlob.objects.filter(pk=blob.pk).update(ref_count=expected)
+            changed += 1
+    return changed
+
+
+def _mtime(storage, name: str) -> float:
+    try:
+        return os.path.getmtime(storage.path(name))
+    except OSError:
+        return 0.0
+
+
+def _walk(storage, directory):
+    """Yield (storage name, mtime) for every file below ``directory``."""
+    root = storage.path(directory)
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            name = os.path.relpath(full_path, storage.location).replace(os.sep, "/")
+            yield name, os.path.getmtime(full_path)
+
+
+def collect_garbage(grace: timedelta = timedelta(hours=1), dry_run: bool = False,
+                    include_legacy: bool = False) -> GarbageReport:
+    """
+    Delete blobs that no Submission or SubmissionVersion references. Anything younger than
+    ``grace`` is kept so in-flight uploads are never collected.
+
+    Also removes blob files on disk with no StoredBlob row (a crash between
+    writing the file and committing the row), expired chunked uploads and,
+    with ``include_legacy``, files under the old ``submissions/`` layout
+    that nothing references.
+    """
+    storage = submission_storage()
+    report = GarbageReport()
+    cutoff = timezone.now() - grace
+    cutoff_ts = time.time() - grace.total_seconds()
+
+    referenced = Submission.objects.filter(file=OuterRef("name"))
+    kept_version = SubmissionVersion.objects.filter(blob_name=OuterRef("name"))
+    unreferenced = StoredBlob.objects.filter(created_at__lt=cutoff).filter(~Exists(referenced), ~Exists(kept_version))
+    for blob in unreferenced.iterator():
+        if _mtime(storage, blob.name) > cutoff_ts:
+            # Reused by an upload that has not committed its reference yet
+            continue
+        report.blobs.append(blob.name)
+        report.bytes_freed += blob.size
+        if not dry_run:
+            storage.delete(blob.name)
+            blob.delete()
+
+    # Chunked uploads abandoned for longer than the expiry are dropped; the
+    # temp files of live ones are kept however old they are
+    expiry = timezone.now() - timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+    expired = ChunkedUpload.objects.filter(updated_at__lt=expiry)
+    report.expired_uploads = expired.count()
+    if not dry_run:
+        expired.delete()
+    live_uploads = {
+        f"{BLOB_PREFIX}/tmp/chunked-{pk}"
+        for pk in ChunkedUpload.objects.filter(updated_at__gte=expiry).values_list("pk", flat=True)
+    }
+
+    known = set(StoredBlob.objects.values_list("name", flat=True)) | live_uploads
+    known |= set(ChunkedUpload.objects.exclude(blob_name="").values_list("blob_name", flat=True))
+    for name, mtime in _walk(storage, BLOB_PREFIX):
+        if name in known or mtime > cutoff_ts:
+            continue
+        # Leftover temp files and blobs without a row
+        report.orphan_files.append(name)
+        report.bytes_freed += storage.size(name)
+        if not dry_run:
+            storage.delete(name)
+
+    if include_legacy:
+        in_use = set(Submission.objects.exclude(file__startswith=f"{BLOB_PREFIX}/").values_list("file", flat=True))
+        in_use |= set(
+            SubmissionVersion.objects.exclude(blob_name="").exclude(blob_name__startswith=f"{BLOB_PREFIX}/")
+            .values_list("blob_name", flat=True)
+        )
+        for name, mtime in _walk(storage, "submissions"):
+            if name in in_use or mtime > cutoff_ts:
+                continue
+            report.legacy_files.append(name)
+            report.bytes_freed += storage.size(name)
+            if not dry_run:
+                storage.delete(name)
+    return report
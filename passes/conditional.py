@@ -0,0 +1,43 @@
+"""
+ETags for the HTMX live-filter partials.
+
+A view decorated with ``@etag_partial(fingerprint)`` computes, for HTMX GETs
+only, a cheap fingerprint of what the partial would show (see the
+fingerprint functions next to each view). The browser revalidates the
+partial with If-None-Match; when the fingerprint still matches, the view is
+not run and a 304 is returned. Full-page GETs are untouched (they carry the
+CSRF token and messages).
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag
+
+
+def make_etag(*parts) -> str:
+    return quote_etag(hashlib.sha1("\0".join(str(p) for p in parts).encode()).hexdigest())
+
+
+def etag_partial(fingerprint):
+    """``fingerprint(request, *args, **kwargs)`` returns the parts hashed into the ETag."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET" or not getattr(request, "htmx", False):
+                return view(request, *args, **kwargs)
+            etag = make_etag(*fingerprint(request, *args, **kwargs))
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200:
+                    response["ETag"] = etag
+            # Always revalidate; the same URL serves the full page without HX-Request
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ["HX-Request"])
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,23 @@
+"""
+Per-connection database tuning.
+
+With ``SQLITE_PROFILE=production`` every new SQLite connection gets the
+SQLITE_PRAGMAS from settings (WAL journaling, synchronous=NORMAL, a busy
+timeout and memory-mapped reads), so several gunicorn workers can share one
+database file: readers no longer block the writer, and a writer waits for the
+lock instead of failing with "database is locked". Journal mode is stored in
+the file, the other pragmas are per connection, hence the connection_created
+hook (see passes.signals) rather than a one-off migration.
+"""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(connection) -> None:
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", None)
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
@@ -0,0 +1,90 @@
+"""
+Deadline state, maintained by ``manage.py sweep_deadlines``.
+
+Class.is_open is a stored flag instead of a per-access ``now > deadline``
+check, so listings filter open/closed classes through an index. Each sweep:
+
+    closes    open classes whose deadline passed, and marks their enrolled
+              students without a submission (Enrollment.missed_deadline)
+    reopens   closed classes whose deadline was moved into the future,
+              clearing those marks
+    caches    the "closing soon" list (open classes due within
+              DEADLINE_SOON_HOURS, with their not-submitted counts)
+
+Between sweeps a class may stay open for up to one sweep interval past its
+deadline; Submission.clean() still compares the deadline itself.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .listing_cache import GLOBAL_SCOPE, bump, cached
+from .models import Class, Enrollment, Submission
+
+DEADLINE_SCOPE = "deadlines"
+
+
+@dataclass(frozen=True)
+class SweepResult:
+    closed: int = 0
+    reopened: int = 0
+    marked: int = 0
+
+
+def mark_missed(class_ids) -> int:
+    """Flag enrollments in ``class_ids`` that have no submission. One UPDATE."""
+    submitted = Submission.objects.filter(student=OuterRef("student_id"), class_ref=OuterRef("class_ref_id"))
+    return (
+        Enrollment.objects.filter(class_ref_id__in=class_ids, missed_deadline=False)
+        .filter(~Exists(submitted))
+        .update(missed_deadline=True)
+    )
+
+
+@transaction.atomic
+def sweep_deadlines(now=None) -> SweepResult:
+    now = now or timezone.now()
+    closing = list(Class.objects.filter(is_open=True, deadline__lte=now).values_list("pk", flat=True))
+    reopening = list(Class.objects.filter(is_open=False, deadline__gt=now).values_list("pk", flat=True))
+    marked = 0
+    if closing:
+        Class.objects.filter(pk__in=closing).update(is_open=False)
+        marked = mark_missed(closing)
+    if reopening:
+        Class.objects.filter(pk__in=reopening).update(is_open=True)
+    # Also covers classes reopened by Class.save()
+    Enrollment.objects.filter(missed_deadline=True, class_ref__is_open=True).update(missed_deadline=False)
+
+    scopes = [DEADLINE_SCOPE]
+    if closing or reopening:
+        scopes.append(GLOBAL_SCOPE)
+    transaction.on_commit(lambda: (bump(*scopes), closing_soon()))
+    return SweepResult(closed=len(closing), reopened=len(reopening), marked=marked)
+
+
+def _closing_soon_rows(now) -> list:
+    soon = now + timedelta(hours=settings.DEADLINE_SOON_HOURS)
+    rows = (
+        Class.objects.filter(is_open=True, deadline__gt=now, deadline__lte=soon)
+        .order_by("deadline")
+        .values("id", "name", "year", "teacher_id", "deadline")
+        .annotate(enrolled=F("stats__enrolled"), not_submitted=F("stats__enrolled") - F("stats__submitted"))
+    )
+    return list(rows)
+
+
+def closing_soon(teacher_id: int | None = None) -> list:
+    """
+    Open classes due within DEADLINE_SOON_HOURS, soonest first, as dicts with
+    their not-submitted count. Cached until the next sweep or class change.
+    """
+    rows = cached(
+        "closing_soon", "all", [GLOBAL_SCOPE, DEADLINE_SCOPE], lambda: _closing_soon_rows(timezone.now()),
+    )
+    if teacher_id is not None:
+        rows = [row for row in rows if row["teacher_id"] == teacher_id]
+    return rows
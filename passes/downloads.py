@@ -0,0 +1,124 @@
+"""
+Serving submission files after an access check.
+
+With SENDFILE_BACKEND set, Django only checks permissions and returns an
+empty response with a header telling the front-end server which file to send:
+
+    "nginx"   X-Accel-Redirect: <SENDFILE_URL_PREFIX><name>
+              (location marked ``internal`` with ``alias`` to MEDIA_ROOT)
+    "apache"  X-Sendfile: <absolute path>   (mod_xsendfile)
+
+so workers are not held for the whole transfer. Without a backend the file
+is streamed by serve_file() itself, with single-range Range requests and
+conditional GET (ETag / Last-Modified) handled.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+from .storage import parse_blob_name
+
+RANGE = re.compile(r"^bytes=(?P<start>\d*)-(?P<end>\d*)$")
+
+
+def file_etag(name: str, mtime: float, size: int) -> str:
+    """Blobs are immutable, so their digest is the ETag; legacy files use mtime/size."""
+    return quote_etag(parse_blob_name(name) or f"{int(mtime):x}-{size:x}")
+
+
+def parse_range(header: str, size: int):
+    """
+    Return (start, end) inclusive for a single ``bytes=`` range, None to
+    ignore the header (absent, malformed or multi-range), or False if the
+    range cannot be satisfied.
+    """
+    match = RANGE.match((header or "").strip())
+    if not match or not (match.group("start") or match.group("end")):
+        return None
+    start, end = match.group("start"), match.group("end")
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _sendfile_response(storage, name: str) -> HttpResponse | None:
+    backend = getattr(settings, "SENDFILE_BACKEND", "")
+    if backend == "nginx":
+        response = HttpResponse()
+        response["X-Accel-Redirect"] = settings.SENDFILE_URL_PREFIX + quote(name)
+        return response
+    if backend == "apache":
+        response = HttpResponse()
+        response["X-Sendfile"] = storage.path(name)
+        return response
+    return None
+
+
+def serve_file(request, storage, name: str, download_name: str, as_attachment: bool = True) -> HttpResponse:
+    """Respond with ``name`` from ``storage`` (the caller has checked access)."""
+    path = storage.path(name)
+    stat = os.stat(path)
+    etag = file_etag(name, stat.st_mtime, stat.st_size)
+    content_type = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return not_modified
+
+    response = _sendfile_response(storage, name)
+    if response is None:
+        response = _file_response(request, path, stat.st_size, etag)
+    response["Content-Type"] = content_type
+    response["Content-Disposition"] = content_disposition_header(as_attachment, download_name)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = "private"
+    return response
+
+
+def _file_response(request, path: str, size: int, etag: str) -> HttpResponse:
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    if request.method == "GET" and (if_range is None or if_range == etag):
+        byte_range = parse_range(request.headers.get("Range"), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    f = open(path, "rb")
+    if byte_range is None:
+        response = FileResponse(f)
+        response["Content-Length"] = size
+    else:
+        start, end = byte_range
+        f.seek(start)
+        response = FileResponse(_read_range(f, end - start + 1), status=206)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+def _read_range(f, length: int, chunk_size: int = FileResponse.block_size):
+    with f:
+        while length > 0:
+            data = f.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
@@ -0,0 +1,179 @@
+"""
+Set-based enrollment engine.
+
+Every path that auto-enrolls students (class approval, the admin actions and the
+fix_proposed_classes command) goes through here so that enrolling a whole year
+costs a couple of queries instead of one get_or_create per student.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Class, Enrollment, Profile
+from .listing_cache import bump, student_scope
+from .stats import refresh_class_stats
+
+User = get_user_model()
+
+
+@dataclass(frozen=True)
+class EnrollmentResult:
+    """Counts of enrollment rows written vs. rows that were already present."""
+    created: int = 0
+    existing: int = 0
+
+    def __add__(self, other: "EnrollmentResult") -> "EnrollmentResult":
+        return EnrollmentResult(self.created + other.created, self.existing + other.existing)
+
+
+def get_batch_size(batch_size: int | None = None) -> int:
+    return batch_size or getattr(settings, "ENROLLMENT_BATCH_SIZE", 500)
+
+
+def bulk_create_enrollments(pairs, batch_size: int | None = None) -> int:
+    """
+    Insert (student_id, class_id) pairs in batches. Rows that already exist
+    (e.g. created concurrently) are skipped by the unique constraint. The
+    affected classes' ClassStats are recomputed and the students' cached
+    class listings invalidated afterwards.
+    Returns the number of rows actually inserted: ignore_conflicts reports
+    no per-row outcome, so the classes' enrollments are counted before and after.
+    """
+    rows = [Enrollment(student_id=student_id, class_ref_id=class_id) for student_id, class_id in pairs]
+    if not rows:
+        return 0
+    class_ids = {row.class_ref_id for row in rows}
+    enrolled = Enrollment.objects.filter(class_ref_id__in=class_ids)
+    # Counted in the same transaction as the insert (no savepoint queries)
+    with transaction.atomic(savepoint=False):
+        before = enrolled.count()
+        Enrollment.objects.bulk_create(rows, batch_size=get_batch_size(batch_size), ignore_conflicts=True)
+        created = enrolled.count() - before
+    # bulk_create sends no post_save: recount the classes and drop the
+    # students' cached class listings here instead
+    refresh_class_stats(class_ids)
+    bump(*{student_scope(row.student_id) for row in rows})
+    return created
+
+
+def year_students_missing_enrollment(cls: Class):
+    """Students in the class's year that are not yet enrolled in it (anti-join)."""
+    already_enrolled = Enrollment.objects.filter(student=OuterRef("pk"), class_ref=cls)
+    return User.objects.filter(profile__student_year=cls.year).filter(~Exists(already_enrolled))
+
+
+def enroll_year_students(cls: Class, batch_size: int | None = None) -> EnrollmentResult:
+    """
+    Enroll every student whose profile year matches ``cls.year``. Idempotent.
+    """
+    missing = list(year_students_missing_enrollment(cls).values_list("pk", flat=True))
+    existing = Enrollment.objects.filter(class_ref=cls, student__profile__student_year=cls.year).count()
+    created = bulk_create_enrollments(((student_id, cls.pk) for student_id in missing), batch_size)
+    return EnrollmentResult(created=created, existing=existing)
+
+
+def year_enrollment_plan(classes):
+    """
+    Enrollments needed to give each class all students of its year:
+    ([(student_id, class_id) missing], number already present). Two queries
+    for any number of classes; unsaved classes (pk None) count as empty.
+    """
+    classes = list(classes)
+    if not classes:
+        return [], 0
+    students_by_year = defaultdict(list)
+    profiles = Profile.objects.filter(student_year__in={cls.year for cls in classes})
+    for student_id, year in profiles.values_list("user_id", "student_year"):
+        students_by_year[year].append(student_id)
+    saved = [cls.pk for cls in classes if cls.pk is not None]
+    existing = set(
+        Enrollment.objects.filter(class_ref_id__in=saved).values_list("student_id", "class_ref_id")
+    ) if saved else set()
+    missing, present = [], 0
+    for cls in classes:
+        for student_id in students_by_year[cls.year]:
+            if (student_id, cls.pk) in existing:
+                present += 1
+            else:
+                missing.append((student_id, cls.pk))
+    return missing, present
+
+
+def enroll_year_students_in_classes(classes, batch_size: int | None = None) -> EnrollmentResult:
+    """enroll_year_students() for many classes at once. Idempotent."""
+    missing, present = year_enrollment_plan(classes)
+    created = bulk_create_enrollments(missing, batch_size)
+    return EnrollmentResult(created=created, existing=present)
+
+
+def enroll_students_in_year_classes(student_ids, batch_size: int | None = None) -> EnrollmentResult:
+    """
+    Enroll the given students into every class of their profile year. Idempotent.
+    Works through the ids in batches: three reads and one bulk insert per batch.
+    """
+    student_ids = list(student_ids)
+    size = get_batch_size(batch_size)
+    result = EnrollmentResult()
+    for start in range(0, len(student_ids), size):
+        chunk = student_ids[start:start + size]
+        years = dict(
+            Profile.objects.filter(user_id__in=chunk, student_year__isnull=False)
+            .values_list("user_id", "student_year")
+        )
+        if not years:
+            continue
+        classes_by_year = defaultdict(list)
+        for class_id, year in Class.objects.filter(year__in=set(years.values())).values_list("id", "year"):
+            classes_by_year[year].append(class_id)
+        wanted = {(student_id, class_id) for student_id, year in years.items() for class_id in classes_by_year[year]}
+        if not wanted:
+            continue
+        existing = set(
+            Enrollment.objects.filter(
+                student_id__in=years.keys(),
+                class_ref_id__in={class_id for _, class_id in wanted},
+            ).values_list("student_id", "class_ref_id")
+        )
+        created = bulk_create_enrollments(wanted - existing, batch_size)
+        result += EnrollmentResult(created=created, existing=len(wanted & existing))
+    return result
+
+
+_suspension = threading.local()
+
+
+def pending_auto_enrollment():
+    """The set collecting student ids while auto-enrollment is suspended, else None."""
+    return getattr(_suspension, "pending", None)
+
+
+@contextmanager
+def suspend_auto_enrollment(batch_size: int | None = None):
+    """
+    Suspend the Profile post_save auto-enrollment (e.g. during a CSV import) and
+    enroll every affected student in one consolidated pass on exit:
+
+        with suspend_auto_enrollment():
+            for row in rows:
+                Profile.objects.update_or_create(...)
+
+    Nested blocks are folded into the outermost one. If the block raises, no
+    enrollment pass is run.
+    """
+    outermost = pending_auto_enrollment() is None
+    if outermost:
+        _suspension.pending = set()
+    try:
+        yield _suspension.pending
+        if outermost:
+            pending, _suspension.pending = _suspension.pending, None
+            enroll_students_in_year_classes(sorted(pending), batch_size=batch_size)
+    finally:
+        if outermost:
+            _suspension.pending = None
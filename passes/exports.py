@@ -0,0 +1,169 @@
+"""
+Streaming exports.
+
+Archives are generated while the response is being sent: ZipFile writes into
+a small buffer that the generator drains after every chunk, so memory use
+stays constant no matter how many or how large the files are, and nothing is
+written to a temp file.
+
+Tabular exports (CSV / JSON Lines) read plain tuples with values_list() and
+iterator(), so no model instances are built and rows are fetched from the
+database in EXPORT_CHUNK_SIZE batches while earlier ones are being sent.
+"""
+import csv
+import io
+import json
+import os
+import zipfile
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import Class, Submission
+
+# Already-compressed formats are stored as-is; deflating them only costs CPU
+STORED_EXTS = {".pdf", ".docx", ".zip"}
+CHUNK_SIZE = 64 * 1024
+
+
+class _ZipBuffer(io.RawIOBase):
+    """Unseekable sink that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._offset += len(b)
+        return len(b)
+
+    def tell(self):
+        # zipfile records header offsets with tell(); seek() is never needed
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def class_archive_rows(cls: Class):
+    return (
+        Submission.objects.filter(class_ref=cls)
+        .exclude(file="")
+        .select_related("student")
+        .order_by("student__username")
+    )
+
+
+# A text cell starting with one of these is run as a formula by spreadsheets
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def csv_cell(value):
+    """Quote user-entered text that a spreadsheet would evaluate as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+MANIFEST_HEADER = ["username", "email", "file", "status", "submitted_at", "updated_at"]
+
+
+def _manifest_row(sub: Submission, arcname: str) -> list:
+    return [csv_cell(value) for value in (
+        sub.student.username, sub.student.email, arcname,
+        sub.get_status_display(), sub.submitted_at.isoformat(), sub.updated_at.isoformat(),
+    )]
+
+
+def stream_class_zip(cls: Class):
+    """
+    Yield a ZIP of every submission in ``cls`` as ``<username>/<filename>``,
+    followed by ``manifest.csv`` (status and timestamps per student).
+    """
+    buffer = _ZipBuffer()
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(MANIFEST_HEADER)
+    with zipfile.ZipFile(buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for sub in class_archive_rows(cls).iterator(chunk_size=200):
+            arcname = f"{get_valid_filename(sub.student.username)}/{get_valid_filename(sub.display_name)}"
+            try:
+                src = sub.file.open("rb")
+            except OSError:
+                # Listed in the manifest without a file rather than failing the export
+                writer.writerow(_manifest_row(sub, ""))
+                continue
+            writer.writerow(_manifest_row(sub, arcname))
+            info = zipfile.ZipInfo(arcname, date_time=timezone.localtime(sub.updated_at).timetuple()[:6])
+            info.file_size = sub.file.size
+            ext = os.path.splitext(arcname)[1].lower()
+            info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTS else zipfile.ZIP_DEFLATED
+            with src, archive.open(info, mode="w") as dest:
+                for data in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    dest.write(data)
+                    yield buffer.drain()
+            yield buffer.drain()
+        archive.writestr("manifest.csv", manifest.getvalue().encode("utf-8"))
+    yield buffer.drain()
+
+
+# (column name, lookup) pairs of the submission export
+EXPORT_COLUMNS = [
+    ("id", "pk"),
+    ("class_id", "class_ref_id"),
+    ("class", "class_ref__name"),
+    ("student", "student__username"),
+    ("email", "student__email"),
+    ("status", "status"),
+    ("feedback", "feedback"),
+    ("file", "original_name"),
+    ("submitted_at", "submitted_at"),
+    ("updated_at", "updated_at"),
+]
+
+
+class _Echo:
+    """File-like object whose write() returns the data, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(qs):
+    """Yield one dict per submission in ``qs`` with the EXPORT_COLUMNS keys."""
+    names = [name for name, _lookup in EXPORT_COLUMNS]
+    status_labels = dict(Submission.STATUS)
+    status_index = names.index("status")
+    rows = (
+        qs.select_related(None)
+        .order_by("pk")
+        .values_list(*(lookup for _name, lookup in EXPORT_COLUMNS))
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+    for row in rows:
+        row = list(row)
+        row[status_index] = status_labels.get(row[status_index], row[status_index])
+        yield dict(zip(names, row))
+
+
+def stream_csv(qs):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _lookup in EXPORT_COLUMNS])
+    for row in export_rows(qs):
+        yield writer.writerow(
+            [value.isoformat() if hasattr(value, "isoformat") else csv_cell(value) for value in row.values()]
+        )
+
+
+def stream_jsonl(qs):
+    for row in export_rows(qs):
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
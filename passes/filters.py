@@ -1,15 +1,56 @@
-import django_filters as df
-from .models import Event, EarlyPass
-
-class EventFilter(df.FilterSet):
-    q = df.CharFilter(method="search", label="Search")
-    class Meta:
-        model = Event
-        fields = ["category","date"]
-    def search(self, qs, name, value):
-        return qs.filter(title__icontains=value) if value else qs
-
-class PassFilter(df.FilterSet):
-    class Meta:
-        model = EarlyPass
-        fields = ["status","event"]
+"""
+The class_list and submission_list filters, shared by the views, the cached
+listings (passes/listing_cache.py) and explain_queries.
+"""
+from .models import Class, SearchDocument, Submission
+from .search import filter_by_search, order_by_rank, ranked_ids
+
+
+CLASS_STATES = {"open": True, "closed": False}
+
+
+def filter_classes(user, is_teacher: bool, q: str = "", year: str | None = None, state: str = "",
+                   ranked: bool = True):
+    """
+    Classes visible to a user, narrowed by the class_list filters.
+    Students: enrolled classes. Teachers: classes they teach. Staff: all classes.
+    With ``ranked=False`` search matches are not ordered (no ranking query).
+    """
+    if user.is_staff:
+        qs = Class.objects.all()
+    elif is_teacher:
+        qs = Class.objects.filter(teacher=user)
+    else:
+        qs = Class.objects.filter(enrollments__student=user)
+    if year:
+        qs = qs.filter(year=year)
+    if state in CLASS_STATES:
+        qs = qs.filter(is_open=CLASS_STATES[state])
+    qs = qs.select_related("teacher").order_by("deadline").distinct()
+    if q:
+        # Best full-text matches among the user's classes first (passes/search.py)
+        qs = filter_by_search(qs, SearchDocument.CLASS, q)
+        if ranked:
+            qs = order_by_rank(qs, ranked_ids(SearchDocument.CLASS, q, within=qs))
+    return qs
+
+
+def filter_submissions(user, is_teacher: bool, status: str = "", class_id: str = "", q: str = ""):
+    """
+    Submissions visible to a user, narrowed by the submission_list filters.
+    Students: their own. Teachers: those to their classes. Staff: all.
+    """
+    qs = Submission.objects.select_related("class_ref", "student")
+    if user.is_staff:
+        pass
+    elif is_teacher:
+        qs = qs.filter(class_ref__teacher=user)
+    else:
+        qs = qs.filter(student=user)
+    if status in {"P", "A", "R"}:
+        qs = qs.filter(status=status)
+    if class_id and class_id.isdigit():
+        qs = qs.filter(class_ref_id=int(class_id))
+    if q:
+        qs = filter_by_search(qs, SearchDocument.SUBMISSION, q)
+    return qs
@@ -1,7 +1,12 @@
 from django import forms
-from .models import Submission, ProposedClass
+from django.urls import reverse
+from .models import ChunkedUpload, Submission, ProposedClass
+from .uploads import max_upload_bytes
 
 class SubmissionForm(forms.ModelForm):
+    # Set by the chunked uploader instead of sending the file with the form
+    upload_id = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Submission
         fields = ["class_ref", "file", "feedback"]
@@ -14,6 +19,10 @@ class SubmissionForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         user = kwargs.pop("user", None)
         super().__init__(*args, **kwargs)
+        self.user = user
+        # Either a file or a finished chunked upload is required (checked in clean)
+        self.fields["file"].required = False
+        self.fields["file"].widget.attrs["data-chunked-upload"] = reverse("submissions:upload_start")
         # Limit class choices to *enrolled* classes for this student
         if user is not None:
             self.fields["class_ref"].queryset = (
@@ -27,6 +36,32 @@ class SubmissionForm(forms.ModelForm):
             )
 
 
+    def clean(self):
+        cleaned = super().clean()
+        class_ref = cleaned.get("class_ref")
+        upload_id = cleaned.get("upload_id")
+        file = cleaned.get("file")
+        cleaned["upload"] = None
+        if upload_id:
+            upload = ChunkedUpload.objects.filter(
+                pk=upload_id, user=self.user, class_ref=class_ref, completed_at__isnull=False
+            ).first()
+            if upload is None:
+                raise forms.ValidationError("The uploaded file could not be found. Please upload it again.")
+            cleaned["upload"] = upload
+            self.instance.file = upload.blob_name
+            size = upload.size
+        elif file:
+            size = file.size
+        else:
+            self.add_error("file", forms.ValidationError("This field is required.", code="required"))
+            return cleaned
+        if class_ref is not None and size > max_upload_bytes(class_ref):
+            limit_mb = max_upload_bytes(class_ref) // (1024 * 1024)
+            self.add_error("file", f"File is too large; the limit for this class is {limit_mb} MB.")
+        return cleaned
+
+
 class ProposedClassForm(forms.ModelForm):
     class Meta:
         model = ProposedClass
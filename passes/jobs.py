@@ -0,0 +1,170 @@
+"""
+Database-backed background jobs.
+
+Request handlers enqueue() work instead of doing it inline; ``manage.py
+run_worker`` claims due jobs and runs them. No broker is needed, the Job
+table is the queue:
+
+    claim     one conditional UPDATE marks up to N due jobs as running and
+              locked by this worker until now + JOB_VISIBILITY_TIMEOUT.
+              Jobs whose lock expired (the worker died) are claimable again.
+    success   status Done.
+    failure   retried after JOB_RETRY_BACKOFF * 2 ** (attempt - 1) seconds
+              (capped at JOB_RETRY_BACKOFF_MAX) until max_attempts, then Failed.
+
+Tasks are plain functions registered with ``@task("name")`` and called with
+the job's JSON payload as keyword arguments. They may run more than once
+(a retry, or a lock that expired mid-run), so they must be idempotent.
+
+Admin email is recorded in passes.outbox and sent by the send_outbox task.
+
+With JOBS_EAGER (the test settings) enqueue() calls the task directly.
+"""
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name: str):
+    """Register a function as the task ``name``."""
+
+    def decorator(func):
+        TASKS[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(name: str, *, delay: float = 0, max_attempts: int | None = None, **payload) -> Job | None:
+    """Queue task ``name`` with JSON-serializable keyword arguments ``payload``."""
+    if name not in TASKS:
+        raise KeyError(f"Unknown task {name!r}")
+    if settings.JOBS_EAGER:
+        TASKS[name](**payload)
+        return None
+    return Job.objects.create(
+        task=name,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def enqueue_many(name: str, payloads, max_attempts: int | None = None) -> int:
+    """Queue one ``name`` job per payload dict in a single INSERT."""
+    payloads = list(payloads)
+    if name not in TASKS:
+        raise KeyError(f"Unknown task {name!r}")
+    if settings.JOBS_EAGER:
+        for payload in payloads:
+            TASKS[name](**payload)
+        return len(payloads)
+    now = timezone.now()
+    attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+    Job.objects.bulk_create(
+        [Job(task=name, payload=payload, run_at=now, max_attempts=attempts) for payload in payloads]
+    )
+    return len(payloads)
+
+
+def _claimable(now):
+    return Q(status="Q", run_at__lte=now) | Q(status="R", locked_until__lt=now)
+
+
+def claim(worker: str, limit: int = 1) -> list:
+    """Lock up to ``limit`` due jobs for ``worker`` and return them."""
+    now = timezone.now()
+    candidates = list(Job.objects.filter(_claimable(now)).order_by("run_at", "id").values_list("pk", flat=True)[:limit])
+    if not candidates:
+        return []
+    token = f"{worker}:{uuid.uuid4().hex[:12]}"
+    # Re-checking the condition in the UPDATE makes concurrent claims of the same row lose
+    Job.objects.filter(_claimable(now), pk__in=candidates).update(
+        status="R",
+        locked_by=token,
+        locked_until=now + timedelta(seconds=settings.JOB_VISIBILITY_TIMEOUT),
+        attempts=F("attempts") + 1,
+    )
+    return list(Job.objects.filter(locked_by=token, status="R"))
+
+
+def retry_delay(attempts: int) -> float:
+    return min(settings.JOB_RETRY_BACKOFF * 2 ** max(attempts - 1, 0), settings.JOB_RETRY_BACKOFF_MAX)
+
+
+def run_job(job: Job) -> bool:
+    """Run a claimed job and record the outcome. Returns True on success."""
+    mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        func = TASKS[job.task]
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed on attempt %s", job.pk, job.task, job.attempts, exc_info=True)
+        if job.attempts >= job.max_attempts:
+            mine.update(status="F", last_error=error, locked_until=None, finished_at=timezone.now())
+        else:
+            mine.update(
+                status="Q", last_error=error, locked_until=None,
+                run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            )
+        return False
+    mine.update(status="D", locked_until=None, finished_at=timezone.now())
+    return True
+
+
+def run_pending(worker: str = "inline", limit: int = 100) -> int:
+    """Claim and run due jobs in this thread until none are left or ``limit`` ran."""
+    done = 0
+    while done < limit:
+        jobs = claim(worker, 1)
+        if not jobs:
+            break
+        run_job(jobs[0])
+        done += 1
+    return done
+
+
+# Tasks
+
+
+@task("approve_proposals")
+def approve_proposals(proposal_ids: list) -> None:
+    from .approvals import approve_proposals as approve
+    from .models import ProposedClass
+
+    approve(ProposedClass.objects.filter(pk__in=proposal_ids))
+
+
+@task("approve_teacher_applications")
+def approve_teacher_applications(application_ids: list) -> None:
+    from .approvals import approve_teacher_applications as approve
+    from .models import TeacherApplication
+
+    approve(TeacherApplication.objects.filter(pk__in=application_ids))
+
+
+@task("send_outbox")
+def send_outbox() -> None:
+    # Raises on SMTP errors so the job is retried; unsent rows stay in the outbox
+    from .outbox import send_outbox as send
+
+    send()
+
+
+@task("compact_submission_version")
+def compact_submission_version(version_id: int) -> None:
+    from .versions import compact_version
+
+    compact_version(version_id)
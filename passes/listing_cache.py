@@ -0,0 +1,128 @@
+"""
+Cached class listings for class_list.
+
+Entries are keyed by version stamps instead of being deleted one by one:
+
+    classes          changes whenever any Class is saved or deleted, or a
+                     teacher's name changes (all listings and the year
+                     options depend on it)
+    student:<id>     changes when that student's enrollments change
+
+A listing key embeds the current stamps, so bumping a stamp makes every
+dependent entry unreachable at once; the stale entries simply expire. Stamps
+are bumped when the writing transaction commits.
+Stamps are timestamps rather than counters, so a stamp lost to eviction can
+never come back with an old value.
+
+Hits and misses are counted per process (see cache_counters()).
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .filters import filter_classes
+from .models import Class
+
+GLOBAL_SCOPE = "classes"
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.LISTING_CACHE_ALIAS]
+
+
+def _stamp_key(scope: str) -> str:
+    return f"passes:listing:stamp:{scope}"
+
+
+def student_scope(user_id) -> str:
+    return f"student:{user_id}"
+
+
+def _set_stamps(scopes) -> None:
+    stamp = time.time_ns()
+    _cache().set_many({_stamp_key(scope): stamp for scope in scopes}, timeout=None)
+
+
+def bump(*scopes: str) -> None:
+    """
+    Invalidate every cached entry that depends on one of ``scopes``, once the
+    current transaction commits (right away outside one). Bumping earlier would
+    let a concurrent request cache pre-commit data under the new stamp.
+    """
+    if scopes:
+        transaction.on_commit(lambda: _set_stamps(scopes))
+
+
+def _stamps(cache, scopes) -> str:
+    keys = [_stamp_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return ".".join(str(found[key]) for key in keys)
+
+
+def _count(name: str, hit: bool) -> None:
+    with _counters_lock:
+        _counters[f"{name}.{'hits' if hit else 'misses'}"] += 1
+
+
+def cache_counters() -> dict:
+    """Hit/miss counts of this process since start, e.g. {"years.hits": 12, ...}."""
+    with _counters_lock:
+        return dict(_counters)
+
+
+def cached(name: str, key: str, scopes, compute):
+    """``compute()``, cached under ``name``/``key`` until one of ``scopes`` is bumped."""
+    if settings.LISTING_CACHE_TIMEOUT <= 0:
+        return compute()
+    cache = _cache()
+    full_key = f"passes:listing:{name}:{key}:{_stamps(cache, scopes)}"
+    value = cache.get(full_key)
+    _count(name, value is not None)
+    if value is None:
+        value = compute()
+        cache.set(full_key, value, settings.LISTING_CACHE_TIMEOUT)
+    return value
+
+
+def _listing_scope(user, is_teacher: bool):
+    if user.is_staff:
+        return "staff", [GLOBAL_SCOPE]
+    if is_teacher:
+        return f"teacher:{user.pk}", [GLOBAL_SCOPE]
+    return f"student:{user.pk}", [GLOBAL_SCOPE, student_scope(user.pk)]
+
+
+def listing_stamps(user=None, is_teacher: bool = False) -> str:
+    """Current version stamps a user's class listing depends on (global ones without a user)."""
+    scopes = [GLOBAL_SCOPE] if user is None else _listing_scope(user, is_teacher)[1]
+    return _stamps(_cache(), scopes)
+
+
+def year_options() -> list:
+    """Distinct class years, for the class_list filter."""
+    return cached(
+        "years", "all", [GLOBAL_SCOPE],
+        lambda: list(Class.objects.order_by().values_list("year", flat=True).distinct().order_by("year")),
+    )
+
+
+def class_listing(user, is_teacher: bool, q: str = "", year: str | None = None, state: str = "") -> list:
+    """filter_classes() as a list, cached per role (staff share one entry per filter)."""
+    owner, scopes = _listing_scope(user, is_teacher)
+    filters = hashlib.sha1(f"{q}\0{year or ''}\0{state}".encode()).hexdigest()[:16]
+    return cached(
+        "classes", f"{owner}:{filters}", scopes,
+        lambda: list(filter_classes(user, is_teacher, q=q, year=year, state=state)),
+    )
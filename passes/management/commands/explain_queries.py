@@ -0,0 +1,68 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from passes.enrollment import year_students_missing_enrollment
+from passes.filters import filter_classes, filter_submissions
+from passes.models import Class, Enrollment, ProposedClass, Submission, TeacherApplication
+from passes.views import roster_enrollments
+
+# SQLite: "SCAN passes_submission" without an index (an FTS5 table answering
+# MATCH shows as "SCAN ... VIRTUAL TABLE INDEX n:M..."); PostgreSQL: "Seq Scan on passes_submission"
+SQLITE_SCAN = re.compile(
+    r"\bSCAN (\w+)\b(?! USING (?:COVERING )?INDEX| USING INTEGER PRIMARY KEY| VIRTUAL TABLE INDEX \d+:M)"
+)
+POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN (QUERY PLAN) for the querysets behind each view and report full-table scans."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--verbose-plans", action="store_true", help="Print the full plan for every query")
+        parser.add_argument("--fail-on-scan", action="store_true", help="Exit with an error if any query scans a table")
+
+    def querysets(self):
+        User = get_user_model()
+        # Placeholder rows: only the shape of the SQL matters for the plan
+        student = User(pk=0, username="explain")
+        staff = User(pk=0, username="explain", is_staff=True)
+        cls = Class(pk=0, year=1)
+
+        yield "class_list (student)", filter_classes(student, False, q="a", year="1")
+        yield "class_list (teacher)", filter_classes(student, True)
+        yield "class_list (staff)", filter_classes(staff, False, year="1")
+        yield "class_list year options", Class.objects.order_by().values_list("year", flat=True).distinct().order_by("year")
+        yield "submission_list (student)", filter_submissions(student, False).order_by("-submitted_at", "-pk")
+        yield "submission_list (teacher, pending)", filter_submissions(student, True, status="P").order_by("-submitted_at", "-pk")
+        yield "submission_list (staff, class)", filter_submissions(staff, False, class_id="1").order_by("-submitted_at", "-pk")
+        yield "submission_list (staff, status)", filter_submissions(staff, False, status="A").order_by("-submitted_at", "-pk")
+        yield "class_roster", roster_enrollments(cls)
+        yield "class_roster enrollment check", Enrollment.objects.filter(student=student, class_ref=cls)
+        yield "my_proposals", ProposedClass.objects.filter(teacher=student).order_by("-created_at")
+        yield "auto-enrollment (missing students)", year_students_missing_enrollment(cls)
+        yield "admin pending submissions", Submission.objects.filter(class_ref=cls, status="P").order_by("-submitted_at")
+        yield "admin teacher applications", TeacherApplication.objects.filter(status="P").order_by("-created_at")
+        yield "admin proposed classes", ProposedClass.objects.filter(status="P").order_by("-created_at")
+
+    def handle(self, *args, **options):
+        pattern = POSTGRES_SCAN if connection.vendor == "postgresql" else SQLITE_SCAN
+        flagged = 0
+        for label, qs in self.querysets():
+            plan = qs.explain()
+            scans = sorted(set(pattern.findall(plan)))
+            if scans:
+                flagged += 1
+                self.stdout.write(self.style.WARNING(f"{label}: full scan of {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{label}: ok"))
+            if options["verbose_plans"] or scans:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        summary = f"{flagged} queryset(s) with full-table scans."
+        if flagged and options["fail_on_scan"]:
+            raise CommandError(summary)
+        self.stdout.write(summary)
@@ -2,8 +2,8 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from datetime import timedelta
 
-from django.contrib.auth import get_user_model
-from passes.models import ProposedClass, Class, Enrollment
+from passes.enrollment import EnrollmentResult, enroll_year_students
+from passes.models import ProposedClass, Class
 
 
 class Command(BaseCommand):
@@ -11,13 +11,13 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--deadline-days", type=int, default=30, help="Default deadline offset in days")
+        parser.add_argument("--batch-size", type=int, default=None, help="Enrollment insert batch size")
 
     def handle(self, *args, **options):
-        User = get_user_model()
         count_classes = 0
-        count_enrolls = 0
+        enrolled = EnrollmentResult()
         deadline = timezone.now() + timedelta(days=options["deadline_days"])
-        approved = ProposedClass.objects.filter(status="A")
+        approved = ProposedClass.objects.filter(status="A").select_related("teacher")
         for pc in approved:
             cls, created = Class.objects.get_or_create(
                 name=pc.name,
@@ -28,12 +28,9 @@ class Command(BaseCommand):
             if created:
                 count_classes += 1
             # Enroll same-year students
-            students = User.objects.filter(profile__student_year=pc.year)
-            for s in students:
-                _, en_created = Enrollment.objects.get_or_create(student=s, class_ref=cls)
-                if en_created:
-                    count_enrolls += 1
+            enrolled += enroll_year_students(cls, batch_size=options["batch_size"])
 
         self.stdout.write(self.style.SUCCESS(
-            f"Ensured {approved.count()} approved proposals; created {count_classes} classes and {count_enrolls} enrollments."
+            f"Ensured {approved.count()} approved proposals; created {count_classes} classes and "
+            f"{enrolled.created} enrollments ({enrolled.existing} already existed)."
         ))
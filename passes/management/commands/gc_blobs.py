@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from passes.blobs import collect_garbage, recount_references
+
+
+class Command(BaseCommand):
+    help = "Delete submission blobs that no Submission references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--grace-minutes", type=int, default=60, help="Keep anything younger than this")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted without deleting")
+        parser.add_argument("--include-legacy", action="store_true",
+                            help="Also delete unreferenced files under the old submissions/ layout")
+
+    def handle(self, *args, **options):
+        if not options["dry_run"]:
+            fixed = recount_references()
+            if fixed:
+                self.stdout.write(f"Corrected reference counts on {fixed} blob(s).")
+
+        report = collect_garbage(
+            grace=timedelta(minutes=options["grace_minutes"]),
+            dry_run=options["dry_run"],
+            include_legacy=options["include_legacy"],
+        )
+        for name in report.blobs + report.orphan_files + report.legacy_files:
+            self.stdout.write(f"  {name}")
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {len(report.blobs)} unreferenced blob(s), {len(report.orphan_files)} orphan file(s) "
+            f"and {len(report.legacy_files)} legacy file(s); {report.bytes_freed} bytes. "
+            f"{report.expired_uploads} expired chunked upload(s)."
+        ))
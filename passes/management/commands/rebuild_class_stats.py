@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from passes.models import ClassStats
+from passes.stats import COUNTER_FIELDS, compute_class_stats, refresh_class_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized per-class submission statistics from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--class", dest="class_ids", type=int, action="append",
+                            help="Only this class id (repeatable)")
+        parser.add_argument("--check", action="store_true",
+                            help="Report classes whose stored counters drifted, without writing")
+
+    def handle(self, *args, **options):
+        class_ids = options["class_ids"]
+        if options["check"]:
+            stored = {
+                row["class_ref_id"]: row
+                for row in ClassStats.objects.values("class_ref_id", *COUNTER_FIELDS)
+            }
+            drifted = 0
+            for pk, counters in compute_class_stats(class_ids).items():
+                current = stored.get(pk)
+                if current is None or any(current[name] != value for name, value in counters.items()):
+                    drifted += 1
+                    self.stdout.write(f"  class {pk}: stored {current and {n: current[n] for n in counters}}, actual {counters}")
+            self.stdout.write(self.style.SUCCESS(f"{drifted} class(es) out of date."))
+            return
+
+        count = refresh_class_stats(class_ids)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt statistics for {count} class(es)."))
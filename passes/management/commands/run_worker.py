@@ -0,0 +1,58 @@
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from passes.jobs import claim, run_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (approvals, enrollment, admin email)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=2, help="Jobs run in parallel threads")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to wait when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit once no job is due")
+        parser.add_argument("--name", default=f"{socket.gethostname()}:{os.getpid()}",
+                            help="Worker name recorded on claimed jobs")
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        stopping = threading.Event()
+        if not options["once"] and threading.current_thread() is threading.main_thread():
+            # Finish the jobs in hand, then exit
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stopping.set())
+
+        pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job") if concurrency > 1 else None
+        run = pool.map if pool else map
+        ran = failed = 0
+        try:
+            while not stopping.is_set():
+                jobs = claim(options["name"], concurrency)
+                if not jobs:
+                    if options["once"]:
+                        break
+                    close_old_connections()
+                    stopping.wait(options["poll_interval"])
+                    continue
+                for ok in run(self._run_in_thread if pool else run_job, jobs):
+                    ran += 1
+                    failed += not ok
+        finally:
+            if pool:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} job(s), {failed} failed."))
+
+    @staticmethod
+    def _run_in_thread(job) -> bool:
+        try:
+            return run_job(job)
+        finally:
+            # Pool threads keep their own connection; honour CONN_MAX_AGE like requests do
+            close_old_connections()
@@ -0,0 +1,36 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from passes.deadlines import sweep_deadlines
+
+
+class Command(BaseCommand):
+    help = "Close classes whose deadline passed, mark who missed it and refresh the closing-soon list."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true",
+                            help="Keep sweeping every --interval seconds (otherwise run once, e.g. from cron)")
+        parser.add_argument("--interval", type=float, default=settings.DEADLINE_SWEEP_INTERVAL)
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            self._sweep()
+            return
+        stopping = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stopping.set())
+        while not stopping.is_set():
+            self._sweep()
+            close_old_connections()
+            stopping.wait(options["interval"])
+
+    def _sweep(self):
+        result = sweep_deadlines()
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {result.closed} class(es) ({result.marked} student(s) missed the deadline), "
+            f"reopened {result.reopened}."
+        ))
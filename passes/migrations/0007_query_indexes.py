@@ -0,0 +1,55 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passes', '0006_class_description'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['year', 'deadline'], name='class_year_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['teacher', 'deadline'], name='class_teacher_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['student_year'], name='profile_student_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposedclass',
+            index=models.Index(fields=['status', '-created_at'], name='proposed_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposedclass',
+            index=models.Index(fields=['teacher', '-created_at'], name='proposed_teacher_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['-submitted_at', '-id'], name='submission_submitted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['class_ref', 'status'], name='submission_class_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['status', '-submitted_at'], name='submission_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(condition=models.Q(('status', 'P')), fields=['class_ref', '-submitted_at'], name='submission_pending_class_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacherapplication',
+            index=models.Index(fields=['status', '-created_at'], name='teacherapp_status_created_idx'),
+        ),
+    ]
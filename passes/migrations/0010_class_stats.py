@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef
+
+
+def build_class_stats(apps, schema_editor):
+    Class = apps.get_model("passes", "Class")
+    ClassStats = apps.get_model("passes", "ClassStats")
+    Enrollment = apps.get_model("passes", "Enrollment")
+    Submission = apps.get_model("passes", "Submission")
+    enrolled = dict(
+        Enrollment.objects.order_by().values("class_ref_id").annotate(n=Count("pk")).values_list("class_ref_id", "n")
+    )
+    by_status = {}
+    is_enrolled = Enrollment.objects.filter(student_id=OuterRef("student_id"), class_ref_id=OuterRef("class_ref_id"))
+    rows = (
+        Submission.objects.filter(Exists(is_enrolled)).order_by()
+        .values("class_ref_id", "status").annotate(n=Count("pk"))
+    )
+    for row in rows:
+        by_status.setdefault(row["class_ref_id"], {})[row["status"]] = row["n"]
+    stats = []
+    for pk in Class.objects.values_list("pk", flat=True):
+        counts = by_status.get(pk, {})
+        stats.append(ClassStats(
+            class_ref_id=pk,
+            enrolled=enrolled.get(pk, 0),
+            submitted=sum(counts.values()),
+            approved=counts.get("A", 0),
+            rejected=counts.get("R", 0),
+            pending=counts.get("P", 0),
+        ))
+    ClassStats.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passes', '0009_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassStats',
+            fields=[
+                ('class_ref', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='passes.class')),
+                ('enrolled', models.IntegerField(default=0)),
+                ('submitted', models.IntegerField(default=0)),
+                ('approved', models.IntegerField(default=0)),
+                ('rejected', models.IntegerField(default=0)),
+                ('pending', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Class stats',
+            },
+        ),
+        migrations.RunPython(build_class_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:25
+
+from django.db import migrations, models
+
+SQLITE_INDEX = [
+    # External-content FTS5 table over passes_searchdocument, synced by triggers
+    """CREATE VIRTUAL TABLE passes_searchdocument_fts USING fts5(
+        title, body,
+        content='passes_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER passes_searchdocument_ai AFTER INSERT ON passes_searchdocument BEGIN
+        INSERT INTO passes_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER passes_searchdocument_ad AFTER DELETE ON passes_searchdocument BEGIN
+        INSERT INTO passes_searchdocument_fts(passes_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER passes_searchdocument_au AFTER UPDATE ON passes_searchdocument BEGIN
+        INSERT INTO passes_searchdocument_fts(passes_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO passes_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS passes_searchdocument_au",
+    "DROP TRIGGER IF EXISTS passes_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS passes_searchdocument_ai",
+    "DROP TABLE IF EXISTS passes_searchdocument_fts",
+]
+# Same expression as passes.search._pg_vector(), so the planner can use the index
+POSTGRES_INDEX = [
+    """CREATE INDEX passes_searchdocument_tsv ON passes_searchdocument USING gin ((
+        setweight(to_tsvector('simple'::regconfig, COALESCE((title)::text, '')), 'A') ||
+        setweight(to_tsvector('simple'::regconfig, COALESCE((body)::text, '')), 'B')
+    ))""",
+]
+POSTGRES_DROP = ["DROP INDEX IF EXISTS passes_searchdocument_tsv"]
+
+
+def _run(schema_editor, statements):
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {"sqlite": SQLITE_INDEX, "postgresql": POSTGRES_INDEX})
+    Class = apps.get_model("passes", "Class")
+    Submission = apps.get_model("passes", "Submission")
+    SearchDocument = apps.get_model("passes", "SearchDocument")
+    docs = [
+        SearchDocument(kind="class", object_id=cls.pk, title=cls.name,
+                       body=" ".join(filter(None, [cls.description, cls.teacher.username])))
+        for cls in Class.objects.select_related("teacher").iterator()
+    ]
+    docs += [
+        SearchDocument(kind="submission", object_id=sub.pk,
+                       title=f"{sub.class_ref.name} {sub.student.username}", body=sub.feedback)
+        for sub in Submission.objects.select_related("class_ref", "student").iterator()
+    ]
+    SearchDocument.objects.bulk_create(docs, batch_size=500)
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passes', '0010_class_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='uq_searchdocument_kind_object')],
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
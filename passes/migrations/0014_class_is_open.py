@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+
+def close_past_classes(apps, schema_editor):
+    # What the first sweep_deadlines run would do
+    Class = apps.get_model("passes", "Class")
+    Enrollment = apps.get_model("passes", "Enrollment")
+    Submission = apps.get_model("passes", "Submission")
+    closed = Class.objects.filter(deadline__lte=timezone.now())
+    closed.update(is_open=False)
+    submitted = Submission.objects.filter(student=OuterRef("student_id"), class_ref=OuterRef("class_ref_id"))
+    Enrollment.objects.filter(class_ref__in=closed).filter(~Exists(submitted)).update(missed_deadline=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passes', '0013_outbox_email'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='class',
+            name='is_open',
+            field=models.BooleanField(default=True, help_text='Cleared by sweep_deadlines once the deadline has passed'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='missed_deadline',
+            field=models.BooleanField(default=False, help_text='Had not submitted when sweep_deadlines closed the class'),
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['is_open', 'deadline'], name='class_open_deadline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(condition=models.Q(('missed_deadline', True)), fields=['class_ref'], name='enrollment_missed_idx'),
+        ),
+        migrations.RunPython(close_past_classes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:52
+
+import os
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def add_first_versions(apps, schema_editor):
+    # Existing files become version 1; the current file needs no blob reference
+    Submission = apps.get_model("passes", "Submission")
+    SubmissionVersion = apps.get_model("passes", "SubmissionVersion")
+    StoredBlob = apps.get_model("passes", "StoredBlob")
+    sizes = dict(StoredBlob.objects.values_list("name", "size"))
+    versions = [
+        SubmissionVersion(
+            submission_id=pk, number=1, size=sizes.get(name, 0),
+            original_name=original_name or os.path.basename(name),
+        )
+        for pk, name, original_name in Submission.objects.exclude(file="")
+        .values_list("pk", "file", "original_name").iterator()
+    ]
+    SubmissionVersion.objects.bulk_create(versions, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passes', '0014_class_is_open'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('original_name', models.CharField(blank=True, default='', max_length=255)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('blob_name', models.CharField(blank=True, default='', help_text='Full copy in submission storage', max_length=255)),
+                ('delta', models.BinaryField(blank=True, help_text='zlib-compressed delta from the next version', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='passes.submission')),
+            ],
+            options={
+                'ordering': ['submission', '-number'],
+                'indexes': [models.Index(condition=models.Q(('blob_name', ''), _negated=True), fields=['blob_name'], name='version_blob_idx')],
+                'constraints': [models.UniqueConstraint(fields=('submission', 'number'), name='uq_submission_version_number')],
+            },
+        ),
+        migrations.RunPython(add_first_versions, migrations.RunPython.noop),
+    ]
@@ -6,6 +6,10 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 from datetime import timedelta
 from django.conf import settings
+import os
+import uuid
+
+from .storage import submission_storage
 
 User = get_user_model()
 
@@ -22,6 +26,12 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     student_year = models.PositiveIntegerField(null=True, blank=True, help_text="Student's year group if applicable")
 
+    class Meta:
+        indexes = [
+            # Year-wide enrollment looks up every student of a year
+            models.Index(fields=["student_year"], name="profile_student_year_idx"),
+        ]
+
     def __str__(self):
         return f"Profile({self.user})"
 
@@ -36,6 +46,12 @@ class Class(models.Model):
     year = models.PositiveIntegerField(help_text="Year group, e.g., 1, 2, 3")
     deadline = models.DateTimeField()
     description = models.TextField(blank=True, default="", help_text="Requirements to pass this class")
+    max_upload_mb = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Largest submission file in MB (blank: site default)"
+    )
+    is_open = models.BooleanField(
+        default=True, help_text="Cleared by sweep_deadlines once the deadline has passed"
+    )
 
     class Meta:
         ordering = ["deadline", "name"]
@@ -44,13 +60,40 @@ class Class(models.Model):
             # Optional: avoid duplicate class names for the same year/teacher
             models.UniqueConstraint(fields=["name", "year", "teacher"], name="uq_class_name_year_teacher")
         ]
+        indexes = [
+            # class_list year filter + deadline ordering, year-wide enrollment
+            models.Index(fields=["year", "deadline"], name="class_year_deadline_idx"),
+            # teacher's class_list ordered by deadline
+            models.Index(fields=["teacher", "deadline"], name="class_teacher_deadline_idx"),
+            # open/closed filter and the deadline sweeper
+            models.Index(fields=["is_open", "deadline"], name="class_open_deadline_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} (Y{self.year})"
 
+    def save(self, *args, **kwargs):
+        # New classes start closed if their deadline already passed, and moving
+        # the deadline into the future reopens one. Closing an existing class
+        # is left to sweep_deadlines, which also marks who missed it.
+        deadline = self._meta.get_field("deadline").to_python(self.deadline)
+        if deadline:
+            if timezone.is_naive(deadline):
+                deadline = timezone.make_aware(deadline)
+            open_now = deadline > timezone.now()
+            if self._state.adding:
+                self.is_open = open_now
+            elif open_now and not self.is_open:
+                self.is_open = True
+                update_fields = kwargs.get("update_fields")
+                if update_fields is not None:
+                    kwargs["update_fields"] = {*update_fields, "is_open"}
+        super().save(*args, **kwargs)
+
     @property
     def is_past_deadline(self) -> bool:
-        return timezone.now() > self.deadline
+        """Closed by the deadline sweeper (passes/deadlines.py)."""
+        return not self.is_open
 
 
 class Enrollment(models.Model):
@@ -61,10 +104,17 @@ class Enrollment(models.Model):
     student = models.ForeignKey(User, on_delete=models.CASCADE, related_name="enrollments")
     class_ref = models.ForeignKey(Class, on_delete=models.CASCADE, related_name="enrollments")
     joined_at = models.DateTimeField(auto_now_add=True)
+    missed_deadline = models.BooleanField(
+        default=False, help_text="Had not submitted when sweep_deadlines closed the class"
+    )
 
     class Meta:
         unique_together = [("student", "class_ref")]
         ordering = ["-joined_at"]
+        indexes = [
+            # Deadline reports list the students who missed a class
+            models.Index(fields=["class_ref"], condition=models.Q(missed_deadline=True), name="enrollment_missed_idx"),
+        ]
 
     def __str__(self):
         return f"{self.student} ↔ {self.class_ref}"
@@ -91,6 +141,10 @@ class TeacherApplication(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # admin changelist filtered by status, newest first
+            models.Index(fields=["status", "-created_at"], name="teacherapp_status_created_idx"),
+        ]
 
     def __str__(self):
         return f"TeacherApplication({self.user}, status={self.get_status_display()})"
@@ -153,17 +207,35 @@ class ProposedClass(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["teacher", "name", "year", "status"], name="uq_proposedclass_teacher_name_year_status")
         ]
+        indexes = [
+            # admin changelist filtered by status, newest first
+            models.Index(fields=["status", "-created_at"], name="proposed_status_created_idx"),
+            # my_proposals: a teacher's proposals, newest first
+            models.Index(fields=["teacher", "-created_at"], name="proposed_teacher_created_idx"),
+        ]
 
     def __str__(self):
         return f"ProposedClass({self.name}, Y{self.year}, {self.get_status_display()})"
 
     @transaction.atomic
     def approve(self, default_deadline_days: int | None = None) -> 'Class':
-        # Ensure a Class exists and students are enrolled; if status isn't approved, mark approved
+        cls, _ = self.approve_and_enroll()
+        return cls
+
+    @transaction.atomic
+    def approve_and_enroll(self, batch_size: int | None = None):
+        """
+        Ensure a Class exists for this proposal and matching-year students are enrolled.
+        Returns (class, EnrollmentResult).
+        """
+        from .enrollment import enroll_year_students  # local import to avoid circular
+
+        # If status isn't approved, mark approved. Use update() so the post_save
+        # signal doesn't re-run the whole approval a second time.
         if self.status != "A":
             self.status = "A"
             self.decided_at = timezone.now()
-            self.save(update_fields=["status", "decided_at"])
+            ProposedClass.objects.filter(pk=self.pk).update(status=self.status, decided_at=self.decided_at)
 
         # Create or fetch the class - use the deadline and description from the proposal
         cls, created = Class.objects.get_or_create(
@@ -183,16 +255,14 @@ class ProposedClass(models.Model):
             cls.save(update_fields=["deadline", "description"])
         
         # Auto-enroll matching year students
-        students = User.objects.filter(profile__student_year=self.year)
-        for s in students:
-            Enrollment.objects.get_or_create(student=s, class_ref=cls)
-        return cls
+        return cls, enroll_year_students(cls, batch_size=batch_size)
 
 
 def submission_upload_to(instance: "Submission", filename: str) -> str:
     """
-    Store per-class and per-student for tidy media folders:
-    media/submissions/<class_id>/<student_id>/<filename>
+    Requested name for an upload: submissions/<class_id>/<student_id>/<filename>.
+    The content-addressed submission storage only keeps the extension and
+    stores the file under its hash; files saved before that keep this layout.
     """
     return f"submissions/{instance.class_ref_id}/{instance.student_id}/{filename}"
 
@@ -211,9 +281,11 @@ class Submission(models.Model):
     class_ref = models.ForeignKey(Class, on_delete=models.CASCADE, related_name="submissions")
     file = models.FileField(
         upload_to=submission_upload_to,
+        storage=submission_storage,
         validators=[FileExtensionValidator(allowed_extensions=ALLOWED_EXTS)],
         help_text=f"Allowed: {', '.join(ALLOWED_EXTS)}",
     )
+    original_name = models.CharField(max_length=255, blank=True, default="", help_text="Filename as uploaded")
     status = models.CharField(max_length=1, choices=STATUS, default="P")
     feedback = models.TextField(blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
@@ -225,10 +297,36 @@ class Submission(models.Model):
             # A student should submit at most once per class (you can relax later if you want versions)
             models.UniqueConstraint(fields=["student", "class_ref"], name="uq_student_class_single_submission")
         ]
+        indexes = [
+            # submission_list keyset pagination: newest first, id as tie-breaker
+            models.Index(fields=["-submitted_at", "-id"], name="submission_submitted_idx"),
+            # status / class filters and roster statistics
+            models.Index(fields=["class_ref", "status"], name="submission_class_status_idx"),
+            models.Index(fields=["status", "-submitted_at"], name="submission_status_idx"),
+            # review queue: pending submissions per class only
+            models.Index(
+                fields=["class_ref", "-submitted_at"],
+                condition=models.Q(status="P"),
+                name="submission_pending_class_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.student} → {self.class_ref} [{self.get_status_display()}]"
 
+    def save(self, *args, **kwargs):
+        # Stored names are content hashes; remember what the student called the file
+        if self.file and not self.file._committed:
+            self.original_name = os.path.basename(self.file.name)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "file" in update_fields:
+                kwargs["update_fields"] = {*update_fields, "original_name"}
+        super().save(*args, **kwargs)
+
+    @property
+    def display_name(self) -> str:
+        return self.original_name or os.path.basename(self.file.name)
+
     # passes/models.py
     def clean(self):
         if not self.student_id or not self.class_ref_id:
@@ -237,3 +335,194 @@ class Submission(models.Model):
             raise ValidationError("You are not enrolled in this class.")
         if timezone.now() > self.class_ref.deadline and self.status == "P":
             raise ValidationError("Deadline has passed for this class.")
+
+
+class SubmissionVersion(models.Model):
+    """
+    One uploaded file in a submission's history, numbered from 1. The newest
+    version is the submission's current file. Older ones keep either a
+    reference to their blob (``blob_name``) or, for text-like files, a
+    compressed delta that rebuilds them from the next version (see
+    passes.versions).
+    """
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name="versions")
+    number = models.PositiveIntegerField()
+    original_name = models.CharField(max_length=255, blank=True, default="")
+    size = models.PositiveBigIntegerField(default=0)
+    blob_name = models.CharField(max_length=255, blank=True, default="", help_text="Full copy in submission storage")
+    delta = models.BinaryField(null=True, blank=True, help_text="zlib-compressed delta from the next version")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["submission", "-number"]
+        constraints = [
+            models.UniqueConstraint(fields=["submission", "number"], name="uq_submission_version_number"),
+        ]
+        indexes = [
+            # gc_blobs checks blob references
+            models.Index(fields=["blob_name"], condition=~models.Q(blob_name=""), name="version_blob_idx"),
+        ]
+
+    def __str__(self):
+        return f"SubmissionVersion({self.submission_id} v{self.number})"
+
+    @property
+    def is_current(self) -> bool:
+        return not self.blob_name and self.delta is None
+
+
+class ClassStats(models.Model):
+    """
+    Denormalized submission counts for a class, matching the roster statistics:
+    only submissions by currently enrolled students are counted. Kept current
+    by passes.stats; ``manage.py rebuild_class_stats`` recomputes them.
+    """
+    class_ref = models.OneToOneField(Class, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    # Plain integers: a drifted counter must never make a signal fail a CHECK constraint
+    enrolled = models.IntegerField(default=0)
+    submitted = models.IntegerField(default=0)
+    approved = models.IntegerField(default=0)
+    rejected = models.IntegerField(default=0)
+    pending = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Class stats"
+
+    def __str__(self):
+        return f"ClassStats({self.class_ref_id}, {self.submitted}/{self.enrolled} submitted)"
+
+    @property
+    def not_submitted(self) -> int:
+        return self.enrolled - self.submitted
+
+
+class SearchDocument(models.Model):
+    """
+    Text indexed for the ``q`` search of class_list and submission_list: one
+    row per Class and per Submission, kept current by passes.search. The
+    full-text index over it is backend specific (FTS5 on SQLite, a tsvector
+    GIN index on PostgreSQL) and lives in migration 0011.
+    """
+    CLASS = "class"
+    SUBMISSION = "submission"
+
+    kind = models.CharField(max_length=16)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True, default="")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="uq_searchdocument_kind_object"),
+        ]
+
+    def __str__(self):
+        return f"SearchDocument({self.kind}:{self.object_id})"
+
+
+class StoredBlob(models.Model):
+    """
+    One unique file in the content-addressed submission storage.
+    ref_count is the number of Submissions pointing at it; gc_blobs deletes
+    unreferenced blobs.
+    """
+    name = models.CharField(max_length=255, unique=True, help_text="Storage path, e.g. blobs/3f/a2/<sha256>.txt")
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"StoredBlob({self.sha256[:12]}, refs={self.ref_count})"
+
+
+class ChunkedUpload(models.Model):
+    """
+    A resumable upload sent in Content-Range pieces. Once all bytes arrived the
+    file is moved into blob storage and ``blob_name`` is set; the submission
+    form then refers to it by id.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chunked_uploads")
+    class_ref = models.ForeignKey(Class, on_delete=models.CASCADE, related_name="chunked_uploads")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    blob_name = models.CharField(max_length=255, blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"ChunkedUpload({self.filename}, {self.offset}/{self.size})"
+
+    @property
+    def is_complete(self) -> bool:
+        return self.completed_at is not None
+
+
+class Job(models.Model):
+    """
+    A unit of background work for ``manage.py run_worker`` (see passes.jobs).
+    A claimed job is hidden from other workers until ``locked_until``; if its
+    worker dies, it becomes claimable again after that.
+    """
+    STATUS = [
+        ("Q", "Queued"),
+        ("R", "Running"),
+        ("D", "Done"),
+        ("F", "Failed"),
+    ]
+
+    task = models.CharField(max_length=100, help_text="Registered task name, e.g. approve_proposed_class")
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=1, choices=STATUS, default="Q")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now, help_text="Not run before this time (retry backoff)")
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=64, blank=True, default="")
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["run_at", "id"]
+        indexes = [
+            # Workers claim due jobs in run_at order
+            models.Index(fields=["status", "run_at"], name="job_status_run_at_idx"),
+        ]
+
+    def __str__(self):
+        return f"Job({self.task}, {self.get_status_display()}, attempt {self.attempts})"
+
+
+class OutboxEmail(models.Model):
+    """
+    An admin notification waiting to be mailed. Rows are written in the same
+    transaction as the event they describe; passes.outbox sends them in
+    batches, merging bursts of the same kind into one digest.
+    """
+    kind = models.CharField(max_length=50, help_text="Digest group, e.g. teacher_application")
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        indexes = [
+            # The sender only ever reads unsent rows
+            models.Index(fields=["created_at"], condition=models.Q(sent_at__isnull=True), name="outbox_unsent_idx"),
+        ]
+
+    def __str__(self):
+        return f"OutboxEmail({self.kind}, {'sent' if self.sent_at else 'pending'})"
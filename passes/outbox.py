@@ -0,0 +1,121 @@
+"""
+Transactional outbox for admin email.
+
+notify_admins() only inserts an OutboxEmail row (inside the caller's
+transaction) and makes sure a "send_outbox" job is queued to run
+OUTBOX_DIGEST_WINDOW seconds later. Everything recorded in that window is
+sent by one send_outbox() call over a single SMTP connection; a kind with at
+least OUTBOX_DIGEST_THRESHOLD messages in the batch goes out as one digest
+instead of one email each. Rows are marked sent message by message, so a
+retry after an SMTP error only resends what did not go out. A failing message
+does not hold up the rest of the batch; after OUTBOX_MAX_ATTEMPTS failed
+sends it is left for an admin to inspect or retry. With JOBS_EAGER the outbox
+is sent right away.
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import Job, OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+SEND_TASK = "send_outbox"
+
+
+def admin_recipients() -> list:
+    return [admin[1] if isinstance(admin, (list, tuple)) else admin for admin in settings.ADMINS]
+
+
+def notify_admins(kind: str, subject: str, body: str) -> OutboxEmail | None:
+    """Record an email to ADMINS; it is sent (possibly in a digest) by the worker."""
+    if not settings.ADMINS:
+        return None
+    message = OutboxEmail.objects.create(kind=kind, subject=subject, body=body)
+    schedule_send(settings.OUTBOX_DIGEST_WINDOW)
+    return message
+
+
+def schedule_send(delay: float = 0) -> None:
+    """Make sure a sender runs within ``delay`` seconds (now, with JOBS_EAGER)."""
+    if settings.JOBS_EAGER:
+        try:
+            send_outbox()
+        except Exception:
+            # Like mail_admins(fail_silently=True); the row stays for the next send
+            logger.warning("Sending admin email failed", exc_info=True)
+    elif not Job.objects.filter(task=SEND_TASK, status="Q").exists():
+        # One queued sender picks up everything recorded before it runs
+        enqueue(SEND_TASK, delay=delay)
+
+
+def _email(subject: str, body: str, recipients) -> EmailMessage:
+    return EmailMessage(
+        f"{settings.EMAIL_SUBJECT_PREFIX}{subject}", body, settings.SERVER_EMAIL, recipients,
+    )
+
+
+def build_messages(rows, recipients) -> list:
+    """
+    (EmailMessage, row ids) pairs: one per row, or one per kind once it
+    reaches the digest threshold.
+    """
+    by_kind = defaultdict(list)
+    for row in rows:
+        by_kind[row.kind].append(row)
+    messages = []
+    for kind, group in by_kind.items():
+        if len(group) >= settings.OUTBOX_DIGEST_THRESHOLD:
+            body = f"\n\n{'-' * 40}\n\n".join(f"{row.subject}\n\n{row.body}" for row in group)
+            digest = _email(f"Digest of {len(group)}: {group[0].subject}", body, recipients)
+            messages.append((digest, [row.pk for row in group]))
+        else:
+            messages.extend((_email(row.subject, row.body, recipients), [row.pk]) for row in group)
+    return messages
+
+
+def pending_emails():
+    """Unsent rows that have not used up their OUTBOX_MAX_ATTEMPTS."""
+    return OutboxEmail.objects.filter(sent_at__isnull=True, attempts__lt=settings.OUTBOX_MAX_ATTEMPTS)
+
+
+def send_outbox(batch_size: int | None = None) -> int:
+    """
+    Send pending rows in batches over one connection. Returns rows sent.
+    Messages that fail are recorded and skipped; the first error is raised
+    once everything else was sent, so the job is retried with backoff.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    recipients = admin_recipients()
+    sent, failed, error = 0, set(), None
+    with get_connection(fail_silently=False) as connection:
+        while True:
+            rows = list(pending_emails().exclude(pk__in=failed)[:batch_size])
+            if not rows:
+                break
+            if not recipients:
+                OutboxEmail.objects.filter(pk__in=[row.pk for row in rows]).update(sent_at=timezone.now())
+                sent += len(rows)
+                continue
+            for message, ids in build_messages(rows, recipients):
+                try:
+                    connection.send_messages([message])
+                except Exception as exc:
+                    OutboxEmail.objects.filter(pk__in=ids).update(attempts=F("attempts") + 1, last_error=repr(exc))
+                    failed.update(ids)
+                    error = error or exc
+                    continue
+                OutboxEmail.objects.filter(pk__in=ids).update(sent_at=timezone.now())
+                sent += len(ids)
+    if error is not None:
+        given_up = OutboxEmail.objects.filter(pk__in=failed, attempts__gte=settings.OUTBOX_MAX_ATTEMPTS).count()
+        if given_up:
+            logger.error("Giving up on %s admin email(s) after %s attempts", given_up, settings.OUTBOX_MAX_ATTEMPTS)
+        if len(failed) > given_up:
+            raise error  # rows sent so far stay sent; the retry only resends the failures
+    return sent
@@ -0,0 +1,62 @@
+"""
+Keyset (cursor) pagination for newest-first listings.
+
+Pages are addressed by the (submitted_at, id) of the last row shown instead of
+an OFFSET, so fetching page N costs the same as fetching page 1.
+"""
+import base64
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.db.models import Q
+
+
+@dataclass
+class KeysetPage:
+    items: list = field(default_factory=list)
+    cursor: str = ""
+    next_cursor: str = ""
+
+    @property
+    def has_next(self) -> bool:
+        return bool(self.next_cursor)
+
+
+def encode_cursor(timestamp: datetime, pk: int) -> str:
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return (timestamp, pk) or None if the cursor is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_paginate(qs, cursor: str, page_size: int, field_name: str = "submitted_at") -> KeysetPage:
+    """
+    Return the page of ``qs`` (newest first by ``field_name``, then id) that
+    follows ``cursor``. A malformed cursor yields the first page.
+    """
+    qs = qs.order_by(f"-{field_name}", "-pk")
+    position = decode_cursor(cursor)
+    if position is None:
+        cursor = ""
+    else:
+        timestamp, pk = position
+        qs = qs.filter(Q(**{f"{field_name}__lt": timestamp}) | Q(**{field_name: timestamp, "pk__lt": pk}))
+
+    # Fetch one extra row to learn whether another page exists
+    items = list(qs[:page_size + 1])
+    next_cursor = ""
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field_name), last.pk)
+    return KeysetPage(items=items, cursor=cursor, next_cursor=next_cursor)
@@ -0,0 +1,74 @@
+"""
+Bulk review of submissions (approve/reject many at once).
+
+review_submissions() authorizes every requested id with one query, writes
+the new status (and optional shared feedback) with one UPDATE, then does
+what the per-row post_save signals would have: recomputes the touched
+classes' ClassStats and refreshes the search documents when feedback changed.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Submission
+from .search import index_submissions
+from .stats import refresh_class_stats
+
+REVIEW_STATUSES = {"A": "approved", "R": "rejected"}
+
+
+@dataclass
+class ReviewResult:
+    updated: list = field(default_factory=list)  # Submissions, reloaded after the update
+    errors: dict = field(default_factory=dict)  # requested id -> reason
+
+
+def parse_ids(values, limit: int) -> tuple:
+    """
+    (distinct integer ids from form values in request order, at most ``limit``;
+    values that are not ids). Only ASCII digits count: str.isdigit() accepts
+    "²", which int() rejects.
+    """
+    ids, invalid = {}, []
+    for value in values:
+        if value.isascii() and value.isdigit():
+            ids[int(value)] = None
+        else:
+            invalid.append(value)
+    return list(ids)[:limit], invalid
+
+
+@transaction.atomic
+def review_submissions(user, ids, status: str, feedback: str | None = None) -> ReviewResult:
+    if status not in REVIEW_STATUSES:
+        raise ValueError(f"Unknown review status {status!r}")
+    result = ReviewResult()
+    # Staff may review anything, teachers the submissions to their classes
+    teachers = dict(
+        Submission.objects.filter(pk__in=ids).order_by().values_list("pk", "class_ref__teacher_id")
+    )
+    allowed = []
+    for pk in ids:
+        if pk not in teachers:
+            result.errors[pk] = "not found"
+        elif user.is_staff or teachers[pk] == user.pk:
+            allowed.append(pk)
+        else:
+            result.errors[pk] = "not one of your classes"
+    if not allowed:
+        return result
+
+    changes = {"status": status, "updated_at": timezone.now()}
+    if feedback:
+        changes["feedback"] = feedback
+    Submission.objects.filter(pk__in=allowed).update(**changes)
+
+    result.updated = list(
+        Submission.objects.filter(pk__in=allowed).select_related("class_ref", "student").order_by("-submitted_at", "-id")
+    )
+    # update() skips the post_save signals that keep these current
+    refresh_class_stats({sub.class_ref_id for sub in result.updated})
+    if feedback:
+        index_submissions(result.updated)
+    return result
@@ -0,0 +1,102 @@
+"""
+Per-request role resolution.
+
+RolesMiddleware attaches ``request.roles``, which loads the user's group names
+at most once per request. With ROLES_CACHE_TIMEOUT > 0 the names are also kept
+in the ROLES_CACHE_ALIAS cache, keyed by user id, and dropped whenever the
+user's groups change (see passes.signals). Use a shared cache backend
+(Redis/Memcached/database) when running several workers, otherwise another
+worker may serve stale roles until the timeout expires.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+TEACHER = "teacher"
+STUDENT = "student"
+
+
+def _cache():
+    if getattr(settings, "ROLES_CACHE_TIMEOUT", 0) <= 0:
+        return None
+    return caches[getattr(settings, "ROLES_CACHE_ALIAS", "default")]
+
+
+def cache_key(user_id) -> str:
+    return f"passes:roles:{user_id}"
+
+
+def load_role_names(user) -> frozenset:
+    if not user.is_authenticated:
+        return frozenset()
+    cache = _cache()
+    if cache is not None:
+        names = cache.get(cache_key(user.pk))
+        if names is not None:
+            return frozenset(names)
+    names = frozenset(user.groups.values_list("name", flat=True))
+    if cache is not None:
+        cache.set(cache_key(user.pk), sorted(names), settings.ROLES_CACHE_TIMEOUT)
+    return names
+
+
+def invalidate_roles(user_ids) -> None:
+    cache = _cache()
+    if cache is not None and user_ids:
+        cache.delete_many([cache_key(user_id) for user_id in user_ids])
+
+
+class Roles:
+    """Lazily-resolved group membership of one user."""
+
+    def __init__(self, user):
+        self.user = user
+        self._names = None
+
+    @property
+    def names(self) -> frozenset:
+        if self._names is None:
+            self._names = load_role_names(self.user)
+        return self._names
+
+    def __contains__(self, name) -> bool:
+        return name in self.names
+
+    @property
+    def is_teacher(self) -> bool:
+        return TEACHER in self.names
+
+    @property
+    def is_student(self) -> bool:
+        return STUDENT in self.names
+
+    @property
+    def is_staff(self) -> bool:
+        return self.user.is_staff
+
+    @property
+    def can_propose(self) -> bool:
+        return self.user.is_authenticated and (self.user.is_staff or self.is_teacher)
+
+
+def get_roles(request) -> Roles:
+    """``request.roles``, created on demand when the middleware did not run."""
+    roles = getattr(request, "roles", None)
+    if roles is None:
+        roles = request.roles = Roles(request.user)
+    return roles
+
+
+class RolesMiddleware:
+    """Attach ``request.roles``. Must come after AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.roles = Roles(request.user)
+        return self.get_response(request)
+
+
+def roles(request):
+    """Template context processor exposing ``roles``."""
+    return {"roles": get_roles(request)}
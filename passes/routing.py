@@ -0,0 +1,100 @@
+"""
+Read-replica routing.
+
+Views decorated with ``@read_only`` send their reads to the READ_REPLICA_ALIAS
+database (when one is configured) for GET/HEAD requests; every write, and every
+read outside such a view, stays on "default".
+
+A replica lags behind the primary, so a user who just wrote something must
+see it: after a successful POST/PUT/PATCH/DELETE, ReplicaPinMiddleware stores a
+"pinned until" timestamp in the session, and read_only views ignore the
+replica for that user until READ_REPLICA_STICKY_SECONDS have passed.
+"""
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_SESSION_KEY = "_db_pinned_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_state = threading.local()
+
+
+def replica_alias() -> str | None:
+    """The configured replica alias, or None when there is no such database."""
+    alias = getattr(settings, "READ_REPLICA_ALIAS", "")
+    return alias if alias and alias in connections.settings else None
+
+
+def _reading_from_replica() -> bool:
+    return getattr(_state, "read_only", False)
+
+
+def is_pinned(request) -> bool:
+    session = getattr(request, "session", None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def read_only(view):
+    """Serve the view's reads from the replica unless the user wrote recently."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            request.method not in ("GET", "HEAD")
+            or replica_alias() is None
+            or is_pinned(request)
+        ):
+            return view(request, *args, **kwargs)
+        previous = _reading_from_replica()
+        _state.read_only = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _state.read_only = previous
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Route reads inside read_only views to the replica; everything else to default."""
+
+    def db_for_read(self, model, **hints):
+        if _reading_from_replica():
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both sides; objects read from the replica may be saved to default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != replica_alias()
+
+
+class ReplicaPinMiddleware:
+    """
+    Keep users on the primary for a short while after a successful unsafe
+    request. (The router cannot tell: Django also asks db_for_write() when
+    validating constraints.) Must come after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and hasattr(request, "session")
+            and replica_alias() is not None
+        ):
+            request.session[PIN_SESSION_KEY] = time.time() + settings.READ_REPLICA_STICKY_SECONDS
+        return response
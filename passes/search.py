@@ -0,0 +1,174 @@
+"""
+Full-text search for the ``q`` filters.
+
+SearchDocument holds one row of text per Class (name, description, teacher
+username) and per Submission (class name, student username, feedback);
+the signals in passes.signals keep it current. The index over it depends on
+the database:
+
+    SQLite      passes_searchdocument_fts, an external-content FTS5 table
+                synced from SearchDocument by triggers (migration 0011)
+    PostgreSQL  a GIN index on the weighted to_tsvector('simple', ...) of
+                title (A) and body (B)
+    other       plain icontains over SearchDocument
+
+Every word of ``q`` must match, as a prefix ("alg" finds "Algebra").
+ranked_ids() orders matches by bm25 / ts_rank with the title weighted above
+the body, within the rows of a queryset so the ranking cap never hides the
+user's own matches behind other users'.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections, router
+from django.db.models import Case, Exists, OuterRef, Q, When
+from django.db.models.expressions import RawSQL
+
+from .models import Class, SearchDocument, Submission
+
+FTS_TABLE = "passes_searchdocument_fts"
+WORD = re.compile(r"\w+", re.UNICODE)
+MAX_RANKED = 500
+
+
+def terms(q: str) -> list:
+    return WORD.findall(q or "")
+
+
+def _fts5_query(words) -> str:
+    # Each word as a quoted prefix; FTS5 ANDs them
+    return " ".join('"{}"*'.format(w.replace('"', '""')) for w in words)
+
+
+def _tsquery(words) -> SearchQuery:
+    return SearchQuery(" & ".join(f"{w}:*" for w in words), search_type="raw", config="simple")
+
+
+def _pg_vector():
+    return SearchVector("title", weight="A", config="simple") + SearchVector("body", weight="B", config="simple")
+
+
+def _connection():
+    # The alias reads are routed to (the replica inside @read_only views)
+    return connections[router.db_for_read(SearchDocument)]
+
+
+def matching_documents(kind: str, q: str):
+    """SearchDocument rows of ``kind`` matching every word of ``q`` (unordered)."""
+    words = terms(q)
+    docs = SearchDocument.objects.filter(kind=kind)
+    if not words:
+        return docs.none()
+    vendor = _connection().vendor
+    if vendor == "sqlite":
+        return docs.filter(id__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [_fts5_query(words)]
+        ))
+    if vendor == "postgresql":
+        return docs.annotate(search=_pg_vector()).filter(search=_tsquery(words))
+    match = Q()
+    for word in words:
+        match &= Q(title__icontains=word) | Q(body__icontains=word)
+    return docs.filter(match)
+
+
+def filter_by_search(qs, kind: str, q: str):
+    """Narrow ``qs`` (Class or Submission) to rows whose document matches ``q``."""
+    return qs.filter(Exists(matching_documents(kind, q).filter(object_id=OuterRef("pk"))))
+
+
+def ranked_ids(kind: str, q: str, within=None, limit: int | None = None) -> list:
+    """
+    Object ids of the best ``limit`` matches, best first, among the rows of
+    the queryset ``within`` when given.
+    """
+    words = terms(q)
+    if not words:
+        return []
+    limit = limit or MAX_RANKED
+    conn = _connection()
+    if conn.vendor == "sqlite":
+        scope, params = "", [_fts5_query(words), kind]
+        if within is not None:
+            sql, scope_params = within.order_by().values("pk").query.get_compiler(using=conn.alias).as_sql()
+            scope = f"AND d.object_id IN ({sql}) "
+            params.extend(scope_params)
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT d.object_id FROM {FTS_TABLE} JOIN passes_searchdocument d ON d.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND d.kind = %s {scope}"
+                f"ORDER BY bm25({FTS_TABLE}, 10.0, 1.0) LIMIT %s",
+                [*params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+    docs = matching_documents(kind, q)
+    if within is not None:
+        docs = docs.filter(object_id__in=within.order_by().values("pk"))
+    if conn.vendor == "postgresql":
+        docs = docs.annotate(rank=SearchRank(_pg_vector(), _tsquery(words)))
+        return list(docs.order_by("-rank").values_list("object_id", flat=True)[:limit])
+    return list(docs.order_by("title").values_list("object_id", flat=True)[:limit])
+
+
+def order_by_rank(qs, ids):
+    """Order ``qs`` by position in ``ids`` (best match first); unranked rows last."""
+    if not ids:
+        return qs
+    position = Case(*(When(pk=pk, then=pos) for pos, pk in enumerate(ids)), default=len(ids))
+    return qs.order_by(position, *qs.query.order_by)
+
+
+# Index maintenance
+
+
+def class_document(cls: Class) -> dict:
+    return {
+        "title": cls.name,
+        "body": " ".join(filter(None, [cls.description, cls.teacher.username])),
+    }
+
+
+def submission_document(sub: Submission) -> dict:
+    return {
+        "title": f"{sub.class_ref.name} {sub.student.username}",
+        "body": sub.feedback,
+    }
+
+
+def _upsert(kind: str, objects, document, batch_size: int = 500) -> None:
+    SearchDocument.objects.bulk_create(
+        [SearchDocument(kind=kind, object_id=obj.pk, **document(obj)) for obj in objects],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["kind", "object_id"],
+        update_fields=["title", "body"],
+    )
+
+
+def index_classes(classes) -> None:
+    """Insert or refresh the documents of ``classes`` (teacher should be select_related)."""
+    _upsert(SearchDocument.CLASS, classes, class_document)
+
+
+def index_submissions(submissions) -> None:
+    """Insert or refresh the documents of ``submissions`` (class_ref and student should be select_related)."""
+    _upsert(SearchDocument.SUBMISSION, submissions, submission_document)
+
+
+def unindex(kind: str, object_id: int) -> None:
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def rebuild_index(batch_size: int = 500) -> int:
+    """Recreate every SearchDocument from Class and Submission. Returns rows written."""
+    SearchDocument.objects.all().delete()
+    docs = [
+        SearchDocument(kind=SearchDocument.CLASS, object_id=cls.pk, **class_document(cls))
+        for cls in Class.objects.select_related("teacher").iterator(chunk_size=batch_size)
+    ]
+    docs += [
+        SearchDocument(kind=SearchDocument.SUBMISSION, object_id=sub.pk, **submission_document(sub))
+        for sub in Submission.objects.select_related("class_ref", "student").iterator(chunk_size=batch_size)
+    ]
+    SearchDocument.objects.bulk_create(docs, batch_size=batch_size)
+    return len(docs)
@@ -1,11 +1,28 @@
 from django.conf import settings
-from django.core.mail import mail_admins
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
 from django.dispatch import receiver
 
-from .models import TeacherApplication, ProposedClass, Profile
+from .blobs import release_blob, retain_blob
+from .db import apply_sqlite_pragmas
+from .enrollment import enroll_students_in_year_classes, pending_auto_enrollment
+from .jobs import enqueue
+from .listing_cache import GLOBAL_SCOPE, bump, student_scope
+from .models import (
+    Class, ClassStats, Enrollment, TeacherApplication, ProposedClass, Profile, SearchDocument, Submission,
+    SubmissionVersion,
+)
+from .outbox import notify_admins
+from .roles import invalidate_roles
+from .search import index_classes, index_submissions, unindex
+from .stats import adjust_class_stats, submission_deltas, submission_status
+from .versions import record_version
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
 
+User = get_user_model()
+
 
 @receiver(post_save, sender=TeacherApplication)
 def notify_admins_on_teacher_application(sender, instance: TeacherApplication, created: bool, **kwargs):
@@ -17,10 +34,6 @@ def notify_admins_on_teacher_application(sender, instance: TeacherApplication, c
     if instance.status != "P":
         return
 
-    if not getattr(settings, "ADMINS", None):
-        # No admins configured; nothing to notify
-        return
-
     subject = "New teacher application submitted"
     lines = [
         f"User: {instance.user} (id={instance.user_id})",
@@ -31,7 +44,8 @@ def notify_admins_on_teacher_application(sender, instance: TeacherApplication, c
         "/admin/passes/teacherapplication/",
     ]
     body = "\n".join(lines)
-    mail_admins(subject, body, fail_silently=True)
+    # Recorded with the application; the worker mails it, so signup doesn't wait on SMTP
+    notify_admins("teacher_application", subject, body)
 
 
 @receiver(post_save, sender=TeacherApplication)
@@ -43,29 +57,214 @@ def activate_user_on_teacher_approval(sender, instance: TeacherApplication, crea
         if not instance.user.is_active:
             instance.user.is_active = True
             instance.user.save(update_fields=["is_active"])
+        invalidate_roles([instance.user_id])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_group_change(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+    # Drop cached role names for every user whose group membership changed
+    if action == "pre_clear" and reverse:
+        # group.user_set.clear(): pk_set is not provided, so collect members first
+        invalidate_roles(list(instance.user_set.values_list("pk", flat=True)))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        invalidate_roles(list(pk_set or []) if reverse else [instance.pk])
 
 
 @receiver(post_save, sender=ProposedClass)
 def ensure_class_on_proposed_approval(sender, instance: ProposedClass, created: bool, **kwargs):
     # If a proposed class is saved as approved (e.g., via admin change page), ensure Class and enrollments exist
     if instance.status == "A":
-        instance.approve()
+        # Class creation and year-wide enrollment run in the worker
+        enqueue("approve_proposals", proposal_ids=[instance.pk])
+
+
+@receiver(post_init, sender=Profile)
+def remember_profile_student_year(sender, instance: Profile, **kwargs):
+    # Keep the loaded value so post_save can tell whether student_year changed;
+    # a deferred field is not fetched here (it counts as changed on save)
+    instance._saved_student_year = instance.__dict__.get("student_year")
 
 
 @receiver(post_save, sender=Profile)
 def auto_enroll_student_on_profile_year(sender, instance: Profile, created: bool, **kwargs):
     """
-    When a Profile with a student_year is created or updated, automatically
-    enroll the user into all existing classes for that year. Idempotent.
+    When a Profile is created with a student_year, or its student_year changes,
+    enroll the user into all existing classes for that year in one bulk insert.
+    Idempotent. Saves that leave student_year untouched do no work.
     """
     year = instance.student_year
-    if not year:
+    changed = created or year != getattr(instance, "_saved_student_year", None)
+    instance._saved_student_year = year
+    if not year or not changed or kwargs.get("raw"):
+        return
+
+    pending = pending_auto_enrollment()
+    if pending is not None:
+        # Inside suspend_auto_enrollment(): enrolled in one pass at exit
+        pending.add(instance.user_id)
+        return
+
+    user_id = instance.user_id
+    if getattr(settings, "AUTO_ENROLL_ON_COMMIT", False):
+        transaction.on_commit(lambda: enroll_students_in_year_classes([user_id]))
+    else:
+        enroll_students_in_year_classes([user_id])
+
+
+@receiver(post_init, sender=Submission)
+def remember_submission_state(sender, instance: Submission, **kwargs):
+    # Keep the loaded file name and status so post_save can adjust blob
+    # reference counts and class statistics
+    instance._saved_file_name = instance.__dict__.get("file") and instance.file.name
+    instance._saved_status = instance.__dict__.get("status")
+    instance._saved_feedback = instance.__dict__.get("feedback")
+
+
+@receiver(post_save, sender=Submission)
+def track_submission_file(sender, instance: Submission, created: bool, **kwargs):
+    # Blob reference counts and the version history both depend on the file
+    # this save replaced, so they are kept in one receiver
+    if kwargs.get("raw"):
+        return
+    old_name = None if created else getattr(instance, "_saved_file_name", None)
+    new_name = instance.file.name if instance.file else None
+    if new_name == old_name and not created:
+        return
+    instance._saved_file_name = new_name
+    if new_name:
+        retain_blob(new_name)
+        # Retains old_name for the superseded version before it is released below
+        record_version(instance, old_name)
+    if old_name:
+        release_blob(old_name)
+
+
+@receiver(post_delete, sender=Submission)
+def release_submission_blob(sender, instance: Submission, **kwargs):
+    if instance.file:
+        release_blob(instance.file.name)
+
+
+@receiver(post_delete, sender=SubmissionVersion)
+def release_version_blob(sender, instance: SubmissionVersion, **kwargs):
+    if instance.blob_name:
+        release_blob(instance.blob_name)
+
+
+@receiver(post_save, sender=Class)
+def create_class_stats(sender, instance: Class, created: bool, **kwargs):
+    if created and not kwargs.get("raw"):
+        ClassStats.objects.get_or_create(class_ref=instance)
+
+
+@receiver(post_save, sender=Class)
+@receiver(post_delete, sender=Class)
+def invalidate_class_listings(sender, instance: Class, **kwargs):
+    bump(GLOBAL_SCOPE)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_student_class_listing(sender, instance: Enrollment, **kwargs):
+    bump(student_scope(instance.student_id))
+
+
+@receiver(post_save, sender=Submission)
+def count_submission_in_class_stats(sender, instance: Submission, created: bool, **kwargs):
+    old_status = None if created else getattr(instance, "_saved_status", None)
+    new_status = instance.status
+    instance._saved_status = new_status
+    if kwargs.get("raw") or (not created and (old_status is None or old_status == new_status)):
         return
-    try:
-        from .models import Class, Enrollment
-        classes = Class.objects.filter(year=year)
-        for cls in classes:
-            Enrollment.objects.get_or_create(student=instance.user, class_ref=cls)
-    except Exception:
-        # Avoid hard failures in signals; log if needed in production
-        pass
+    adjust_class_stats(
+        instance.class_ref_id, enrolled_student=instance.student_id, **submission_deltas(old_status, new_status)
+    )
+
+
+@receiver(post_delete, sender=Submission)
+def uncount_submission_in_class_stats(sender, instance: Submission, **kwargs):
+    adjust_class_stats(
+        instance.class_ref_id, enrolled_student=instance.student_id, **submission_deltas(instance.status, None)
+    )
+
+
+@receiver(post_save, sender=Enrollment)
+def count_enrollment_in_class_stats(sender, instance: Enrollment, created: bool, **kwargs):
+    if not created or kwargs.get("raw"):
+        return
+    deltas = submission_deltas(None, submission_status(instance.student_id, instance.class_ref_id))
+    adjust_class_stats(instance.class_ref_id, **{**deltas, "enrolled": 1})
+
+
+@receiver(post_delete, sender=Enrollment)
+def uncount_enrollment_in_class_stats(sender, instance: Enrollment, **kwargs):
+    deltas = submission_deltas(submission_status(instance.student_id, instance.class_ref_id), None)
+    adjust_class_stats(instance.class_ref_id, **{**deltas, "enrolled": -1})
+
+
+@receiver(post_init, sender=Class)
+def remember_class_name(sender, instance: Class, **kwargs):
+    # Submission documents embed the class name; re-index them only when it changes
+    instance._saved_name = instance.__dict__.get("name")
+
+
+@receiver(post_save, sender=Class)
+def index_class_for_search(sender, instance: Class, created: bool, **kwargs):
+    if kwargs.get("raw"):
+        return
+    index_classes([instance])
+    renamed = not created and instance.name != getattr(instance, "_saved_name", None)
+    instance._saved_name = instance.name
+    if renamed:
+        index_submissions(Submission.objects.filter(class_ref=instance).select_related("class_ref", "student"))
+
+
+@receiver(post_delete, sender=Class)
+def unindex_class(sender, instance: Class, **kwargs):
+    unindex(SearchDocument.CLASS, instance.pk)
+
+
+@receiver(post_save, sender=Submission)
+def index_submission_for_search(sender, instance: Submission, created: bool, **kwargs):
+    changed = created or instance.feedback != getattr(instance, "_saved_feedback", None)
+    instance._saved_feedback = instance.feedback
+    if changed and not kwargs.get("raw"):
+        index_submissions([instance])
+
+
+@receiver(post_delete, sender=Submission)
+def unindex_submission(sender, instance: Submission, **kwargs):
+    unindex(SearchDocument.SUBMISSION, instance.pk)
+
+
+USER_NAME_FIELDS = ("username", "first_name", "last_name")
+
+
+def _user_names(user) -> tuple:
+    # Deferred fields are neither fetched nor saved, so they compare equal
+    return tuple(user.__dict__.get(name) for name in USER_NAME_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_user_names(sender, instance, **kwargs):
+    instance._saved_names = _user_names(instance)
+
+
+@receiver(post_save, sender=User)
+def refresh_user_name_dependents(sender, instance, created: bool, **kwargs):
+    # Class and submission documents embed usernames; cached class listings
+    # show the teacher's full name or username
+    old, names = getattr(instance, "_saved_names", None), _user_names(instance)
+    instance._saved_names = names
+    if created or kwargs.get("raw") or old == names:
+        return
+    if old is None or old[0] != names[0]:
+        index_classes(Class.objects.filter(teacher=instance).select_related("teacher"))
+        index_submissions(Submission.objects.filter(student=instance).select_related("class_ref", "student"))
+    if Class.objects.filter(teacher=instance).exists():
+        bump(GLOBAL_SCOPE)
+
+
+@receiver(connection_created)
+def tune_new_connection(sender, connection, **kwargs):
+    apply_sqlite_pragmas(connection)
@@ -0,0 +1,120 @@
+// Resumable chunked uploads for <input type="file" data-chunked-upload="<url>">.
+//
+// Files above the threshold are sent to the attribute's URL (the upload_start
+// endpoint, resolved by SubmissionForm) in pieces
+// (PUT + Content-Range). A dropped connection is retried from the offset the
+// server reports, and the upload id is remembered in localStorage so a page
+// reload can resume too. When done, the form is submitted with the hidden
+// upload_id field instead of the file.
+(function () {
+  const THRESHOLD = 8 * 1024 * 1024;
+  const CHUNK_SIZE = 4 * 1024 * 1024;
+
+  function csrfToken() {
+    const v = `; ${document.cookie}`.split("; csrftoken=");
+    return v.length === 2 ? v.pop().split(";").shift() : "";
+  }
+
+  const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+  async function request(url, options) {
+    const r = await fetch(url, {
+      credentials: "same-origin",
+      ...options,
+      headers: { "X-CSRFToken": csrfToken(), ...(options && options.headers) },
+    });
+    const body = await r.json().catch(() => ({}));
+    if (!r.ok && r.status !== 409) throw Object.assign(new Error(body.error || r.statusText), { status: r.status });
+    return body;
+  }
+
+  async function openSession(form, input, file) {
+    const key = `ep-upload:${file.name}:${file.size}:${file.lastModified}`;
+    const saved = localStorage.getItem(key);
+    if (saved) {
+      try {
+        return { key, state: await request(saved) };
+      } catch (e) {
+        localStorage.removeItem(key);
+      }
+    }
+    const data = new FormData();
+    data.append("class_ref", form.querySelector("[name=class_ref]").value);
+    data.append("filename", file.name);
+    data.append("size", file.size);
+    const state = await request(input.dataset.chunkedUpload, { method: "POST", body: data });
+    localStorage.setItem(key, state.url);
+    return { key, state };
+  }
+
+  async function upload(form, input, onProgress) {
+    const file = input.files[0];
+    let { key, state } = await openSession(form, input, file);
+    let failures = 0;
+    while (!state.complete) {
+      const start = state.offset;
+      const end = Math.min(start + CHUNK_SIZE, file.size);
+      try {
+        state = await request(state.url, {
+          method: "PUT",
+          headers: { "Content-Range": `bytes ${start}-${end - 1}/${file.size}` },
+          body: file.slice(start, end),
+        });
+        failures = 0;
+        onProgress(state.offset / file.size);
+      } catch (e) {
+        if (e.status || ++failures > 8) throw e;
+        // Network error: back off, then ask the server where to resume
+        await sleep(Math.min(30000, 500 * 2 ** failures));
+        state = await request(state.url).catch(() => state);
+      }
+    }
+    localStorage.removeItem(key);
+    form.querySelector("[name=upload_id]").value = state.id;
+    input.value = "";
+  }
+
+  function needsChunking(form) {
+    const input = form.querySelector("input[type=file][data-chunked-upload]");
+    const file = input && input.files[0];
+    return file && file.size > THRESHOLD ? input : null;
+  }
+
+  function run(form, input, done) {
+    const button = form.querySelector("button[type=submit], button:not([type])");
+    const label = button && button.innerHTML;
+    const progress = (fraction) => {
+      if (button) button.textContent = `Uploading… ${Math.floor(fraction * 100)}%`;
+    };
+    if (button) button.disabled = true;
+    progress(0);
+    upload(form, input, progress)
+      .then(done)
+      .catch((e) => alert(`Upload failed: ${e.message}`))
+      .finally(() => {
+        if (button) {
+          button.disabled = false;
+          button.innerHTML = label;
+        }
+      });
+  }
+
+  // HTMX forms: hold the request until the chunks are up
+  document.addEventListener("htmx:confirm", (evt) => {
+    const form = evt.target.closest("form");
+    const input = form && needsChunking(form);
+    if (!input) return;
+    evt.preventDefault();
+    run(form, input, () => evt.detail.issueRequest());
+  });
+
+  // Plain forms (e.g. the roster page)
+  document.addEventListener("submit", (evt) => {
+    const form = evt.target;
+    if (form.hasAttribute("hx-post")) return;
+    const input = needsChunking(form);
+    if (!input) return;
+    evt.preventDefault();
+    run(form, input, () => form.submit());
+  });
+})();
@@ -0,0 +1,100 @@
+"""
+Per-class submission statistics (ClassStats).
+
+Single-row changes (a submission saved or deleted, an enrollment added or
+removed) adjust the counters with one ``UPDATE ... SET n = n + 1`` (see
+passes.signals). Set-based writes that bypass signals (bulk enrollment,
+queryset ``update()``) call refresh_class_stats() for the classes they touched,
+which recomputes those rows in one grouped query and upserts them.
+
+New classes get a zeroed row when created; a class that still has no row
+gets one on first read, so deltas for a missing row are simply dropped.
+"""
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+
+from .models import Class, ClassStats, Enrollment, Submission
+
+STATUS_FIELDS = {"A": "approved", "R": "rejected", "P": "pending"}
+COUNTER_FIELDS = ["enrolled", "submitted", "approved", "rejected", "pending"]
+
+
+def compute_class_stats(class_ids=None) -> dict:
+    """{class_id: {counter: value}} computed from scratch, for all or some classes."""
+    classes = Class.objects.order_by()
+    if class_ids is not None:
+        classes = classes.filter(pk__in=class_ids)
+    stats = {pk: dict.fromkeys(COUNTER_FIELDS, 0) for pk in classes.values_list("pk", flat=True)}
+
+    status = Subquery(
+        Submission.objects.filter(student=OuterRef("student_id"), class_ref=OuterRef("class_ref_id"))
+        .order_by().values("status")[:1]
+    )
+    rows = (
+        Enrollment.objects.filter(class_ref_id__in=list(stats))
+        .annotate(submission_status=status)
+        .order_by()
+        .values("class_ref_id")
+        .annotate(
+            enrolled=Count("pk"),
+            submitted=Count("pk", filter=Q(submission_status__isnull=False)),
+            approved=Count("pk", filter=Q(submission_status="A")),
+            rejected=Count("pk", filter=Q(submission_status="R")),
+            pending=Count("pk", filter=Q(submission_status="P")),
+        )
+    )
+    for row in rows:
+        stats[row.pop("class_ref_id")] = row
+    return stats
+
+
+def refresh_class_stats(class_ids=None, batch_size: int = 500) -> int:
+    """Recompute and upsert ClassStats rows (all classes when ``class_ids`` is None)."""
+    stats = compute_class_stats(class_ids)
+    ClassStats.objects.bulk_create(
+        [ClassStats(class_ref_id=pk, **counters) for pk, counters in stats.items()],
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=["class_ref"],
+        update_fields=COUNTER_FIELDS,
+    )
+    return len(stats)
+
+
+def get_class_stats(cls: Class) -> ClassStats:
+    try:
+        return ClassStats.objects.get(class_ref=cls)
+    except ClassStats.DoesNotExist:
+        refresh_class_stats([cls.pk])
+        return ClassStats.objects.get(class_ref=cls)
+
+
+def adjust_class_stats(class_id: int, enrolled_student: int | None = None, **deltas: int) -> None:
+    """
+    Add ``deltas`` to a class's counters in one UPDATE. With ``enrolled_student``
+    the update only applies while that student is enrolled in the class.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    rows = ClassStats.objects.filter(class_ref_id=class_id)
+    if enrolled_student is not None:
+        rows = rows.filter(Exists(Enrollment.objects.filter(student_id=enrolled_student, class_ref_id=class_id)))
+    rows.update(**{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def submission_deltas(old_status: str | None, new_status: str | None) -> dict:
+    """Counter changes for a submission moving from one status to another (None: absent)."""
+    deltas = dict.fromkeys(COUNTER_FIELDS, 0)
+    deltas["submitted"] = (new_status is not None) - (old_status is not None)
+    if old_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[old_status]] -= 1
+    if new_status in STATUS_FIELDS:
+        deltas[STATUS_FIELDS[new_status]] += 1
+    return deltas
+
+
+def submission_status(student_id: int, class_id: int) -> str | None:
+    return (
+        Submission.objects.filter(student_id=student_id, class_ref_id=class_id)
+        .values_list("status", flat=True).first()
+    )
@@ -0,0 +1,131 @@
+"""
+Content-addressed storage for submission files.
+
+Each unique upload is stored once under a sharded SHA-256 path:
+
+    media/blobs/3f/a2/3fa2…e9.txt
+
+so resubmitting the same file, or many students uploading the same starter
+file, costs no extra disk space or writes. Reference counts live in the
+StoredBlob table (see passes.blobs), and ``manage.py gc_blobs`` deletes blobs
+no Submission points at any more.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage, storages
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = "blobs"
+BLOB_NAME = re.compile(rf"^{BLOB_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})(?P<ext>\.\w+)?$")
+
+
+def hash_file(content) -> tuple[str, int]:
+    """SHA-256 hex digest and size of a Django File, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in content.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def blob_name(digest: str, ext: str = "") -> str:
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def parse_blob_name(name: str):
+    """Return the digest for a content-addressed name, or None for legacy paths."""
+    match = BLOB_NAME.match(name or "")
+    return match.group("digest") if match else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    FileSystemStorage that ignores the requested name (apart from its
+    extension) and stores content under its SHA-256 digest. Saving content
+    that already exists is a no-op that returns the existing name.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is chosen from the content in _save(); never suffix it
+        return name
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lower()
+        precomputed = getattr(content, "sha256", None)
+        if precomputed and hasattr(content, "temporary_file_path"):
+            # Streamed by BlobUploadHandler into our temp dir, already hashed:
+            # a rename puts it in place
+            final = blob_name(precomputed, ext)
+            if self.reuse(final):
+                return final
+            return self.commit_temp(content.temporary_file_path(), final)
+        if _seekable(content):
+            # Hash first (read only): known content is never written again
+            digest, _size = hash_file(content)
+            final = blob_name(digest, ext)
+            if self.reuse(final):
+                return final
+            tmp_path, _digest = self._write_temp(content)
+        else:
+            tmp_path, digest = self._write_temp(content)
+            final = blob_name(digest, ext)
+            if self.reuse(final):
+                os.unlink(tmp_path)
+                return final
+        return self.commit_temp(tmp_path, final)
+
+    def reuse(self, name: str) -> bool:
+        """
+        True if the blob already exists. Its mtime is bumped so garbage
+        collection treats it as freshly used until the new reference commits.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def temp_dir(self) -> str:
+        directory = self.path(f"{BLOB_PREFIX}/tmp")
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def _write_temp(self, content) -> tuple[str, str]:
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.temp_dir())
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest()
+
+    def commit_temp(self, tmp_path: str, final: str) -> str:
+        """Atomically move a fully written temp file to its blob path."""
+        full_path = self.path(final)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(tmp_path, self.file_permissions_mode)
+        # os.replace is atomic; a concurrent writer of the same blob wrote identical bytes
+        os.replace(tmp_path, full_path)
+        return final
+
+
+def _seekable(content) -> bool:
+    try:
+        return content.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def submission_storage():
+    """Storage for Submission.file (the "submissions" entry in settings.STORAGES)."""
+    return storages["submissions"]
@@ -0,0 +1,31 @@
+import pytest
+from django.core.cache import caches
+
+from .query_budget import QueryBudget
+
+
+@pytest.fixture
+def query_budget(db):
+    """``with query_budget(n): ...`` fails the test if more than n queries run."""
+    return QueryBudget
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """The database is rolled back after each test; cached listings must go too."""
+    yield
+    for cache in caches.all(initialized_only=True):
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def eager_jobs(settings):
+    """Run enqueued jobs inline; queue tests turn this off."""
+    settings.JOBS_EAGER = True
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    """Store uploaded files under a per-test MEDIA_ROOT."""
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
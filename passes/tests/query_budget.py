@@ -0,0 +1,42 @@
+"""
+Query-budget helpers for tests.
+
+    with QueryBudget(5):
+        client.get(url)
+
+    @QueryBudget(5)
+    def test_something(...): ...
+
+The pytest fixture ``query_budget`` (see conftest.py) hands out the same class.
+"""
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudget(ContextDecorator):
+    """Fail if the wrapped block runs more than ``max_queries`` SQL queries."""
+
+    def __init__(self, max_queries: int, using: str = DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.using = using
+        self.captured = None
+
+    def __enter__(self):
+        self.captured = CaptureQueriesContext(connections[self.using])
+        self.captured.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.captured.__exit__(exc_type, exc, tb)
+        if exc_type is None and self.count > self.max_queries:
+            raise AssertionError(
+                f"{self.count} queries executed, budget is {self.max_queries}:\n"
+                + "\n".join(f"  {i}. {q['sql']}" for i, q in enumerate(self.captured.captured_queries, 1))
+            )
+        return False
+
+    @property
+    def count(self) -> int:
+        return len(self.captured) if self.captured is not None else 0
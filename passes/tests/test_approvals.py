@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import Group, User
+from django.urls import reverse
+from django.utils import timezone
+
+from passes.approvals import approve_proposals, approve_teacher_applications
+from passes.models import Class, ClassStats, Enrollment, Profile, ProposedClass, TeacherApplication
+from passes.search import ranked_ids
+
+
+def applications(n, prefix="applicant"):
+    apps = []
+    for i in range(n):
+        user = User.objects.create_user(f"{prefix}{i}", password="pw", is_active=False)
+        apps.append(TeacherApplication.objects.create(
+            user=user, is_teacher=True, course_names=[], years=[], status="P" if i % 2 == 0 else "A",
+        ))
+    return apps
+
+
+@pytest.mark.parametrize("size", [2, 8])
+def test_teacher_applications_approved_in_constant_queries(db, query_budget, size):
+    apps = applications(size)
+    rejected = applications(1, prefix="rejected")[0]
+    TeacherApplication.objects.filter(pk=rejected.pk).update(status="R")
+
+    # Odd ones were saved approved, which the post_save signal already activated
+    preview = approve_teacher_applications(TeacherApplication.objects.all(), dry_run=True)
+    assert (preview.approved, preview.added_to_group, preview.activated) == (size // 2,) * 3
+    assert TeacherApplication.objects.filter(status="P").count() == size // 2
+
+    with query_budget(9):
+        result = approve_teacher_applications(TeacherApplication.objects.all())
+    assert result.approved == size // 2
+    assert not TeacherApplication.objects.filter(status="P").exists()
+    users = User.objects.filter(pk__in=[app.user_id for app in apps])
+    assert all(user.is_active for user in users)
+    assert Group.objects.get(name="teacher").user_set.count() == size
+    assert not User.objects.get(pk=rejected.user_id).is_active
+
+    # A second run finds nothing left to do
+    again = approve_teacher_applications(TeacherApplication.objects.all(), dry_run=True)
+    assert (again.approved, again.added_to_group, again.activated) == (0, 0, 0)
+
+
+@pytest.mark.parametrize("size", [1, 6])
+def test_proposals_create_classes_and_enroll_in_bulk(db, query_budget, size):
+    teacher = User.objects.create_user("bulkpropose", password="pw")
+    for i in range(3):
+        student = User.objects.create(username=f"year4_{i}")
+        Profile.objects.create(user=student, student_year=4)
+    deadline = timezone.now() + timedelta(days=20)
+    # One already-approved proposal whose class exists with a stale deadline
+    stale = Class.objects.create(name="Existing", teacher=teacher, year=4, deadline=timezone.now())
+    # (bulk_create: saving an approved proposal would already run the approval)
+    ProposedClass.objects.bulk_create([
+        ProposedClass(teacher=teacher, name="Existing", year=4, status="A", deadline=deadline)
+    ])
+    for i in range(size):
+        ProposedClass.objects.create(teacher=teacher, name=f"Proposal {i}", year=4, status="P", deadline=deadline)
+
+    preview = approve_proposals(ProposedClass.objects.all(), dry_run=True)
+    assert (preview.approved, preview.classes_created, preview.classes_updated) == (size, size, 1)
+    assert preview.enrolled.created == 3 * (size + 1)
+    assert Class.objects.count() == 1
+
+    with query_budget(22):
+        result = approve_proposals(ProposedClass.objects.all())
+    assert result.enrolled.created == 3 * (size + 1)
+    assert Class.objects.filter(teacher=teacher).count() == size + 1
+    assert Enrollment.objects.count() == 3 * (size + 1)
+    stale.refresh_from_db()
+    assert stale.deadline == deadline
+    assert not ProposedClass.objects.filter(status="P").exists()
+    # Signals were skipped; their side effects were not
+    assert ClassStats.objects.filter(enrolled=3).count() == size + 1
+    assert len(ranked_ids("class", "proposal")) == size
+
+
+def test_admin_actions_preview_and_approve(admin_client):
+    teacher = User.objects.create_user("adminpropose", password="pw")
+    pc = ProposedClass.objects.create(teacher=teacher, name="From Admin", year=2, status="P")
+    url = reverse("admin:passes_proposedclass_changelist")
+
+    response = admin_client.post(url, {"action": "preview_approve_proposals", "_selected_action": [pc.pk]}, follow=True)
+    assert "Would approve 1 proposed classes" in response.content.decode()
+    assert not Class.objects.filter(name="From Admin").exists()
+
+    admin_client.post(url, {"action": "approve_proposals", "_selected_action": [pc.pk]})
+    assert Class.objects.filter(name="From Admin", teacher=teacher).exists()
@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import Group, User
+from django.urls import reverse
+from django.utils import timezone
+
+from passes.models import Class, ClassStats, Enrollment, Submission
+from passes.search import ranked_ids
+
+
+@pytest.fixture
+def review(db):
+    """A teacher with ``n`` pending submissions, plus one submission in another teacher's class."""
+
+    def build(n):
+        group = Group.objects.get_or_create(name="teacher")[0]
+        teacher = User.objects.create_user("bulkteach", password="pw")
+        other = User.objects.create_user("otherteach", password="pw")
+        group.user_set.add(teacher, other)
+        deadline = timezone.now() + timedelta(days=7)
+        mine = Class.objects.create(name="Bulk", teacher=teacher, year=1, deadline=deadline)
+        theirs = Class.objects.create(name="Elsewhere", teacher=other, year=1, deadline=deadline)
+        subs = []
+        for i in range(n):
+            student = User.objects.create(username=f"bulkstud{i}")
+            Enrollment.objects.create(student=student, class_ref=mine)
+            subs.append(Submission.objects.create(student=student, class_ref=mine, file=f"bulk{i}.txt"))
+        foreign = Submission.objects.create(
+            student=User.objects.create(username="foreignstud"), class_ref=theirs, file="foreign.txt"
+        )
+        return teacher, mine, subs, foreign
+
+    return build
+
+
+def post(client, ids, status, **extra):
+    return client.post(
+        reverse("submissions:bulk_review"), {"ids": ids, "status": status, **extra}, HTTP_HX_REQUEST="true"
+    )
+
+
+def test_bulk_approve_updates_rows_stats_and_reports_errors(client, review):
+    teacher, cls, subs, foreign = review(3)
+    client.force_login(teacher)
+    response = post(client, [s.pk for s in subs] + [foreign.pk, 999999], "A", feedback="Well structured")
+
+    assert response.status_code == 200
+    html = response.content.decode()
+    assert "3 submissions approved" in html
+    assert f"#{foreign.pk}: not one of your classes" in html
+    assert "#999999: not found" in html
+    assert html.count('hx-swap-oob="true"') == 3
+
+    assert set(Submission.objects.filter(class_ref=cls).values_list("status", "feedback")) == {("A", "Well structured")}
+    assert Submission.objects.get(pk=foreign.pk).status == "P"
+    stats = ClassStats.objects.get(class_ref=cls)
+    assert (stats.approved, stats.pending) == (3, 0)
+    # Shared feedback is searchable
+    assert len(ranked_ids("submission", "structured")) == 3
+
+
+def test_bulk_review_reports_ids_that_are_not_numbers(client, review):
+    teacher, cls, subs, foreign = review(1)
+    client.force_login(teacher)
+    response = post(client, [subs[0].pk, "²", "abc"], "A")
+
+    assert response.status_code == 200
+    html = response.content.decode()
+    assert "1 submission approved" in html
+    assert "#²: not a valid id" in html
+    assert "#abc: not a valid id" in html
+
+
+def test_bulk_review_rejects_unknown_status(client, review):
+    teacher, _cls, subs, _foreign = review(1)
+    client.force_login(teacher)
+    assert post(client, [subs[0].pk], "P").status_code == 400
+    assert Submission.objects.get(pk=subs[0].pk).status == "P"
+
+
+@pytest.mark.parametrize("size", [1, 8])
+def test_bulk_review_query_budget(client, review, query_budget, size):
+    teacher, _cls, subs, _foreign = review(size)
+    client.force_login(teacher)
+    with query_budget(10):
+        response = post(client, [s.pk for s in subs], "R")
+    assert response.status_code == 200
+    assert Submission.objects.filter(status="R").count() == size
@@ -0,0 +1,81 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+
+from passes.deadlines import closing_soon, sweep_deadlines
+from passes.models import Class, Enrollment, Submission
+from passes.filters import filter_classes
+
+
+@pytest.fixture
+def teacher(db):
+    return User.objects.create(username="deadlineteach")
+
+
+def make_class(teacher, name, deadline):
+    return Class.objects.create(name=name, teacher=teacher, year=1, deadline=deadline)
+
+
+def test_sweep_closes_classes_and_marks_missing_students(teacher, django_capture_on_commit_callbacks):
+    now = timezone.now()
+    cls = make_class(teacher, "Due", now + timedelta(hours=1))
+    later = make_class(teacher, "Later", now + timedelta(days=5))
+    done, missed = User.objects.create(username="done"), User.objects.create(username="missed")
+    for student in (done, missed):
+        Enrollment.objects.create(student=student, class_ref=cls)
+    Submission.objects.create(student=done, class_ref=cls, file="done.txt")
+
+    result = sweep_deadlines(now + timedelta(hours=2))
+    assert (result.closed, result.marked) == (1, 1)
+    cls.refresh_from_db()
+    assert not cls.is_open and cls.is_past_deadline
+    assert list(Enrollment.objects.filter(missed_deadline=True).values_list("student__username", flat=True)) == ["missed"]
+    assert [c.pk for c in filter_classes(teacher, True, state="closed")] == [cls.pk]
+    assert [c.pk for c in filter_classes(teacher, True, state="open")] == [later.pk]
+
+    # A second sweep has nothing to do
+    assert sweep_deadlines(now + timedelta(hours=2)) == type(result)()
+
+    # Extending the deadline reopens the class and clears the marks
+    cls.deadline = now + timedelta(days=1)
+    cls.save(update_fields=["deadline"])
+    cls.refresh_from_db()
+    assert cls.is_open
+    sweep_deadlines(now + timedelta(hours=2))
+    assert not Enrollment.objects.filter(missed_deadline=True).exists()
+
+
+def test_classes_created_past_their_deadline_start_closed(teacher):
+    assert not make_class(teacher, "Over", timezone.now() - timedelta(days=1)).is_open
+    assert make_class(teacher, "Ahead", timezone.now() + timedelta(days=1)).is_open
+
+
+def test_closing_soon_lists_open_classes_with_missing_counts(teacher, settings, django_capture_on_commit_callbacks):
+    settings.DEADLINE_SOON_HOURS = 24
+    now = timezone.now()
+    soon = make_class(teacher, "Soon", now + timedelta(hours=3))
+    make_class(teacher, "Far", now + timedelta(days=3))
+    for i in range(2):
+        Enrollment.objects.create(student=User.objects.create(username=f"soon{i}"), class_ref=soon)
+
+    [row] = closing_soon()
+    assert (row["id"], row["enrolled"], row["not_submitted"]) == (soon.pk, 2, 2)
+    assert closing_soon(teacher_id=teacher.pk + 1) == []
+
+    # The cached list is refreshed by the next sweep
+    Submission.objects.create(student=User.objects.get(username="soon0"), class_ref=soon, file="s.txt")
+    with django_capture_on_commit_callbacks(execute=True):
+        sweep_deadlines()
+    assert closing_soon()[0]["not_submitted"] == 1
+
+
+def test_sweep_command_runs_once(teacher):
+    make_class(teacher, "Cron", timezone.now() + timedelta(seconds=1))
+    Class.objects.update(deadline=timezone.now() - timedelta(minutes=1))
+    out = StringIO()
+    call_command("sweep_deadlines", stdout=out)
+    assert "Closed 1 class(es)" in out.getvalue()
@@ -0,0 +1,128 @@
+import io
+import json
+import zipfile
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import Group, User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+
+from passes.models import Class, Enrollment, Submission
+
+CONTENT = b"0123456789abcdef"
+
+
+@pytest.fixture
+def submission(media, db):
+    teacher = User.objects.create(username="dlteach")
+    teacher.groups.add(Group.objects.get_or_create(name="teacher")[0])
+    cls = Class.objects.create(name="Downloads", teacher=teacher, year=1, deadline=timezone.now() + timedelta(days=7))
+    student = User.objects.create(username="dlstud")
+    Enrollment.objects.create(student=student, class_ref=cls)
+    return Submission.objects.create(student=student, class_ref=cls, file=SimpleUploadedFile("essay.txt", CONTENT))
+
+
+def download(client, sub, **headers):
+    return client.get(reverse("submissions:download", args=[sub.pk]), headers=headers)
+
+
+def test_only_owner_teacher_and_staff_can_download(client, submission):
+    classmate = User.objects.create(username="dlother")
+    Enrollment.objects.create(student=classmate, class_ref=submission.class_ref)
+    client.force_login(classmate)
+    assert download(client, submission).status_code == 403
+
+    for user in (submission.student, submission.class_ref.teacher):
+        client.force_login(user)
+        r = download(client, submission)
+        assert r.status_code == 200
+        assert b"".join(r.streaming_content) == CONTENT
+        assert 'filename="essay.txt"' in r["Content-Disposition"]
+
+
+def test_range_and_conditional_get(client, submission):
+    client.force_login(submission.student)
+    r = download(client, submission, Range="bytes=4-7")
+    assert r.status_code == 206
+    assert r["Content-Range"] == f"bytes 4-7/{len(CONTENT)}"
+    assert b"".join(r.streaming_content) == b"4567"
+
+    r = download(client, submission, Range="bytes=-3")
+    assert b"".join(r.streaming_content) == b"def"
+
+    assert download(client, submission, Range="bytes=99-").status_code == 416
+
+    etag = download(client, submission)["ETag"]
+    assert download(client, submission, If_None_Match=etag).status_code == 304
+    # A stale If-Range gets the whole file back
+    assert download(client, submission, Range="bytes=0-1", If_Range='"stale"').status_code == 200
+
+
+def test_sendfile_backends_leave_transfer_to_front_end(client, submission, settings):
+    client.force_login(submission.student)
+    settings.SENDFILE_BACKEND = "nginx"
+    r = download(client, submission)
+    assert r["X-Accel-Redirect"] == "/protected-media/" + submission.file.name
+    assert r.content == b""
+
+    settings.SENDFILE_BACKEND = "apache"
+    r = download(client, submission)
+    assert r["X-Sendfile"] == submission.file.path
+
+
+def test_class_zip_streams_files_and_manifest(client, submission):
+    client.force_login(submission.student)
+    url = reverse("classes:submissions_zip", args=[submission.class_ref_id])
+    assert client.get(url).status_code == 403
+
+    client.force_login(submission.class_ref.teacher)
+    r = client.get(url)
+    assert r.streaming and r["Content-Type"] == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(r.streaming_content)))
+    assert archive.read("dlstud/essay.txt") == CONTENT
+    manifest = archive.read("manifest.csv").decode().splitlines()
+    assert manifest[0].startswith("username,email,file,status")
+    assert manifest[1].startswith("dlstud,,dlstud/essay.txt,Pending,")
+
+
+def test_submission_export_follows_list_filters(client, submission):
+    other = Submission.objects.create(
+        student=User.objects.create(username="dlstud2"), class_ref=submission.class_ref, status="A",
+        file=SimpleUploadedFile("other.txt", b"x"),
+    )
+    client.force_login(submission.class_ref.teacher)
+
+    r = client.get(reverse("submissions:export_csv"), {"status": "A"})
+    assert r.streaming and r["Content-Type"].startswith("text/csv")
+    lines = b"".join(r.streaming_content).decode().splitlines()
+    assert lines[0].startswith("id,class_id,class,student,email,status")
+    assert len(lines) == 2 and lines[1].startswith(f"{other.pk},{other.class_ref_id},Downloads,dlstud2,,Approved,")
+
+    r = client.get(reverse("submissions:export_jsonl"), {"q": "dlstud"})
+    rows = [json.loads(line) for line in b"".join(r.streaming_content).decode().splitlines()]
+    assert [row["id"] for row in rows] == [submission.pk, other.pk]
+    assert rows[0]["file"] == "essay.txt"
+
+    # Students only ever export their own rows
+    client.force_login(submission.student)
+    r = client.get(reverse("submissions:export_jsonl"))
+    assert [json.loads(line)["id"] for line in b"".join(r.streaming_content).decode().splitlines()] == [submission.pk]
+
+
+def test_exports_quote_formula_cells(client, submission):
+    student = User.objects.create(username="=HYPERLINK(1)")
+    Submission.objects.create(
+        student=student, class_ref=submission.class_ref, feedback="+1 from me",
+        file=SimpleUploadedFile("f.txt", b"x"),
+    )
+    client.force_login(submission.class_ref.teacher)
+
+    r = client.get(reverse("submissions:export_csv"))
+    text = b"".join(r.streaming_content).decode()
+    assert "'=HYPERLINK(1)" in text and "'+1 from me" in text
+
+    r = client.get(reverse("classes:submissions_zip", args=[submission.class_ref_id]))
+    manifest = zipfile.ZipFile(io.BytesIO(b"".join(r.streaming_content))).read("manifest.csv").decode()
+    assert "'=HYPERLINK(1)," in manifest
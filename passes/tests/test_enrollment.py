@@ -0,0 +1,137 @@
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+
+from passes.enrollment import EnrollmentResult, bulk_create_enrollments, enroll_year_students
+from passes.models import Class, Enrollment, Profile, ProposedClass
+
+
+def make_students(n, year, prefix="stud"):
+    students = []
+    for i in range(n):
+        s = User.objects.create_user(f"{prefix}{i}", password="pass")
+        Profile.objects.create(user=s, student_year=year)
+        students.append(s)
+    return students
+
+
+@pytest.mark.django_db
+def test_enroll_year_students_counts_created_and_existing():
+    teacher = User.objects.create_user("teachbulk", password="pass")
+    students = make_students(5, year=2)
+    make_students(2, year=3, prefix="other")
+    cls = Class.objects.create(name="Bulk", teacher=teacher, year=2, deadline=timezone.now() + timedelta(days=5))
+    # Profile signal already enrolled nobody (class created after profiles); enroll one manually
+    Enrollment.objects.create(student=students[0], class_ref=cls)
+
+    result = enroll_year_students(cls, batch_size=2)
+    assert result == EnrollmentResult(created=4, existing=1)
+    assert Enrollment.objects.filter(class_ref=cls).count() == 5
+
+    # Idempotent
+    assert enroll_year_students(cls) == EnrollmentResult(created=0, existing=5)
+
+
+@pytest.mark.django_db
+def test_bulk_create_enrollments_counts_only_inserted_rows():
+    teacher = User.objects.create_user("teachconf", password="pass")
+    students = make_students(3, year=8, prefix="conf")
+    cls = Class.objects.create(name="Conflicts", teacher=teacher, year=9, deadline=timezone.now() + timedelta(days=5))
+    # Already there, as if enrolled by a concurrent request: skipped, not counted
+    Enrollment.objects.create(student=students[0], class_ref=cls)
+
+    assert bulk_create_enrollments([(s.pk, cls.pk) for s in students]) == 2
+    assert Enrollment.objects.filter(class_ref=cls).count() == 3
+
+
+@pytest.mark.django_db
+def test_proposed_class_approval_query_count_is_constant(django_assert_max_num_queries):
+    teacher = User.objects.create_user("teachq", password="pass")
+    make_students(40, year=4)
+    pc = ProposedClass.objects.create(teacher=teacher, name="Many", year=4, status="P")
+
+    with django_assert_max_num_queries(20):
+        cls, result = pc.approve_and_enroll()
+    assert result.created == 40
+    assert Enrollment.objects.filter(class_ref=cls).count() == 40
+
+
+@pytest.mark.django_db
+def test_fix_proposed_classes_command_enrolls():
+    teacher = User.objects.create_user("teachfix", password="pass")
+    make_students(3, year=5)
+    ProposedClass.objects.bulk_create([ProposedClass(teacher=teacher, name="Fixme", year=5, status="A")])
+
+    call_command("fix_proposed_classes", "--batch-size", "2")
+    cls = Class.objects.get(name="Fixme")
+    assert cls.enrollments.count() == 3
+
+
+@pytest.mark.django_db
+def test_profile_save_without_year_change_does_no_enrollment_work(django_assert_num_queries):
+    teacher = User.objects.create_user("teachsave", password="pass")
+    Class.objects.create(name="Y6", teacher=teacher, year=6, deadline=timezone.now() + timedelta(days=5))
+    student = User.objects.create_user("studsave", password="pass")
+    profile = Profile.objects.create(user=student, student_year=6)
+    assert student.enrollments.count() == 1
+
+    # Only the UPDATE itself
+    with django_assert_num_queries(1):
+        profile.save()
+
+
+@pytest.mark.django_db
+def test_profile_year_change_enrolls_into_new_year():
+    teacher = User.objects.create_user("teachchg", password="pass")
+    c7 = Class.objects.create(name="Y7", teacher=teacher, year=7, deadline=timezone.now() + timedelta(days=5))
+    student = User.objects.create_user("studchg", password="pass")
+    profile = Profile.objects.create(user=student, student_year=6)
+    assert not student.enrollments.exists()
+
+    profile = Profile.objects.get(pk=profile.pk)
+    profile.student_year = 7
+    profile.save()
+    assert Enrollment.objects.filter(student=student, class_ref=c7).exists()
+
+
+@pytest.mark.django_db
+def test_suspend_auto_enrollment_enrolls_once_at_exit():
+    from passes.enrollment import suspend_auto_enrollment
+
+    teacher = User.objects.create_user("teachimp", password="pass")
+    c1 = Class.objects.create(name="Imp 1", teacher=teacher, year=8, deadline=timezone.now() + timedelta(days=5))
+    c2 = Class.objects.create(name="Imp 2", teacher=teacher, year=8, deadline=timezone.now() + timedelta(days=5))
+
+    with suspend_auto_enrollment(batch_size=2) as pending:
+        students = make_students(3, year=8, prefix="imp")
+        assert len(pending) == 3
+        assert not Enrollment.objects.filter(class_ref__in=[c1, c2]).exists()
+
+    assert Enrollment.objects.filter(class_ref__in=[c1, c2]).count() == 6
+    assert all(s.enrollments.count() == 2 for s in students)
+
+
+@pytest.mark.django_db
+def test_auto_enroll_on_commit_defers_until_commit(settings, django_capture_on_commit_callbacks):
+    settings.AUTO_ENROLL_ON_COMMIT = True
+    teacher = User.objects.create_user("teachcommit", password="pass")
+    cls = Class.objects.create(name="Commit", teacher=teacher, year=9, deadline=timezone.now() + timedelta(days=5))
+    student = User.objects.create_user("studcommit", password="pass")
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        Profile.objects.create(user=student, student_year=9)
+        assert not Enrollment.objects.filter(student=student, class_ref=cls).exists()
+    # One enrollment pass (listing stamps are bumped on commit too)
+    assert sum(cb.__qualname__.startswith("auto_enroll_student_on_profile_year") for cb in callbacks) == 1
+    assert Enrollment.objects.filter(student=student, class_ref=cls).exists()
+
+
+@pytest.mark.django_db
+def test_loading_profiles_with_deferred_year_does_not_fetch_it(django_assert_num_queries):
+    for i in range(3):
+        Profile.objects.create(user=User.objects.create_user(f"studdefer{i}", password="pass"))
+
+    with django_assert_num_queries(1):
+        list(Profile.objects.only("pk", "user"))
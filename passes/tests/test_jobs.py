@@ -0,0 +1,84 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from passes import jobs
+from passes.models import Class, Job, ProposedClass, TeacherApplication
+
+CALLS = []
+
+
+@jobs.task("test_record")
+def record(value, fail=False):
+    CALLS.append(value)
+    if fail:
+        raise RuntimeError("boom")
+
+
+@pytest.fixture
+def queued(settings, db):
+    settings.JOBS_EAGER = False
+    settings.JOB_RETRY_BACKOFF = 10
+    settings.OUTBOX_DIGEST_WINDOW = 0
+    CALLS.clear()
+
+
+def test_enqueue_defers_work_until_the_worker_runs(queued):
+    job = jobs.enqueue("test_record", value=1)
+    assert CALLS == [] and job.status == "Q"
+
+    out = StringIO()
+    call_command("run_worker", "--once", "--concurrency", "1", stdout=out)
+    assert CALLS == [1]
+    assert "Ran 1 job(s), 0 failed" in out.getvalue()
+    job.refresh_from_db()
+    assert job.status == "D" and job.attempts == 1 and job.finished_at
+
+
+def test_failed_jobs_back_off_then_give_up(queued):
+    job = jobs.enqueue("test_record", value=2, fail=True, max_attempts=2)
+    assert jobs.run_pending() == 1
+    job.refresh_from_db()
+    assert job.status == "Q" and "boom" in job.last_error
+    assert job.run_at > timezone.now() + timedelta(seconds=5)
+    assert jobs.run_pending() == 0  # not due yet
+
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+    jobs.run_pending()
+    job.refresh_from_db()
+    assert job.status == "F" and job.attempts == 2
+    assert CALLS == [2, 2]
+
+
+def test_expired_claims_are_picked_up_again(queued):
+    job = jobs.enqueue("test_record", value=3)
+    [claimed] = jobs.claim("dead-worker")
+    assert jobs.claim("other") == []
+
+    Job.objects.filter(pk=claimed.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+    [again] = jobs.claim("other")
+    assert again.pk == job.pk and again.attempts == 2
+    # The first worker lost its lock, so its late result is not recorded
+    jobs.run_job(claimed)
+    assert Job.objects.get(pk=job.pk).status == "R"
+
+
+def test_proposal_and_application_approval_are_queued(queued, settings):
+    settings.ADMINS = [("Admin", "admin@example.com")]
+    teacher = User.objects.create_user("queueteach", password="pw", is_active=False)
+    TeacherApplication.objects.create(user=teacher, is_teacher=True, course_names=[], years=[], status="P")
+    pc = ProposedClass.objects.create(teacher=teacher, name="Queued", year=4, status="P")
+    pc.status = "A"
+    pc.save()
+    assert mail.outbox == []
+    assert not Class.objects.filter(name="Queued").exists()
+    assert set(Job.objects.values_list("task", flat=True)) == {"send_outbox", "approve_proposals"}
+
+    call_command("run_worker", "--once", "--concurrency", "1", stdout=StringIO())
+    assert len(mail.outbox) == 1
+    assert Class.objects.filter(name="Queued", teacher=teacher).exists()
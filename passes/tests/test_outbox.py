@@ -0,0 +1,117 @@
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+
+from passes import jobs
+from passes.models import Job, OutboxEmail, TeacherApplication
+from passes.outbox import notify_admins, send_outbox
+
+OPENED = []
+
+
+class CountingBackend(EmailBackend):
+    def open(self):
+        OPENED.append(self)
+        return super().open()
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise OSError("connection refused")
+
+
+class PartlyFailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        if any("boom" in message.subject for message in messages):
+            raise OSError("recipient refused")
+        return super().send_messages(messages)
+
+
+@pytest.fixture
+def outbox_settings(settings, db):
+    settings.JOBS_EAGER = False
+    settings.ADMINS = [("Admin", "admin@example.com")]
+    settings.OUTBOX_DIGEST_WINDOW = 0
+    settings.OUTBOX_DIGEST_THRESHOLD = 3
+    settings.EMAIL_BACKEND = "passes.tests.test_outbox.CountingBackend"
+    OPENED.clear()
+    return settings
+
+
+def apply(username):
+    user = User.objects.create_user(username, password="pw", is_active=False)
+    return TeacherApplication.objects.create(user=user, is_teacher=True, course_names=[], years=[], status="P")
+
+
+def test_signup_only_records_the_email(outbox_settings):
+    apply("outbox1")
+    apply("outbox2")
+    assert mail.outbox == []
+    assert OutboxEmail.objects.filter(sent_at__isnull=True).count() == 2
+    # A single queued sender covers both
+    assert Job.objects.filter(task="send_outbox").count() == 1
+
+    call_command("run_worker", "--once", "--concurrency", "1", stdout=StringIO())
+    assert len(mail.outbox) == 2
+    assert all("teacher application" in m.subject.lower() for m in mail.outbox)
+    assert not OutboxEmail.objects.filter(sent_at__isnull=True).exists()
+
+
+def test_bursts_are_sent_as_one_digest_over_one_connection(outbox_settings):
+    for i in range(5):
+        apply(f"burst{i}")
+    notify_admins("other", "Something else", "body")
+
+    assert send_outbox() == 6
+    assert len(OPENED) == 1
+    digest, single = sorted(mail.outbox, key=lambda m: m.subject)
+    assert digest.subject.endswith("Digest of 5: New teacher application submitted")
+    assert digest.body.count("burst") == 5
+    assert single.subject.endswith("Something else")
+    assert digest.to == ["admin@example.com"]
+
+
+def test_failed_send_keeps_rows_for_the_retry(outbox_settings):
+    outbox_settings.EMAIL_BACKEND = "passes.tests.test_outbox.FailingBackend"
+    apply("unlucky")
+    assert jobs.run_pending() == 1
+    row = OutboxEmail.objects.get()
+    assert row.sent_at is None and row.attempts == 1 and "connection refused" in row.last_error
+    assert Job.objects.get(task="send_outbox").status == "Q"
+
+    outbox_settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    assert send_outbox() == 1
+    assert len(mail.outbox) == 1
+
+
+def test_failing_message_does_not_hold_up_the_rest(outbox_settings):
+    outbox_settings.EMAIL_BACKEND = "passes.tests.test_outbox.PartlyFailingBackend"
+    notify_admins("a", "first", "body")
+    notify_admins("b", "boom", "body")
+    notify_admins("c", "third", "body")
+    with pytest.raises(OSError):
+        send_outbox()
+    # Everything else went out; the error is raised afterwards so the job retries
+    assert sorted(m.subject for m in mail.outbox) == ["[Django] first", "[Django] third"]
+    assert list(OutboxEmail.objects.filter(sent_at__isnull=True).values_list("subject", flat=True)) == ["boom"]
+    assert OutboxEmail.objects.get(subject="boom").attempts == 1
+
+    outbox_settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    assert send_outbox() == 1
+    assert sorted(m.subject for m in mail.outbox) == ["[Django] boom", "[Django] first", "[Django] third"]
+
+
+def test_message_is_given_up_after_max_attempts(outbox_settings):
+    outbox_settings.EMAIL_BACKEND = "passes.tests.test_outbox.PartlyFailingBackend"
+    outbox_settings.OUTBOX_MAX_ATTEMPTS = 2
+    notify_admins("b", "boom", "body")
+    with pytest.raises(OSError):
+        send_outbox()
+    # The last attempt fails quietly: there is nothing left to retry
+    assert send_outbox() == 0
+    assert send_outbox() == 0
+    assert OutboxEmail.objects.get().attempts == 2
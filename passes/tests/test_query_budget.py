@@ -0,0 +1,146 @@
+"""
+Query budgets for every view in passes/urls_classes.py and passes/urls_submissions.py.
+
+Each view is exercised with a small and a large fixture; the budget is the same
+for both, so any per-row query (an O(n) regression) fails here.
+"""
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import Group, User
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from passes.models import ChunkedUpload, Class, Enrollment, ProposedClass, Submission
+
+SIZES = [1, 8]
+
+
+@pytest.fixture
+def school(db):
+    """Factory building a teacher, a student and ``n`` classes/classmates/submissions."""
+
+    def build(n):
+        teacher_group = Group.objects.get_or_create(name="teacher")[0]
+        teacher = User.objects.create(username="budget_teacher", first_name="Ada", last_name="Budget")
+        teacher.groups.add(teacher_group)
+        student = User.objects.create(username="budget_student")
+        classes = [
+            Class.objects.create(
+                name=f"Budget {i}", teacher=teacher, year=1, deadline=timezone.now() + timedelta(days=7)
+            )
+            for i in range(n)
+        ]
+        main = classes[0]
+        for cls in classes:
+            Enrollment.objects.create(student=student, class_ref=cls)
+            Submission.objects.create(student=student, class_ref=cls, file=f"budget_{cls.pk}.txt")
+        for i in range(n):
+            classmate = User.objects.create(username=f"budget_mate{i}", email=f"m{i}@example.com")
+            Enrollment.objects.create(student=classmate, class_ref=main)
+            Submission.objects.create(student=classmate, class_ref=main, status="AR"[i % 2], file=f"m{i}.txt")
+            ProposedClass.objects.create(teacher=teacher, name=f"Proposal {i}", year=1)
+        return teacher, student, main
+
+    return build
+
+
+def pending_submission(cls):
+    return Submission.objects.filter(class_ref=cls, status="P").first().pk
+
+
+# (url name, url kwargs, who, method, budget)
+VIEW_BUDGETS = [
+    ("classes:list", lambda cls: {}, "teacher", "get", 6),
+    ("classes:list", lambda cls: {}, "student", "get", 5),
+    ("classes:roster", lambda cls: {"class_id": cls.pk}, "teacher", "get", 5),
+    ("classes:roster", lambda cls: {"class_id": cls.pk}, "student", "get", 6),
+    ("classes:propose", lambda cls: {}, "teacher", "get", 3),
+    ("classes:proposals", lambda cls: {}, "teacher", "get", 4),
+    ("submissions:list", lambda cls: {}, "teacher", "get", 5),
+    ("submissions:list", lambda cls: {}, "student", "get", 5),
+    ("submissions:new", lambda cls: {}, "student", "get", 4),
+    ("submissions:approve", lambda cls: {"pk": pending_submission(cls)}, "teacher", "post", 6),
+    ("submissions:reject", lambda cls: {"pk": pending_submission(cls)}, "teacher", "post", 6),
+]
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("name, kwargs, who, method, budget", VIEW_BUDGETS)
+def test_view_query_budget(client, school, query_budget, size, name, kwargs, who, method, budget):
+    teacher, student, cls = school(size)
+    client.force_login(teacher if who == "teacher" else student)
+    url = reverse(name, kwargs=kwargs(cls))
+
+    with query_budget(budget):
+        r = getattr(client, method)(url, HTTP_HX_REQUEST="true") if method == "post" else client.get(url)
+    assert r.status_code == 200
+
+
+def stored_submission(cls):
+    """A submission whose file exists in storage (the fixture's files do not)."""
+    student = User.objects.create(username="budget_uploader")
+    Enrollment.objects.create(student=student, class_ref=cls)
+    sub = Submission.objects.create(student=student, class_ref=cls, file=ContentFile(b"budget\n", name="budget.txt"))
+    return sub.pk
+
+
+def started_upload(cls):
+    student = User.objects.get(username="budget_student")
+    return ChunkedUpload.objects.create(user=student, class_ref=cls, filename="big.txt", size=10).pk
+
+
+def class_submission_ids(cls):
+    return list(Submission.objects.filter(class_ref=cls).values_list("pk", flat=True))
+
+
+# Views that need request data, stored files or a streamed body:
+# (url name, url kwargs, who, method, request data, budget). "put" sends the
+# data as the whole upload; "stream" reads the streaming response inside the budget.
+REQUEST_BUDGETS = [
+    ("submissions:download", lambda cls: {"pk": stored_submission(cls)}, "teacher", "get", None, 3),
+    ("submissions:version_download", lambda cls: {"pk": stored_submission(cls), "number": 1}, "teacher", "get", None, 3),
+    ("submissions:upload_start", lambda cls: {}, "student", "post",
+     lambda cls: {"class_ref": cls.pk, "filename": "big.txt", "size": 10}, 5),
+    ("submissions:upload_chunk", lambda cls: {"upload_id": started_upload(cls)}, "student", "put",
+     lambda cls: b"0123456789", 4),
+    ("submissions:bulk_review", lambda cls: {}, "teacher", "post",
+     lambda cls: {"ids": class_submission_ids(cls), "status": "A", "feedback": "Reviewed"}, 11),
+    ("submissions:export_csv", lambda cls: {}, "teacher", "stream", None, 4),
+    ("submissions:export_jsonl", lambda cls: {}, "teacher", "stream", None, 4),
+    ("classes:submissions_zip", lambda cls: {"class_id": cls.pk}, "teacher", "stream", None, 4),
+    ("classes:cache_stats", lambda cls: {}, "staff", "get", None, 2),
+]
+
+
+@pytest.mark.parametrize("size", SIZES)
+@pytest.mark.parametrize("name, kwargs, who, method, data, budget", REQUEST_BUDGETS)
+def test_request_query_budget(client, media, school, query_budget, size, name, kwargs, who, method, data, budget):
+    teacher, student, cls = school(size)
+    users = {"teacher": teacher, "student": student}
+    client.force_login(users.get(who) or User.objects.create(username="budget_staff", is_staff=True))
+    url = reverse(name, kwargs=kwargs(cls))
+    payload = data(cls) if data else None
+
+    with query_budget(budget):
+        if method == "post":
+            r = client.post(url, payload, HTTP_HX_REQUEST="true")
+        elif method == "put":
+            r = client.put(
+                url, payload, content_type="application/octet-stream",
+                HTTP_CONTENT_RANGE=f"bytes 0-{len(payload) - 1}/{len(payload)}",
+            )
+        else:
+            r = client.get(url)
+            if method == "stream":
+                b"".join(r.streaming_content)
+    assert r.status_code in (200, 201)
+
+
+@pytest.mark.django_db
+def test_view_querysets_use_indexes():
+    # Raises CommandError if any view queryset plans a full-table scan
+    call_command("explain_queries", "--fail-on-scan", stdout=StringIO())
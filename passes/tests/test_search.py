@@ -0,0 +1,106 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from passes.models import Class, SearchDocument, Submission
+from passes.search import ranked_ids
+from passes.filters import filter_classes, filter_submissions
+
+
+@pytest.fixture
+def teacher(db):
+    user = User.objects.create_user(username="searchteach", password="pw")
+    user.groups.add(Group.objects.get_or_create(name="teacher")[0])
+    return user
+
+
+def make_class(teacher, name, description=""):
+    return Class.objects.create(
+        name=name, description=description, teacher=teacher, year=2,
+        deadline=timezone.now() + timedelta(days=7),
+    )
+
+
+def test_class_filter_matches_word_prefixes_and_ranks_titles_first(teacher):
+    algebra = make_class(teacher, "Linear Algebra")
+    mentions = make_class(teacher, "Geometry", description="Uses some algebra")
+    make_class(teacher, "History")
+
+    assert [c.pk for c in filter_classes(teacher, True, q="alg")] == [algebra.pk, mentions.pk]
+    assert [c.pk for c in filter_classes(teacher, True, q="lin alg")] == [algebra.pk]
+    assert list(filter_classes(teacher, True, q="chemistry")) == []
+    # Teacher usernames are searchable too
+    assert len(filter_classes(teacher, True, q="searchteach")) == 3
+
+
+def test_class_ranking_is_limited_to_the_users_classes(teacher, monkeypatch):
+    monkeypatch.setattr("passes.search.MAX_RANKED", 1)
+    other = User.objects.create_user(username="otherteach", password="pw")
+    for i in range(3):
+        make_class(other, f"Algebra {i}", description="algebra algebra")
+    mine = make_class(teacher, "Algebra")
+    also_mine = make_class(teacher, "Geometry", description="Uses some algebra")
+
+    # Other teachers' better matches do not use up the cap; matches beyond it come last
+    assert [c.pk for c in filter_classes(teacher, True, q="algebra")] == [mine.pk, also_mine.pk]
+
+
+def test_submission_filter_searches_class_student_and_feedback(teacher):
+    cls = make_class(teacher, "Physics")
+    alice = User.objects.create(username="alice")
+    bob = User.objects.create(username="bob")
+    sub_a = Submission.objects.create(student=alice, class_ref=cls, file="a.txt")
+    sub_b = Submission.objects.create(student=bob, class_ref=cls, file="b.txt")
+    sub_b.feedback = "Missing the derivation"
+    sub_b.save()
+
+    def found(q):
+        return {s.pk for s in filter_submissions(teacher, True, q=q)}
+
+    assert found("phys") == {sub_a.pk, sub_b.pk}
+    assert found("ali") == {sub_a.pk}
+    assert found("derivation") == {sub_b.pk}
+
+
+def test_index_follows_renames_and_deletes(teacher):
+    cls = make_class(teacher, "Biology")
+    student = User.objects.create(username="carol")
+    sub = Submission.objects.create(student=student, class_ref=cls, file="c.txt")
+
+    cls.name = "Zoology"
+    cls.save()
+    assert ranked_ids(SearchDocument.CLASS, "zoo") == [cls.pk]
+    assert ranked_ids(SearchDocument.SUBMISSION, "zoo") == [sub.pk]
+    assert ranked_ids(SearchDocument.CLASS, "bio") == []
+
+    student.username = "caroline"
+    student.save()
+    assert ranked_ids(SearchDocument.SUBMISSION, "caroline") == [sub.pk]
+
+    sub.delete()
+    cls.delete()
+    assert not SearchDocument.objects.exists()
+
+
+def test_class_list_search_over_http(client, teacher):
+    make_class(teacher, "Statistics")
+    make_class(teacher, "Music")
+    client.force_login(teacher)
+    response = client.get(reverse("classes:list"), {"q": "stat"})
+    assert response.status_code == 200
+    assert b"Statistics" in response.content
+    assert b"Music" not in response.content
+
+
+def test_rebuild_command_restores_documents(teacher):
+    make_class(teacher, "Chemistry")
+    SearchDocument.objects.all().delete()
+    out = StringIO()
+    call_command("rebuild_search_index", stdout=out)
+    assert "Indexed 1 document(s)" in out.getvalue()
+    assert len(ranked_ids(SearchDocument.CLASS, "chem")) == 1
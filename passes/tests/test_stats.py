@@ -0,0 +1,66 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+
+from passes.enrollment import bulk_create_enrollments
+from passes.models import Class, ClassStats, Enrollment, Submission
+from passes.stats import COUNTER_FIELDS, compute_class_stats
+
+
+def stored(cls):
+    row = ClassStats.objects.get(class_ref=cls)
+    return {name: getattr(row, name) for name in COUNTER_FIELDS}
+
+
+@pytest.fixture
+def cls(db):
+    teacher = User.objects.create(username="statsteach")
+    return Class.objects.create(name="Stats", teacher=teacher, year=3, deadline=timezone.now() + timedelta(days=7))
+
+
+def test_counters_follow_single_row_changes(cls):
+    students = [User.objects.create(username=f"stats{i}") for i in range(3)]
+    for s in students:
+        Enrollment.objects.create(student=s, class_ref=cls)
+    subs = [Submission.objects.create(student=s, class_ref=cls, file=f"s{i}.txt") for i, s in enumerate(students)]
+    subs[0].status = "A"
+    subs[0].save()
+    subs[1].status = "R"
+    subs[1].save(update_fields=["status"])
+    subs[1].save()  # unchanged status: no-op
+    assert stored(cls) == {"enrolled": 3, "submitted": 3, "approved": 1, "rejected": 1, "pending": 1}
+
+    # Unenrolling drops the student's submission from the counts; deleting it afterwards changes nothing
+    Enrollment.objects.filter(student=students[1]).delete()
+    subs[1].delete()
+    subs[2].delete()
+    assert stored(cls) == {"enrolled": 2, "submitted": 1, "approved": 1, "rejected": 0, "pending": 0}
+    assert stored(cls) == compute_class_stats([cls.pk])[cls.pk]
+
+    # Re-enrolling a student who already submitted counts the submission again
+    Enrollment.objects.filter(student=students[0]).delete()
+    Enrollment.objects.create(student=students[0], class_ref=cls)
+    assert stored(cls) == compute_class_stats([cls.pk])[cls.pk]
+
+
+def test_bulk_enrollment_refreshes_stats(cls):
+    students = [User.objects.create(username=f"bulkstats{i}") for i in range(4)]
+    bulk_create_enrollments([(s.pk, cls.pk) for s in students])
+    assert stored(cls)["enrolled"] == 4
+
+
+def test_rebuild_command_fixes_drift(cls):
+    student = User.objects.create(username="drift")
+    Enrollment.objects.create(student=student, class_ref=cls)
+    ClassStats.objects.filter(class_ref=cls).update(enrolled=99, pending=-3)
+
+    out = StringIO()
+    call_command("rebuild_class_stats", "--check", stdout=out)
+    assert "1 class(es) out of date" in out.getvalue()
+
+    call_command("rebuild_class_stats", stdout=StringIO())
+    assert stored(cls) == {"enrolled": 1, "submitted": 0, "approved": 0, "rejected": 0, "pending": 0}
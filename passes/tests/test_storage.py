@@ -0,0 +1,64 @@
+import os
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+
+from passes.models import Class, Enrollment, StoredBlob, Submission
+from passes.storage import parse_blob_name
+
+
+@pytest.fixture
+def course(db):
+    teacher = User.objects.create(username="blobteach")
+    cls = Class.objects.create(name="Blobs", teacher=teacher, year=1, deadline=timezone.now() + timedelta(days=7))
+    students = [User.objects.create(username=f"blobstud{i}") for i in range(2)]
+    for s in students:
+        Enrollment.objects.create(student=s, class_ref=cls)
+    return cls, students
+
+
+def blob_files(root):
+    return [f for _, _, files in os.walk(root / "blobs") for f in files if len(f) > 64]
+
+
+def test_identical_uploads_share_one_blob(media, course):
+    cls, (s1, s2) = course
+    a = Submission.objects.create(student=s1, class_ref=cls, file=SimpleUploadedFile("starter.py", b"print(1)\n"))
+    b = Submission.objects.create(student=s2, class_ref=cls, file=SimpleUploadedFile("mine.py", b"print(1)\n"))
+
+    assert a.file.name == b.file.name
+    assert parse_blob_name(a.file.name)
+    assert (a.display_name, b.display_name) == ("starter.py", "mine.py")
+    assert len(blob_files(media)) == 1
+    assert StoredBlob.objects.get(name=a.file.name).ref_count == 2
+    assert b.file.read() == b"print(1)\n"
+
+
+def test_resubmission_releases_old_blob_and_gc_deletes_it(media, course):
+    cls, (s1, _s2) = course
+    sub = Submission.objects.create(student=s1, class_ref=cls, file=SimpleUploadedFile("v1.txt", b"first"))
+    old_name = sub.file.name
+
+    sub.file = ContentFile(b"second", name="v2.txt")
+    sub.save()
+    assert StoredBlob.objects.get(name=old_name).ref_count == 0
+    assert StoredBlob.objects.get(name=sub.file.name).ref_count == 1
+
+    call_command("gc_blobs", "--grace-minutes", "0", stdout=StringIO())
+    assert not StoredBlob.objects.filter(name=old_name).exists()
+    assert not (media / old_name).exists()
+    assert (media / sub.file.name).exists()
+
+
+def test_deleting_submission_releases_blob(media, course):
+    cls, (s1, _s2) = course
+    sub = Submission.objects.create(student=s1, class_ref=cls, file=SimpleUploadedFile("gone.md", b"# bye"))
+    name = sub.file.name
+    sub.delete()
+    assert StoredBlob.objects.get(name=name).ref_count == 0
@@ -0,0 +1,87 @@
+import hashlib
+import os
+from datetime import timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+
+from passes.models import ChunkedUpload, Class, Enrollment, Submission
+from passes.storage import blob_name
+
+
+@pytest.fixture
+def enrolled(db, client):
+    teacher = User.objects.create(username="upteach")
+    student = User.objects.create(username="upstud")
+    cls = Class.objects.create(name="Uploads", teacher=teacher, year=1, deadline=timezone.now() + timedelta(days=7))
+    Enrollment.objects.create(student=student, class_ref=cls)
+    client.force_login(student)
+    return cls, student
+
+
+def test_streamed_upload_is_hashed_and_moved_into_place(client, media, enrolled):
+    cls, student = enrolled
+    payload = b"x" * 200_000
+    r = client.post(
+        f"{reverse('submissions:new')}?class={cls.pk}",
+        {"class_ref": cls.pk, "file": SimpleUploadedFile("big.txt", payload)},
+    )
+    assert r.status_code == 302
+    sub = Submission.objects.get(student=student, class_ref=cls)
+    assert sub.file.name == blob_name(hashlib.sha256(payload).hexdigest(), ".txt")
+    assert (media / sub.file.name).read_bytes() == payload
+    assert sub.original_name == "big.txt"
+    assert os.listdir(media / "blobs" / "tmp") == []
+
+
+def test_upload_over_class_limit_is_rejected(client, media, enrolled):
+    cls, student = enrolled
+    cls.max_upload_mb = 1
+    cls.save()
+    r = client.post(
+        f"{reverse('submissions:new')}?class={cls.pk}",
+        {"class_ref": cls.pk, "file": SimpleUploadedFile("huge.txt", b"y" * (1024 * 1024 + 1))},
+    )
+    assert r.status_code == 413
+    assert not Submission.objects.exists()
+
+
+def test_resumable_chunked_upload(client, media, enrolled):
+    cls, student = enrolled
+    payload = os.urandom(300_000)
+    form = client.get(reverse("submissions:new")).content.decode()
+    assert f'data-chunked-upload="{reverse("submissions:upload_start")}"' in form
+    r = client.post(reverse("submissions:upload_start"), {"class_ref": cls.pk, "filename": "notebook.ipynb", "size": len(payload)})
+    assert r.status_code == 201
+    url = r.json()["url"]
+
+    def put(start, end):
+        return client.put(
+            url, payload[start:end], content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end - 1}/{len(payload)}",
+        )
+
+    assert put(0, 100_000).json()["offset"] == 100_000
+    # A retried or out-of-order piece is refused with the offset to resume from
+    r = put(200_000, 300_000)
+    assert r.status_code == 409 and r.json()["offset"] == 100_000
+    assert client.get(url).json()["offset"] == 100_000
+    state = put(100_000, 300_000).json()
+    assert state["complete"]
+
+    r = client.post(reverse("submissions:new"), {"class_ref": cls.pk, "upload_id": state["id"]})
+    assert r.status_code == 302
+    sub = Submission.objects.get(student=student, class_ref=cls)
+    assert sub.display_name == "notebook.ipynb"
+    assert sub.file.read() == payload
+    assert not ChunkedUpload.objects.exists()
+
+
+def test_chunked_upload_requires_enrollment(client, media, enrolled):
+    cls, _student = enrolled
+    client.force_login(User.objects.create(username="stranger"))
+    r = client.post(reverse("submissions:upload_start"), {"class_ref": cls.pk, "filename": "a.txt", "size": 10})
+    assert r.status_code == 403
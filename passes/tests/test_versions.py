@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from passes.models import Class, Enrollment, StoredBlob, Submission, SubmissionVersion
+from passes.versions import apply_delta, make_delta, version_content
+
+
+@pytest.fixture
+def course(db):
+    teacher = User.objects.create(username="verteach")
+    cls = Class.objects.create(name="Versions", teacher=teacher, year=1, deadline=timezone.now() + timedelta(days=7))
+    student = User.objects.create(username="verstud")
+    Enrollment.objects.create(student=student, class_ref=cls)
+    return cls, student
+
+
+def resubmit(sub, content: bytes, name: str):
+    sub.file = ContentFile(content, name=name)
+    sub.save()
+    return sub
+
+
+def test_delta_round_trip_keeps_line_endings_and_unicode():
+    base = "def f():\r\n    return 1\r\n# café\n".encode()
+    target = "def f():\r\n    return 2\r\n# café\n# ünïcode, no newline".encode()
+    assert apply_delta(base, make_delta(base, target)) == target
+    assert make_delta(b"\xff\xfe", target) is None
+
+
+def test_text_resubmissions_keep_history_as_deltas(media, course):
+    cls, student = course
+    body = "".join(f"line {i}\n" for i in range(200))
+    contents = [body.encode(), (body + "added\n").encode(), body.replace("line 7\n", "").encode()]
+    sub = Submission.objects.create(student=student, class_ref=cls, file=SimpleUploadedFile("a.py", contents[0]))
+    first_blob = sub.file.name
+    resubmit(sub, contents[1], "a.py")
+    resubmit(sub, contents[2], "a.py")
+
+    v1, v2, v3 = SubmissionVersion.objects.filter(submission=sub).order_by("number")
+    assert v1.delta is not None and v2.delta is not None and v1.blob_name == v2.blob_name == ""
+    assert v3.is_current
+    assert [version_content(v) for v in (v1, v2, v3)] == contents
+    assert StoredBlob.objects.get(name=first_blob).ref_count == 0
+    assert StoredBlob.objects.get(name=sub.file.name).ref_count == 1
+
+
+def test_binary_versions_keep_their_blob_through_gc(media, course):
+    cls, student = course
+    sub = Submission.objects.create(student=student, class_ref=cls, file=SimpleUploadedFile("r.pdf", b"%PDF-1"))
+    old_name = sub.file.name
+    resubmit(sub, b"%PDF-2", "r.pdf")
+
+    v1 = SubmissionVersion.objects.get(submission=sub, number=1)
+    assert v1.blob_name == old_name and v1.delta is None
+    assert StoredBlob.objects.get(name=old_name).ref_count == 1
+    call_command("gc_blobs", "--grace-minutes", "0", stdout=StringIO())
+    assert (media / old_name).exists()
+
+    sub.delete()
+    assert StoredBlob.objects.get(name=old_name).ref_count == 0
+
+
+def test_keyframe_versions_are_not_compacted(media, course, settings):
+    settings.SUBMISSION_VERSION_KEYFRAME = 2
+    cls, student = course
+    sub = Submission.objects.create(student=student, class_ref=cls, file=SimpleUploadedFile("n.md", b"# 1\n"))
+    for i in range(2, 5):
+        resubmit(sub, f"# {i}\n".encode(), "n.md")
+
+    versions = list(SubmissionVersion.objects.filter(submission=sub).order_by("number"))
+    assert [v.delta is not None for v in versions] == [True, False, True, False]
+    assert versions[1].blob_name
+    assert [version_content(v) for v in versions] == [f"# {i}\n".encode() for i in range(1, 5)]
+
+
+def test_version_download(client, media, course):
+    cls, student = course
+    sub = Submission.objects.create(student=student, class_ref=cls, file=SimpleUploadedFile("old.txt", b"old\n"))
+    resubmit(sub, b"new\n", "new.txt")
+    url = reverse("submissions:version_download", args=[sub.pk, 1])
+
+    client.force_login(User.objects.create(username="verother"))
+    assert client.get(url).status_code == 403
+
+    client.force_login(cls.teacher)
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp.content == b"old\n"
+    assert "old.txt" in resp["Content-Disposition"]
+    current = client.get(reverse("submissions:version_download", args=[sub.pk, 2]))
+    assert b"".join(current.streaming_content) == b"new\n"
+    assert client.get(reverse("submissions:version_download", args=[sub.pk, 3])).status_code == 404
@@ -281,3 +281,179 @@ def test_teacher_cannot_submit_assignments(client):
     assert "Teachers cannot submit" in r.content.decode()
 
 
+
+
+@pytest.mark.django_db
+def test_class_roster_query_count_is_independent_of_roster_size(client):
+    """Teacher roster must not issue a query per enrolled student"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from passes.models import Submission
+
+    teacher = User.objects.create_user("rosterteach", password="pass")
+    Group.objects.get_or_create(name="teacher")[0].user_set.add(teacher)
+    cls = Class.objects.create(name="Big Roster", teacher=teacher, year=1, deadline=timezone.now() + timedelta(days=7))
+    client.login(username="rosterteach", password="pass")
+    url = reverse("classes:roster", args=[cls.id])
+
+    def add_students(start, n):
+        for i in range(start, start + n):
+            s = User.objects.create_user(f"roster{i}", password="pass")
+            Enrollment.objects.create(student=s, class_ref=cls)
+            if i % 2:
+                Submission.objects.create(student=s, class_ref=cls, status="AR"[i % 4 // 2], file=f"r{i}.txt")
+
+    add_students(0, 2)
+    with CaptureQueriesContext(connection) as small:
+        r = client.get(url)
+    assert r.status_code == 200
+
+    add_students(2, 8)
+    with CaptureQueriesContext(connection) as large:
+        r = client.get(url)
+    assert r.status_code == 200
+    assert len(large) == len(small)
+
+    stats = r.context["stats"]
+    assert (stats.submitted, stats.approved, stats.rejected, stats.pending, stats.not_submitted) == (5, 3, 2, 0, 5)
+
+
+@pytest.mark.django_db
+def test_submission_list_keyset_pagination(client, settings):
+    from passes.models import Submission
+
+    settings.SUBMISSION_PAGE_SIZE = 2
+    teacher = User.objects.create_user("pageteach", password="pass")
+    Group.objects.get_or_create(name="teacher")[0].user_set.add(teacher)
+    cls = Class.objects.create(name="Paged", teacher=teacher, year=1, deadline=timezone.now() + timedelta(days=7))
+    for i in range(5):
+        s = User.objects.create_user(f"pagestud{i}", password="pass")
+        Enrollment.objects.create(student=s, class_ref=cls)
+        Submission.objects.create(student=s, class_ref=cls, file=f"p{i}.txt")
+
+    client.login(username="pageteach", password="pass")
+    r = client.get(reverse("submissions:list"), {"status": "P"})
+    seen = [obj.pk for obj in r.context["submissions"]]
+    assert len(seen) == 2
+    next_query = r.context["next_query"]
+    assert "status=P" in next_query
+
+    # HTMX "load more" requests return only the rows partial
+    while next_query:
+        r = client.get(f"{reverse('submissions:list')}?{next_query}", HTTP_HX_REQUEST="true")
+        assert r.status_code == 200
+        assert "<table" not in r.content.decode()
+        seen += [obj.pk for obj in r.context["submissions"]]
+        next_query = r.context["next_query"]
+
+    expected = list(Submission.objects.order_by("-submitted_at", "-pk").values_list("pk", flat=True))
+    assert seen == expected
+
+
+@pytest.mark.django_db
+def test_roles_are_cached_and_invalidated_on_group_change(settings):
+    from django.core.cache import cache
+    from passes.roles import Roles
+
+    settings.ROLES_CACHE_TIMEOUT = 60
+    cache.clear()
+    user = User.objects.create_user("roleuser", password="pass")
+    teacher_group = Group.objects.get_or_create(name="teacher")[0]
+
+    assert not Roles(user).is_teacher
+    # Served from the cache: a second resolution does not hit the database
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    with CaptureQueriesContext(connection) as queries:
+        assert not Roles(user).is_teacher
+    assert len(queries) == 0
+
+    user.groups.add(teacher_group)
+    assert Roles(user).is_teacher
+    teacher_group.user_set.clear()
+    assert not Roles(user).is_teacher
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_class_listing_cache_hits_and_version_invalidation(
+    client, settings, django_assert_max_num_queries, django_capture_on_commit_callbacks,
+):
+    from passes.listing_cache import cache_counters
+
+    settings.LISTING_CACHE_TIMEOUT = 300
+
+    student = User.objects.create_user("cachestud", password="pass")
+    teacher = User.objects.create_user("cacheteach", password="pass")
+    algebra = Class.objects.create(name="Algebra", teacher=teacher, year=3, deadline=timezone.now() + timedelta(days=5))
+    Enrollment.objects.create(student=student, class_ref=algebra)
+    client.force_login(student)
+    url = reverse("classes:list")
+
+    before = cache_counters()
+    assert [c.name for c in client.get(url).context["classes"]] == ["Algebra"]
+    with django_assert_max_num_queries(3) as captured:  # session, user, roles
+        r = client.get(url)
+    assert not any(Class._meta.db_table in q["sql"] for q in captured.captured_queries)
+    assert [c.name for c in r.context["classes"]] == ["Algebra"]
+    after = cache_counters()
+    assert after["classes.hits"] - before.get("classes.hits", 0) == 1
+    assert after["years.hits"] - before.get("years.hits", 0) == 1
+
+    # New enrollment: the student's listing changes; a new class: the year options change.
+    # Stamps are bumped once the writes commit, not before.
+    with django_capture_on_commit_callbacks(execute=True):
+        biology = Class.objects.create(name="Biology", teacher=teacher, year=4, deadline=timezone.now() + timedelta(days=6))
+        Enrollment.objects.create(student=student, class_ref=biology)
+        assert [c.name for c in client.get(url).context["classes"]] == ["Algebra"]
+    r = client.get(url)
+    assert [c.name for c in r.context["classes"]] == ["Algebra", "Biology"]
+    assert list(r.context["years"]) == [3, 4]
+
+    # Listings show the teacher's name, so renaming a teacher invalidates them
+    with django_capture_on_commit_callbacks(execute=True):
+        teacher.first_name, teacher.last_name = "Ada", "Lovelace"
+        teacher.save()
+    assert "Ada Lovelace" in client.get(url).content.decode()
+
+
+@pytest.mark.django_db
+def test_live_filter_partials_answer_304_until_data_changes(client, django_capture_on_commit_callbacks):
+    from passes.models import Submission
+
+    teacher = User.objects.create_user("etagteach", password="pass")
+    Group.objects.get_or_create(name="teacher")[0].user_set.add(teacher)
+    student = User.objects.create_user("etagstud", password="pass")
+    cls = Class.objects.create(name="ETags", teacher=teacher, year=1, deadline=timezone.now() + timedelta(days=5))
+    Enrollment.objects.create(student=student, class_ref=cls)
+    sub = Submission.objects.create(student=student, class_ref=cls, file="e.txt")
+    client.force_login(teacher)
+
+    for url in (reverse("submissions:list"), reverse("classes:list")):
+        r = client.get(url, {"q": "ETag"}, HTTP_HX_REQUEST="true")
+        assert r.status_code == 200 and "HX-Request" in r["Vary"]
+        etag = r["ETag"]
+        r = client.get(url, {"q": "ETag"}, HTTP_HX_REQUEST="true", HTTP_IF_NONE_MATCH=etag)
+        assert r.status_code == 304
+        # Other filters, or the full page, are not short-circuited
+        assert client.get(url, {"q": "ETags"}, HTTP_HX_REQUEST="true", HTTP_IF_NONE_MATCH=etag).status_code == 200
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    url = reverse("submissions:list")
+    etag = client.get(url, HTTP_HX_REQUEST="true")["ETag"]
+    client.post(reverse("submissions:approve", args=[sub.pk]))
+    assert client.get(url, HTTP_HX_REQUEST="true", HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    url = reverse("classes:list")
+    etag = client.get(url, HTTP_HX_REQUEST="true")["ETag"]
+    with django_capture_on_commit_callbacks(execute=True):
+        cls.name = "Renamed"
+        cls.save()
+    assert client.get(url, HTTP_HX_REQUEST="true", HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    # A class written without bumping this process's stamps (another process,
+    # or bulk_create) still changes the ETag through the database fingerprint
+    etag = client.get(url, HTTP_HX_REQUEST="true")["ETag"]
+    Class.objects.bulk_create([Class(name="Elsewhere", teacher=teacher, year=1, deadline=cls.deadline)])
+    r = client.get(url, HTTP_HX_REQUEST="true", HTTP_IF_NONE_MATCH=etag)
+    assert r.status_code == 200 and "Elsewhere" in r.content.decode()
@@ -0,0 +1,150 @@
+"""
+Streaming upload handling for submissions.
+
+BlobUploadHandler writes multipart file parts straight into the submission
+storage's temp directory while hashing them, so ContentAddressedStorage can
+move the finished file into place with a rename (no second copy, no re-read).
+It stops the request as soon as a file crosses the class's size limit.
+
+ChunkedUpload sessions let the browser send a large file in pieces
+(``Content-Range`` PUTs) and resume after a dropped connection; the finished
+file becomes a blob that the submission form then refers to by upload id.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers, StopUpload
+from django.utils import timezone
+
+from .models import Class, ChunkedUpload
+from .storage import blob_name, submission_storage
+
+CONTENT_RANGE = re.compile(r"^bytes (?P<start>\d+)-(?P<end>\d+)/(?P<total>\d+)$")
+
+
+def max_upload_bytes(cls: Class | None = None) -> int:
+    """Upload limit for a class (its own max_upload_mb, else SUBMISSION_MAX_UPLOAD_MB)."""
+    mb = (cls.max_upload_mb if cls is not None else None) or settings.SUBMISSION_MAX_UPLOAD_MB
+    return mb * 1024 * 1024
+
+
+def requested_class(request) -> Class | None:
+    """
+    The class an upload is for, known before the body is parsed: from the
+    ``?class=`` query parameter or the ``X-Upload-Class`` header.
+    """
+    class_id = request.GET.get("class") or request.META.get("HTTP_X_UPLOAD_CLASS", "")
+    if not class_id.isdigit():
+        return None
+    return Class.objects.filter(pk=int(class_id)).only("pk", "max_upload_mb").first()
+
+
+class BlobUploadedFile(TemporaryUploadedFile):
+    """A TemporaryUploadedFile created in the blob temp dir, carrying its SHA-256."""
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None, dir=None):
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix=".upload" + ext, dir=dir)
+        UploadedFile.__init__(self, file, name, content_type, size, charset, content_type_extra)
+        self.sha256 = None
+
+
+class BlobUploadHandler(FileUploadHandler):
+    """
+    Stream uploads into the submission storage, hashing on the fly. Aborts
+    the request (connection reset) once a file exceeds ``max_size`` bytes and
+    records the limit on ``request.upload_limit_exceeded``.
+    """
+
+    def __init__(self, request=None, max_size: int | None = None):
+        super().__init__(request)
+        self.max_size = max_size
+        self.digest = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = BlobUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra,
+            dir=submission_storage().temp_dir(),
+        )
+        self.digest = hashlib.sha256()
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.max_size is not None and start + len(raw_data) > self.max_size:
+            if self.request is not None:
+                self.request.upload_limit_exceeded = self.max_size
+            raise StopUpload(connection_reset=True)
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        return self.file
+
+
+# Resumable chunked uploads
+
+
+def chunk_path(upload: ChunkedUpload) -> str:
+    return os.path.join(submission_storage().temp_dir(), f"chunked-{upload.pk}")
+
+
+def parse_content_range(header: str):
+    """Return (start, end, total) from ``bytes start-end/total``, or None."""
+    match = CONTENT_RANGE.match(header or "")
+    if not match:
+        return None
+    start, end, total = (int(match.group(k)) for k in ("start", "end", "total"))
+    if start > end or end >= total:
+        return None
+    return start, end, total
+
+
+def append_chunk(upload: ChunkedUpload, stream, start: int, length: int) -> int:
+    """
+    Append ``length`` bytes read from ``stream`` at ``start`` (which must equal
+    the bytes received so far). Returns the new offset; finalizes the upload
+    into a blob when the last byte arrives.
+    """
+    path = chunk_path(upload)
+    written = 0
+    with open(path, "r+b" if os.path.exists(path) else "wb") as out:
+        out.seek(start)
+        out.truncate()
+        while written < length:
+            data = stream.read(min(64 * 1024, length - written))
+            if not data:
+                break
+            out.write(data)
+            written += len(data)
+    upload.offset = start + written
+    update_fields = ["offset", "updated_at"]
+    if upload.offset == upload.size:
+        finalize(upload)
+        update_fields += ["blob_name", "completed_at"]
+    upload.save(update_fields=update_fields)
+    return upload.offset
+
+
+def finalize(upload: ChunkedUpload) -> None:
+    """Hash the assembled file and move it into content-addressed storage."""
+    storage = submission_storage()
+    path = chunk_path(upload)
+    digest = hashlib.sha256()
+    with open(path, "rb") as src:
+        for data in iter(lambda: src.read(1024 * 1024), b""):
+            digest.update(data)
+    final = blob_name(digest.hexdigest(), os.path.splitext(upload.filename)[1])
+    if storage.reuse(final):
+        os.unlink(path)
+    else:
+        storage.commit_temp(path, final)
+    upload.blob_name = final
+    upload.completed_at = timezone.now()
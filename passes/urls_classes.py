@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path("", views.class_list, name="list"),
     path("<int:class_id>/roster/", views.class_roster, name="roster"),
+    path("<int:class_id>/submissions.zip", views.class_submissions_zip, name="submissions_zip"),
     path("propose/", views.propose_class, name="propose"),
     path("proposals/", views.my_proposals, name="proposals"),
+    path("cache-stats/", views.listing_cache_stats, name="cache_stats"),
 ]
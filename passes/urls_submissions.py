@@ -3,6 +3,13 @@ from . import views
 urlpatterns = [
     path("", views.submission_list, name="list"),
     path("new/", views.submission_create, name="new"),
+    path("export.csv", views.submission_export, {"fmt": "csv"}, name="export_csv"),
+    path("export.jsonl", views.submission_export, {"fmt": "jsonl"}, name="export_jsonl"),
+    path("uploads/", views.upload_start, name="upload_start"),
+    path("uploads/<uuid:upload_id>/", views.upload_chunk, name="upload_chunk"),
+    path("review/", views.submission_bulk_review, name="bulk_review"),
+    path("<int:pk>/download/", views.submission_download, name="download"),
+    path("<int:pk>/versions/<int:number>/", views.submission_version_download, name="version_download"),
     path("<int:pk>/approve/", views.submission_approve, name="approve"),
     path("<int:pk>/reject/", views.submission_reject, name="reject"),
 ]
@@ -0,0 +1,148 @@
+"""
+Submission history.
+
+Every upload to a submission is a SubmissionVersion, numbered from 1. The
+newest version is the submission's current file and is served as is. When a
+new file replaces it, the previous version keeps a reference to its blob and
+a "compact_submission_version" job then tries to replace that blob with a
+reverse delta (the old file rebuilt from the next version):
+
+    eligible  text-like files (SUBMISSION_DELTA_EXTS) up to
+              SUBMISSION_DELTA_MAX_BYTES, except every
+              SUBMISSION_VERSION_KEYFRAME-th version, which stays a full copy
+              so rebuilding an old version applies at most KEYFRAME - 1 deltas
+    stored    zlib-compressed JSON list of line ranges copied from the next
+              version and literal runs of new text, verified before the blob
+              reference is released
+"""
+import json
+import os
+import zlib
+from difflib import SequenceMatcher
+
+from django.conf import settings
+from django.db import transaction
+
+from .blobs import release_blob, retain_blob
+from .jobs import enqueue
+from .models import Submission, SubmissionVersion
+from .storage import submission_storage
+
+COMPACT_TASK = "compact_submission_version"
+
+
+def _lines(data: bytes) -> list:
+    return data.decode("utf-8").splitlines(keepends=True)
+
+
+def make_delta(base: bytes, target: bytes) -> bytes | None:
+    """Compressed delta rebuilding ``target`` from ``base``; None unless both are UTF-8 text."""
+    try:
+        base_lines, target_lines = _lines(base), _lines(target)
+    except UnicodeDecodeError:
+        return None
+    ops = []
+    matcher = SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append("".join(target_lines[j1:j2]))
+    return zlib.compress(json.dumps(ops, ensure_ascii=False).encode("utf-8"), 9)
+
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    base_lines = _lines(base)
+    parts = []
+    for op in json.loads(zlib.decompress(delta)):
+        parts.append(op if isinstance(op, str) else "".join(base_lines[op[0]:op[1]]))
+    return "".join(parts).encode("utf-8")
+
+
+def is_delta_candidate(name: str) -> bool:
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    return extension in settings.SUBMISSION_DELTA_EXTS
+
+
+def record_version(sub: Submission, previous_name: str | None) -> SubmissionVersion:
+    """
+    Add the submission's current file as its newest version. ``previous_name``
+    is the file it replaced; the previous version keeps that blob until it is
+    compacted.
+    """
+    with transaction.atomic():
+        # Concurrent resubmissions of one submission number their versions in turn
+        Submission.objects.select_for_update().filter(pk=sub.pk).values_list("pk").first()
+        latest = sub.versions.order_by("-number").first()
+        if latest is not None and previous_name:
+            latest.blob_name = previous_name
+            latest.save(update_fields=["blob_name"])
+            retain_blob(previous_name)
+        version = SubmissionVersion.objects.create(
+            submission=sub,
+            number=latest.number + 1 if latest else 1,
+            original_name=sub.display_name,
+            size=_file_size(sub),
+        )
+    if latest is not None and previous_name and is_delta_candidate(latest.original_name or previous_name):
+        enqueue(COMPACT_TASK, version_id=latest.pk)
+    return version
+
+
+def _file_size(sub: Submission) -> int:
+    try:
+        return sub.file.size
+    except OSError:
+        return 0
+
+
+def _read(name: str) -> bytes:
+    with submission_storage().open(name, "rb") as fh:
+        return fh.read()
+
+
+def version_content(version: SubmissionVersion) -> bytes:
+    """The bytes of ``version``, rebuilt from the nearest full copy if it is a delta."""
+    if version.delta is None:
+        return _read(version.blob_name or version.submission.file.name)
+    # Deltas chain forward to the next full copy: a keyframe or the current file
+    chain = list(
+        SubmissionVersion.objects.filter(
+            submission_id=version.submission_id,
+            number__gte=version.number,
+            number__lte=version.number + settings.SUBMISSION_VERSION_KEYFRAME,
+        ).order_by("number")
+    )
+    for end, step in enumerate(chain):
+        if step.delta is None:
+            break
+    else:
+        raise SubmissionVersion.DoesNotExist(f"No full copy after {version}")
+    content = _read(step.blob_name or version.submission.file.name)
+    for step in reversed(chain[:end]):
+        content = apply_delta(content, step.delta)
+    return content
+
+
+def compact_version(version_id: int) -> bool:
+    """Replace a superseded version's blob with a delta when eligible. Returns True if it did."""
+    version = SubmissionVersion.objects.select_related("submission").filter(pk=version_id).first()
+    if version is None or not version.blob_name or version.delta is not None:
+        return False
+    if version.number % settings.SUBMISSION_VERSION_KEYFRAME == 0:
+        return False
+    newer = SubmissionVersion.objects.filter(
+        submission_id=version.submission_id, number=version.number + 1,
+    ).select_related("submission").first()
+    limit = settings.SUBMISSION_DELTA_MAX_BYTES
+    if newer is None or version.size > limit or newer.size > limit:
+        return False
+    old, base = _read(version.blob_name), version_content(newer)
+    delta = make_delta(base, old)
+    if delta is None or apply_delta(base, delta) != old:
+        return False
+    name = version.blob_name
+    version.blob_name, version.delta = "", delta
+    version.save(update_fields=["blob_name", "delta"])
+    release_blob(name)
+    return True
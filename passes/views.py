@@ -1,15 +1,38 @@
 # passes/views.py
+import mimetypes
+import os
+
 from django import forms
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.http import HttpResponse, HttpResponseForbidden
+from django.db.models import Count, Max, OuterRef, Q, Subquery
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from django.utils.text import slugify
 from django.template.loader import render_to_string
-from django.views.decorators.http import require_POST
+from django.urls import reverse
+from django.views.decorators.http import require_http_methods, require_POST
 
-from .models import Class, Submission, Enrollment
-from django.views.decorators.csrf import ensure_csrf_cookie
+from .models import ALLOWED_EXTS, ChunkedUpload, Class, Submission, SubmissionVersion, Enrollment
+from django.views.decorators.csrf import csrf_exempt, csrf_protect, ensure_csrf_cookie
+from .conditional import etag_partial
+from .deadlines import closing_soon
+from .downloads import serve_file
+from .exports import stream_class_zip, stream_csv, stream_jsonl
+from .filters import filter_classes, filter_submissions
 from .forms import SubmissionForm, ProposedClassForm
+from .listing_cache import cache_counters, class_listing, listing_stamps, year_options
+from .pagination import keyset_paginate
+from .review import REVIEW_STATUSES, parse_ids, review_submissions
+from .roles import get_roles
+from .routing import read_only
+from .stats import get_class_stats
+from .uploads import (
+    BlobUploadHandler, append_chunk, max_upload_bytes, parse_content_range, requested_class,
+)
+from .versions import version_content
 
 
 @ensure_csrf_cookie
@@ -17,47 +40,75 @@ def home(request):
     return render(request, "home.html")
 
 
+def class_list_fingerprint(request):
+    # Count, newest id, latest deadline and open count of the filtered classes
+    # (one aggregate query), so writes by other processes show up even when
+    # their listing stamps do not reach this one; the stamps cover renames
+    user, is_teacher = request.user, get_roles(request).is_teacher
+    params = [request.GET.get(name, "") for name in ("q", "year", "state")]
+    latest = (
+        filter_classes(user, is_teacher, *params, ranked=False)
+        .order_by().aggregate(
+            count=Count("pk", distinct=True), last=Max("pk"), deadline=Max("deadline"),
+            open=Count("pk", filter=Q(is_open=True), distinct=True),
+        )
+    )
+    return ("classes", user.pk, user.is_staff, is_teacher, *params, *latest.values(),
+            listing_stamps(user, is_teacher))
+
+
 @login_required
+@read_only
+@etag_partial(class_list_fingerprint)
 def class_list(request):
     """
     Students: show enrolled classes.
     Teachers: show classes they teach.
     Admin/staff: show all classes.
     """
-    user = request.user
-    if user.is_staff:
-        qs = Class.objects.all()
-    elif user.groups.filter(name="teacher").exists():
-        qs = Class.objects.filter(teacher=user)
-    else:
-        qs = Class.objects.filter(enrollments__student=user)
-    q = request.GET.get("q", "")
-    year = request.GET.get("year")
-    if q:
-        qs = qs.filter(name__icontains=q)
-    if year:
-        qs = qs.filter(year=year)
+    classes = class_listing(
+        request.user,
+        get_roles(request).is_teacher,
+        q=request.GET.get("q", ""),
+        year=request.GET.get("year"),
+        state=request.GET.get("state", ""),
+    )
 
     template = "passes/partials/class_table.html" if request.htmx else "passes/class_list.html"
-    is_teacher = request.user.groups.filter(name="teacher").exists()
-    show_propose_button = request.user.is_authenticated and (request.user.is_staff or is_teacher)
-    # Build dynamic year options
-    years = (
-        Class.objects.order_by().values_list("year", flat=True).distinct().order_by("year")
-    )
+    # Year options, listings and the closing-soon list come from the cache
+    # (passes/listing_cache.py); the HTMX partial has none of the extras
+    years = [] if request.htmx else year_options()
+    soon = []
+    if not request.htmx and (request.user.is_staff or get_roles(request).is_teacher):
+        soon = closing_soon(None if request.user.is_staff else request.user.pk)
     return render(
         request,
         template,
         {
-            "classes": qs.order_by("deadline").distinct(),
-            "is_teacher": is_teacher,
-            "show_propose_button": show_propose_button,
+            "classes": classes,
             "years": years,
+            "closing_soon": soon,
         },
     )
 
 
+def submission_list_fingerprint(request):
+    # Row count and newest updated_at of the filtered set (one aggregate query)
+    # instead of fetching and rendering the page; class names come from the
+    # listing stamps
+    user, is_teacher = request.user, get_roles(request).is_teacher
+    params = [request.GET.get(name, "") for name in ("status", "class", "q", "cursor")]
+    latest = (
+        filter_submissions(user, is_teacher, *params[:3])
+        .order_by().aggregate(count=Count("pk"), updated=Max("updated_at"))
+    )
+    return ("submissions", user.pk, user.is_staff, is_teacher, *params,
+            latest["count"], latest["updated"], listing_stamps())
+
+
 @login_required
+@read_only
+@etag_partial(submission_list_fingerprint)
 def submission_list(request):
     """
     Students: their own submissions.
@@ -65,54 +116,101 @@ def submission_list(request):
     Staff: all submissions.
     """
     user = request.user
-    is_teacher = user.groups.filter(name="teacher").exists()
+    is_teacher = get_roles(request).is_teacher
     if user.is_staff:
-        qs = Submission.objects.select_related("class_ref", "student")
         class_options = Class.objects.all()
     elif is_teacher:
-        qs = Submission.objects.select_related("class_ref", "student").filter(class_ref__teacher=user)
         class_options = Class.objects.filter(teacher=user)
     else:
-        qs = Submission.objects.select_related("class_ref", "student").filter(student=user)
         class_options = Class.objects.filter(enrollments__student=user).distinct()
 
     # Filters
     status = request.GET.get("status", "")
     class_id = request.GET.get("class", "")
     q = request.GET.get("q", "")
-    if status in {"P", "A", "R"}:
-        qs = qs.filter(status=status)
-    if class_id and class_id.isdigit():
-        qs = qs.filter(class_ref_id=int(class_id))
-    if q:
-        qs = qs.filter(Q(class_ref__name__icontains=q) | Q(student__username__icontains=q))
-
-    template = "passes/partials/submission_table.html" if request.htmx else "passes/submission_list.html"
+    qs = filter_submissions(user, is_teacher, status=status, class_id=class_id, q=q)
+
+    page_size = getattr(settings, "SUBMISSION_PAGE_SIZE", 50)
+    page = keyset_paginate(qs, request.GET.get("cursor", ""), page_size)
+    next_query = ""
+    if page.has_next:
+        params = request.GET.copy()
+        params["cursor"] = page.next_cursor
+        next_query = params.urlencode()
+
+    if request.htmx and page.cursor:
+        # "Load more": only the next batch of rows, appended into #submission-rows
+        template = "passes/partials/submission_rows.html"
+    elif request.htmx:
+        template = "passes/partials/submission_table.html"
+    else:
+        template = "passes/submission_list.html"
     return render(
         request,
         template,
         {
-            "submissions": qs,
+            "submissions": page.items,
+            "page": page,
+            "next_query": next_query,
             "class_options": class_options.order_by("name"),
             "selected_status": status,
             "selected_class": class_id,
             "q": q,
-            "is_teacher": is_teacher,
         },
     )
 
 
+EXPORT_FORMATS = {
+    "csv": (stream_csv, "text/csv; charset=utf-8"),
+    "jsonl": (stream_jsonl, "application/x-ndjson"),
+}
+
+
+@require_http_methods(["GET"])
+@login_required
+def submission_export(request, fmt: str):
+    """Stream the submissions matching the submission_list filters as CSV or JSON Lines."""
+    qs = filter_submissions(
+        request.user,
+        get_roles(request).is_teacher,
+        status=request.GET.get("status", ""),
+        class_id=request.GET.get("class", ""),
+        q=request.GET.get("q", ""),
+    )
+    stream, content_type = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(stream(qs), content_type=content_type)
+    filename = f"submissions-{timezone.localdate():%Y%m%d}.{fmt}"
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    return response
+
+
+@csrf_exempt
 @login_required
 def submission_create(request):
+    # The streaming upload handler must be installed before anything reads
+    # request.POST, so CSRF is checked afterwards by _submission_create
+    if request.method == "POST":
+        max_size = max_upload_bytes(requested_class(request))
+        request.upload_handlers = [BlobUploadHandler(request, max_size=max_size)]
+    return _submission_create(request)
+
+
+@csrf_protect
+def _submission_create(request):
     # Prevent teachers from submitting - only students can submit
-    if request.user.groups.filter(name="teacher").exists():
+    if get_roles(request).is_teacher:
         return HttpResponseForbidden("Teachers cannot submit assignments. Only students can submit.")
     
     if request.method == "POST":
+        request.FILES  # parse the body so the upload handler can flag an oversized file
+        if getattr(request, "upload_limit_exceeded", None):
+            limit_mb = request.upload_limit_exceeded // (1024 * 1024)
+            return HttpResponse(f"File is too large; the limit is {limit_mb} MB.", status=413)
         form = SubmissionForm(request.POST, request.FILES, user=request.user)
         if form.is_valid():
             class_ref = form.cleaned_data["class_ref"]
             file = form.cleaned_data["file"]
+            upload = form.cleaned_data["upload"]
             feedback = form.cleaned_data.get("feedback", "")
 
             # either create or update the existing submission
@@ -122,10 +220,17 @@ def submission_create(request):
                 defaults={"status": "P"},
             )
             # replace/update
-            sub.file = file
+            if upload is not None:
+                # Finished chunked upload: already stored as a blob
+                sub.file = upload.blob_name
+                sub.original_name = upload.filename
+            else:
+                sub.file = file
             sub.feedback = feedback
             sub.status = "P"           # reset review state on resubmission
             sub.save()
+            if upload is not None:
+                upload.delete()
 
             if request.htmx:
                 return render(request, "passes/partials/submit_success.html", {"sub": sub})
@@ -144,6 +249,68 @@ def submission_create(request):
         form = SubmissionForm(user=request.user)
 
     return render(request, "passes/submission_form.html", {"form": form})
+
+
+def upload_state(upload: ChunkedUpload) -> dict:
+    return {
+        "id": str(upload.pk),
+        "offset": upload.offset,
+        "size": upload.size,
+        "complete": upload.is_complete,
+        "url": reverse("submissions:upload_chunk", args=[upload.pk]),
+    }
+
+
+@require_POST
+@login_required
+def upload_start(request):
+    """
+    Open a resumable chunked upload. Expects class_ref, filename and size (bytes);
+    the file is then sent with PUTs to the returned url.
+    """
+    if get_roles(request).is_teacher:
+        return HttpResponseForbidden("Teachers cannot submit assignments. Only students can submit.")
+    try:
+        class_id = int(request.POST["class_ref"])
+        size = int(request.POST["size"])
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "class_ref and size are required."}, status=400)
+    filename = os.path.basename(request.POST.get("filename", "")).strip()
+    ext = os.path.splitext(filename)[1].lstrip(".").lower()
+    if ext not in ALLOWED_EXTS or size <= 0:
+        return JsonResponse({"error": f"Allowed: {', '.join(ALLOWED_EXTS)}"}, status=400)
+    cls = Class.objects.filter(pk=class_id, enrollments__student=request.user).first()
+    if cls is None:
+        return JsonResponse({"error": "You are not enrolled in this class."}, status=403)
+    if size > max_upload_bytes(cls):
+        return JsonResponse({"error": "File is too large for this class."}, status=413)
+
+    upload = ChunkedUpload.objects.create(user=request.user, class_ref=cls, filename=filename, size=size)
+    return JsonResponse(upload_state(upload), status=201)
+
+
+@require_http_methods(["GET", "PUT"])
+@login_required
+def upload_chunk(request, upload_id):
+    """
+    GET: how many bytes the server has (to resume after a dropped connection).
+    PUT: the next piece, with ``Content-Range: bytes start-end/total``.
+    """
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+    if request.method == "GET" or upload.is_complete:
+        return JsonResponse(upload_state(upload))
+
+    content_range = parse_content_range(request.headers.get("Content-Range", ""))
+    if content_range is None or content_range[2] != upload.size:
+        return JsonResponse({"error": "Invalid Content-Range."}, status=400)
+    start, end, _total = content_range
+    if start != upload.offset:
+        # Out of order: tell the client where to continue from
+        return JsonResponse(upload_state(upload), status=409)
+    append_chunk(upload, request, start, end - start + 1)
+    return JsonResponse(upload_state(upload))
+
+
 @require_POST
 @login_required
 def submission_approve(request, pk: int):
@@ -174,10 +341,67 @@ def submission_reject(request, pk: int):
     return redirect("submissions:list")
 
 
+@require_POST
+@login_required
+def submission_bulk_review(request):
+    """
+    Approve or reject the selected submissions (``ids``) in one UPDATE, with
+    optional shared feedback. HTMX requests get a summary plus the changed
+    rows as out-of-band swaps; ids the user may not review are listed.
+    """
+    status = request.POST.get("status", "")
+    if status not in REVIEW_STATUSES:
+        return HttpResponseBadRequest("status must be A or R")
+    ids, invalid = parse_ids(request.POST.getlist("ids"), settings.SUBMISSION_BULK_REVIEW_MAX)
+    feedback = request.POST.get("feedback", "").strip() or None
+    result = review_submissions(request.user, ids, status, feedback)
+    result.errors.update(dict.fromkeys(invalid, "not a valid id"))
+    if getattr(request, "htmx", False):
+        return render(request, "passes/partials/bulk_review_result.html", {
+            "result": result,
+            "status_label": REVIEW_STATUSES[status],
+        })
+    return redirect("submissions:list")
+
+
+@require_http_methods(["GET", "HEAD"])
+@login_required
+def submission_download(request, pk: int):
+    """The submitting student, the class teacher and staff may download a file."""
+    sub = get_object_or_404(Submission.objects.select_related("class_ref"), pk=pk)
+    user = request.user
+    if not (user.is_staff or sub.student_id == user.id or sub.class_ref.teacher_id == user.id):
+        return HttpResponseForbidden("You don't have access to this submission.")
+    if not sub.file or not sub.file.storage.exists(sub.file.name):
+        raise Http404("File not found.")
+    return serve_file(request, sub.file.storage, sub.file.name, sub.display_name)
+
+
+@login_required
+def submission_version_download(request, pk: int, number: int):
+    """An earlier (or the current) file of a submission, with the same access rules."""
+    version = get_object_or_404(
+        SubmissionVersion.objects.select_related("submission__class_ref"), submission_id=pk, number=number,
+    )
+    sub, user = version.submission, request.user
+    if not (user.is_staff or sub.student_id == user.id or sub.class_ref.teacher_id == user.id):
+        return HttpResponseForbidden("You don't have access to this submission.")
+    filename = version.original_name or sub.display_name
+    if version.delta is None:
+        name = version.blob_name or sub.file.name
+        if not name or not sub.file.storage.exists(name):
+            raise Http404("File not found.")
+        return serve_file(request, sub.file.storage, name, filename)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    response = HttpResponse(version_content(version), content_type=content_type)
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    return response
+
+
 @login_required
 def propose_class(request):
     # Only teachers can propose classes
-    if not request.user.groups.filter(name="teacher").exists() and not request.user.is_staff:
+    if not get_roles(request).can_propose:
         return HttpResponseForbidden()
     if request.method == "POST":
         form = ProposedClassForm(request.POST)
@@ -193,34 +417,53 @@ def propose_class(request):
 
 
 @login_required
+@read_only
 def my_proposals(request):
-    if not request.user.groups.filter(name="teacher").exists() and not request.user.is_staff:
+    if not get_roles(request).can_propose:
         return HttpResponseForbidden()
     qs = request.user.proposed_classes.all().order_by("-created_at")
     return render(request, "passes/my_proposals.html", {"proposals": qs})
 
 
+def roster_enrollments(cls: Class, with_submissions: bool = True):
+    """
+    A class's enrollments with student data, ordered by username. With
+    ``with_submissions`` each row carries ``submission_id`` and
+    ``submission_status`` of the student's submission (at most one per class).
+    """
+    enrollments = cls.enrollments.select_related('student').order_by('student__username')
+    if with_submissions:
+        class_submission = Submission.objects.filter(student=OuterRef("student_id"), class_ref=cls)
+        enrollments = enrollments.annotate(
+            submission_id=Subquery(class_submission.values("pk")[:1]),
+            submission_status=Subquery(class_submission.values("status")[:1]),
+        )
+    return enrollments
+
+
 @login_required
+@read_only
 def class_roster(request, class_id):
     """
     Show the list of students enrolled in a class.
     Teachers can see submission status for each student.
     Students can see their classmates and submit assignments.
     """
-    cls = get_object_or_404(Class, id=class_id)
+    cls = get_object_or_404(Class.objects.select_related("teacher"), id=class_id)
     user = request.user
     
     # Check permissions: must be the teacher, enrolled student, or staff
-    is_teacher = cls.teacher == user or user.is_staff
-    is_enrolled = Enrollment.objects.filter(student=user, class_ref=cls).exists()
+    is_teacher = cls.teacher_id == user.id or user.is_staff
+    is_enrolled = not is_teacher and Enrollment.objects.filter(student=user, class_ref=cls).exists()
     
     if not (is_teacher or is_enrolled):
         return HttpResponseForbidden("You don't have access to this class roster.")
     
-    # Get all enrollments with related student data
-    enrollments = cls.enrollments.select_related('student').order_by('student__username')
+    # One query: enrollments with student data, plus (for teachers) each
+    # student's submission pulled in as subquery annotations
+    enrollments = roster_enrollments(cls, with_submissions=is_teacher)
     
-    # For teachers, annotate each enrollment with submission status
+    status_labels = dict(Submission.STATUS)
     roster_data = []
     for enrollment in enrollments:
         student_data = {
@@ -229,19 +472,9 @@ def class_roster(request, class_id):
         }
         
         if is_teacher:
-            # Check if student has submitted
-            try:
-                submission = Submission.objects.get(
-                    student=enrollment.student,
-                    class_ref=cls
-                )
-                student_data['submission'] = submission
-                student_data['status'] = submission.get_status_display()
-                student_data['status_code'] = submission.status
-            except Submission.DoesNotExist:
-                student_data['submission'] = None
-                student_data['status'] = 'Not Submitted'
-                student_data['status_code'] = 'N'
+            student_data['submission_id'] = enrollment.submission_id
+            student_data['status_code'] = enrollment.submission_status or 'N'
+            student_data['status'] = status_labels.get(enrollment.submission_status, 'Not Submitted')
         
         roster_data.append(student_data)
     
@@ -253,22 +486,8 @@ def class_roster(request, class_id):
     }
     
     if is_teacher:
-        # Calculate statistics for teacher view
-        submitted = sum(1 for d in roster_data if d.get('submission'))
-        approved = sum(1 for d in roster_data if d.get('status_code') == 'A')
-        rejected = sum(1 for d in roster_data if d.get('status_code') == 'R')
-        pending = sum(1 for d in roster_data if d.get('status_code') == 'P')
-        not_submitted = sum(1 for d in roster_data if d.get('status_code') == 'N')
-        
-        context.update({
-            'stats': {
-                'submitted': submitted,
-                'approved': approved,
-                'rejected': rejected,
-                'pending': pending,
-                'not_submitted': not_submitted,
-            }
-        })
+        # Denormalized counters (ClassStats): one row instead of an aggregate
+        context['stats'] = get_class_stats(cls)
     else:
         # For students: check their submission status and provide a form
         try:
@@ -286,3 +505,22 @@ def class_roster(request, class_id):
     return render(request, "passes/class_roster.html", context)
 
 
+@login_required
+def class_submissions_zip(request, class_id):
+    """Stream every submission in a class as one ZIP (teacher and staff only)."""
+    cls = get_object_or_404(Class, id=class_id)
+    user = request.user
+    if not (user.is_staff or cls.teacher_id == user.id):
+        return HttpResponseForbidden("Only the class teacher can export submissions.")
+    response = StreamingHttpResponse(stream_class_zip(cls), content_type="application/zip")
+    filename = f"{slugify(cls.name) or 'class'}-{cls.pk}-submissions.zip"
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    return response
+
+
+@login_required
+def listing_cache_stats(request):
+    """Hit/miss counters of the class listing cache in this worker process (staff only)."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    return JsonResponse({"pid": os.getpid(), "counters": cache_counters()})